@@ -1,24 +1,178 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Annotated
+from langgraph.graph import StateGraph, START, END
+from collections import deque
+from typing import TypedDict, List, Dict, Annotated, Optional, Tuple
 import operator
 from vertexai.generative_models import GenerativeModel
+from vertexai.language_models import TextEmbeddingModel
 import vertexai
+import asyncio
 import json
 import logging
+import re
 import time
 
+from app import metrics
+from app.context_builder import build_synthesis_context, prompt_token_count
+from app.embedding_cache import EmbeddingCache, InMemoryEmbeddingCache, embedding_cache_key
+from app.model_routing import LATENCY_WINDOW, MIN_LATENCY_SAMPLES, ModelRoute, ModelRouter
+from app.models import WorkflowMode
+from app.search_engine import ERROR_MESSAGE_FIELDS, matches_filters, reciprocal_rank_fusion
+from app.vector_profiles import NATIVE_DIMS, fit_dimensions
+
 logger = logging.getLogger(__name__)
 
+INCIDENT_TYPES = ("database", "network", "application", "infrastructure", "security")
+SEARCH_PRIORITIES = ("past_incidents", "documentation", "logs")
+MAX_SEARCH_TERMS = 8
+GENERATION_MODEL_NAME = "deepseek-r1-0528-maas"
+EMBEDDING_MODEL_NAME = "text-embedding-004"
+EMBEDDING_BATCH_LIMIT = 250  # inputs per text-embedding-004 request
+# Deadline budgeting: seconds held back for later stages when carving per-call
+# timeouts from what is left of a request's deadline. A stage's reserve is its
+# observed p95 (these defaults until there are enough samples), capped at a
+# share of the time left so short deadlines still leave room for every stage
+SYNTHESIS_RESERVE_SECONDS = 8.0
+SEARCH_RESERVE_SECONDS = 1.0
+DEFAULT_STAGE_SECONDS = {"search": SEARCH_RESERVE_SECONDS, "synthesize": SYNTHESIS_RESERVE_SECONDS}
+RESERVE_SHARE = {"search": 0.1, "synthesize": 0.4}
+MIN_LLM_CALL_SECONDS = 2.0  # an LLM call is not started with less than this (or the node's p95, if lower)
+TIGHT_SEARCH_SECONDS = 2.0  # below this, BM25 legs also get terminate_after
+SEARCH_TERMINATE_AFTER = 10000
+RESPONSE_MARGIN_SECONDS = 0.25  # building and sending the response
+# Sentences of a description that look like quoted errors or log lines
+ERROR_LINE_PATTERN = re.compile(
+    r"error|exception|fail|refused|timed? ?out|denied|unavailable|oom|killed|panic|\b[45]\d\d\b", re.IGNORECASE
+)
+
+# Used when the model's analysis cannot be parsed
+FALLBACK_ANALYSIS = {
+    "severity": "P2",
+    "incident_type": "application",
+    "key_symptoms": ["error detected"],
+    "technical_terms": [],
+    "affected_systems": ["unknown"],
+    "urgency_score": 5,
+    "summary": "Unable to fully analyze incident"
+}
+
+def is_fallback_analysis(analysis: Dict) -> bool:
+    """Whether the analysis is FALLBACK_ANALYSIS, i.e. nothing was inferred from the incident"""
+    return analysis == FALLBACK_ANALYSIS
+
+def parse_json_response(response_text: str):
+    """Parse a model response as JSON, stripping markdown code fences if present"""
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+    return json.loads(response_text)
+
+def build_search_strategy(analysis: Dict, strategy: Optional[Dict] = None) -> Dict:
+    """
+    Deterministic local strategy builder: keeps whatever the model provided and
+    fills missing search terms, filters and priority from the incident analysis.
+    The fallback analysis adds no filters: its incident_type is a placeholder.
+    """
+    strategy = strategy if isinstance(strategy, dict) else {}
+    
+    terms = [t for t in strategy.get('primary_search_terms') or [] if isinstance(t, str) and t.strip()]
+    if not terms:
+        terms = list(analysis.get('technical_terms') or []) or list(analysis.get('key_symptoms') or [])
+    
+    seen = set()
+    unique_terms = []
+    for term in terms:
+        if term.lower() not in seen:
+            seen.add(term.lower())
+            unique_terms.append(term)
+    
+    filters = strategy.get('search_filters')
+    filters = dict(filters) if isinstance(filters, dict) else {}
+    if 'incident_type' not in filters and analysis.get('incident_type') in INCIDENT_TYPES and not is_fallback_analysis(analysis):
+        filters['incident_type'] = analysis['incident_type']
+    
+    priority = strategy.get('search_priority')
+    if priority not in SEARCH_PRIORITIES:
+        priority = "past_incidents"
+    
+    return {
+        "primary_search_terms": unique_terms[:MAX_SEARCH_TERMS],
+        "search_filters": filters,
+        "search_priority": priority
+    }
+
+def extract_error_text(description: str) -> str:
+    """The error-looking sentences and lines of a description (all of it if none match)"""
+    fragments = [f.strip() for f in re.split(r"(?<=[.!?])\s+|\n", description) if f.strip()]
+    errors = [f for f in fragments if ERROR_LINE_PATTERN.search(f)]
+    return " ".join(errors) if errors else description
+
+def build_sub_queries(description: str, analysis: Dict, strategy: Dict, query_vector: List[float]) -> List[Dict]:
+    """
+    Sub-queries for one incident search: a keyword query per term group, a
+    pure vector query, and an error-message query over the error fields.
+    Empty groups are left out.
+    """
+    groups = {
+        "primary_terms": strategy.get('primary_search_terms') or [],
+        "technical_terms": analysis.get('technical_terms') or [],
+        "symptoms": analysis.get('key_symptoms') or []
+    }
+    sub_queries = [
+        {"name": name, "query_text": " ".join(terms)} for name, terms in groups.items() if terms
+    ]
+    if query_vector:
+        sub_queries.append({"name": "vector", "query_vector": query_vector})
+    sub_queries.append({"name": "error_messages", "query_text": extract_error_text(description), "fields": ERROR_MESSAGE_FIELDS})
+    return sub_queries
+
+def stage_budget(state: Dict, reserve: float = 0.0) -> Optional[float]:
+    """Seconds a stage may spend: what is left of the deadline minus reserve for later stages; None without a deadline"""
+    deadline = state.get('deadline')
+    return None if deadline is None else deadline - time.time() - reserve
+
+def templated_recommendation(analysis: Dict, results: List[Dict]) -> Dict:
+    """Recommendation assembled from the closest past incidents, for when synthesis does not fit the deadline"""
+    top = results[:3]
+    if not top:
+        steps = ["Investigate logs", "Check monitoring", "Escalate if needed"]
+    else:
+        steps = [line.strip(" -*•") for line in (top[0].get('resolution_steps') or "").splitlines() if line.strip(" -*•")]
+        steps = steps or [top[0].get('resolution_steps') or "Follow the resolution of the closest past incident"]
+    references = [r['incident_id'] for r in top]
+    similarity = top[0].get('similarity_score', 0.0) if top else 0.0
+    return {
+        "immediate_actions": [f"Review {r['incident_id']}: {r.get('title')}" for r in top] or ["Check system logs", "Verify service health", "Review recent deployments"],
+        "root_cause_hypothesis": f"Likely similar to {references[0]} ({top[0].get('title')})" if top else analysis.get('summary', "Unknown"),
+        "resolution_steps": steps[:8],
+        "preventive_measures": ["Add monitoring", "Review logs regularly"],
+        "estimated_resolution_time_minutes": int(top[0].get('resolution_time_minutes') or 30) if top else 30,
+        "confidence_score": round(min(0.5, max(0.1, similarity * 0.5)), 2),
+        "confidence_reasoning": "Templated from the closest past incidents; the request deadline left no time for synthesis",
+        "similar_incident_references": references,
+        "risk_assessment": "medium"
+    }
+
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer that merges per-node dict updates into the shared state"""
+    return {**(left or {}), **(right or {})}
+
 class AgentState(TypedDict):
     """State passed between agents"""
     # Input
     incident_description: str
     request_id: str
+    deadline: Optional[float]  # time.time() by which the response is due, None for no limit
     
     # Analysis phase
     incident_analysis: Dict
     
+    # Strategy phase
+    search_strategy: Dict
+    
     # Search phase
+    query_vector: List[float]
+    vector_candidates: List[Dict]
     search_results: List[Dict]
     
     # Synthesis phase
@@ -26,20 +180,153 @@ class AgentState(TypedDict):
     
     # Metadata
     processing_time: float
+    node_timings: Annotated[Dict[str, float], merge_dicts]
     agent_steps: Annotated[List[str], operator.add]
     errors: Annotated[List[str], operator.add]
+    degradations: Annotated[List[str], operator.add]  # shortcuts taken to meet the deadline
+    model_routes: Annotated[Dict[str, str], merge_dicts]  # node -> model it was routed to
+    prompt_tokens: Annotated[Dict[str, int], merge_dicts]  # node -> prompt tokens sent
 
 class DevOpsOracleAgent:
-    def __init__(self, search_engine, project_id: str, region: str):
+    def __init__(self, search_engine, project_id: str, region: str, model=None, embedding_model=None,
+                 embedding_cache: Optional[EmbeddingCache] = None, embedding_dims: int = NATIVE_DIMS,
+                 router: Optional[ModelRouter] = None, synthesis_context_tokens: int = 1500):
         vertexai.init(project=project_id, location=region)
-        self.model = GenerativeModel("deepseek-r1-0528-maas")
-        self.embedding_model = GenerativeModel("text-embedding-004")
+        # Without a router every node uses the one model
+        if router is None:
+            model_name = GENERATION_MODEL_NAME if model is None else getattr(model, "_model_name", type(model).__name__)
+            model = model or GenerativeModel(GENERATION_MODEL_NAME)
+            router = ModelRouter({}, fast_model=model_name, models={model_name: model})
+        self.router = router
+        self.synthesis_context_tokens = synthesis_context_tokens
+        self.embedding_model = embedding_model or TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+        self.embedding_cache = embedding_cache or InMemoryEmbeddingCache()
+        # Query vectors must match the index's vector profile
+        self.embedding_dims = embedding_dims
+        self._output_dims = embedding_dims if embedding_dims != NATIVE_DIMS else None
         self.search_engine = search_engine
+        self._node_latencies: Dict[str, deque] = {}
+    
+    def _observe_node(self, node: str, seconds: float):
+        """Latency of a node that completed its full work (not a fallback)"""
+        self._node_latencies.setdefault(node, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+    
+    def expected_node_seconds(self, node: str) -> Optional[float]:
+        """p95 of the node's recent completions, or None until there are enough"""
+        samples = sorted(self._node_latencies.get(node, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+    
+    def _reserve(self, state: AgentState, *stages: str) -> float:
+        """Seconds to hold back for later stages, scaled to what is left of the deadline"""
+        remaining = stage_budget(state)
+        if remaining is None:
+            return 0.0
+        reserve = 0.0
+        for stage in stages:
+            expected = self.expected_node_seconds(stage)
+            expected = DEFAULT_STAGE_SECONDS[stage] if expected is None else expected
+            reserve += min(expected, RESERVE_SHARE[stage] * max(remaining, 0.0))
+        return reserve
+    
+    def _min_call_seconds(self, node: str) -> float:
+        """Least budget worth starting the node's LLM call with"""
+        expected = self.expected_node_seconds(node)
+        return MIN_LLM_CALL_SECONDS if expected is None else min(MIN_LLM_CALL_SECONDS, expected)
+    
+    async def embed_text(self, text: str) -> List[float]:
+        """Embed text, serving repeated content from the embedding cache"""
+        return (await self.embed_texts([text]))[0]
+    
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, sending all cache misses as one multi-input request"""
+        keys = [embedding_cache_key(text, EMBEDDING_MODEL_NAME, self._output_dims) for text in texts]
+        # A persistent cache does its I/O off the event loop
+        vectors = await self.embedding_cache.aget_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), EMBEDDING_BATCH_LIMIT):
+            batch = missing[start:start + EMBEDDING_BATCH_LIMIT]
+            for i, values in zip(batch, await self._request_embeddings([texts[i] for i in batch])):
+                vectors[i] = fit_dimensions(values, self.embedding_dims)
+            await self.embedding_cache.aput_many([(keys[i], vectors[i]) for i in batch])
+        return vectors
+    
+    async def check_vertex_ai(self):
+        """One uncached single-input embedding request; raises if Vertex AI is unreachable"""
+        await self._request_embeddings(["health check"], prompt_type="health_check")
+    
+    async def _request_embeddings(self, texts: List[str], prompt_type: Optional[str] = None) -> List[List[float]]:
+        prompt_type = prompt_type or ("embedding" if len(texts) == 1 else "embedding_batch")
+        async with metrics.track_vertex_call(EMBEDDING_MODEL_NAME, prompt_type):
+            if hasattr(self.embedding_model, "get_embeddings_async"):
+                kwargs = {"output_dimensionality": self._output_dims} if self._output_dims else {}
+                embeddings = await self.embedding_model.get_embeddings_async(texts, **kwargs)
+                return [e.values for e in embeddings]
+            # Single-input models (generate_content_async) get one request per text
+            responses = await asyncio.gather(*(self.embedding_model.generate_content_async(text) for text in texts))
+            return [response.embeddings[0].values for response in responses]
+    
+    async def generate(self, prompt: str, prompt_type: str, route: ModelRoute, timeout: Optional[float] = None):
+        """
+        Call the routed model, timing it per model and prompt type; raises
+        asyncio.TimeoutError after timeout
+        """
+        start_time = time.perf_counter()
+        async with metrics.track_vertex_call(route.model_name, prompt_type):
+            call = route.model.generate_content_async(prompt)
+            response = await (call if timeout is None else asyncio.wait_for(call, timeout))
+        self.router.observe(route.model_name, time.perf_counter() - start_time)
+        metrics.observe_prompt_tokens(prompt_type, prompt_token_count(prompt, response))
+        return response
+    
+    def _search_limits(self, state: AgentState) -> Tuple[Optional[Dict], List[str]]:
+        """
+        timeout/terminate_after keyword arguments for a search under the deadline
+        (None when there is no time left to search), and any degradation taken.
+        Search keeps the synthesis reserve back while synthesis can still fit;
+        once it cannot, the recommendation will be templated from the search
+        results and search gets the rest of the budget.
+        """
+        budget = stage_budget(state)
+        if budget is None:
+            return {}, []
+        synthesis_reserve = self._reserve(state, "synthesize")
+        if synthesis_reserve >= self._min_call_seconds("synthesize") + RESPONSE_MARGIN_SECONDS:
+            budget -= synthesis_reserve
+        else:
+            budget -= RESPONSE_MARGIN_SECONDS
+        if budget <= 0.05:
+            return None, ["search_skipped"]
+        limits = {"timeout": budget}
+        # Tight: under TIGHT_SEARCH_SECONDS, or under twice the observed search p95 once known
+        expected = self.expected_node_seconds("search")
+        if budget < (TIGHT_SEARCH_SECONDS if expected is None else min(TIGHT_SEARCH_SECONDS, 2 * expected)):
+            limits["terminate_after"] = SEARCH_TERMINATE_AFTER
+            return limits, ["search_terminate_after"]
+        return limits, []
+    
+    def _analysis_fallback(self, node: str, start_time: float, degradation: str, with_strategy: bool = False) -> Dict:
+        """FALLBACK_ANALYSIS when the analysis LLM call does not fit the deadline"""
+        metrics.record_fallback("analyze")
+        analysis = dict(FALLBACK_ANALYSIS)
+        output = {
+            "incident_analysis": analysis,
+            "agent_steps": [f"{node} ({degradation.replace('_', ' ')}, using fallback)"],
+            "node_timings": {"analyze": time.time() - start_time},
+            "degradations": [degradation]
+        }
+        if with_strategy:
+            output["search_strategy"] = build_search_strategy(analysis)
+        return output
         
-    def analyze_incident(self, state: AgentState) -> AgentState:
+    async def analyze_incident(self, state: AgentState) -> Dict:
         """Analyzer Agent: Extract key information from incident description"""
         logger.info(f"🔍 Analyzer Agent: Processing incident {state['request_id']}")
         start_time = time.time()
+        budget = stage_budget(state, self._reserve(state, "search", "synthesize"))
+        if budget is not None and budget < self._min_call_seconds("analyze"):
+            return self._analysis_fallback("analyze_incident", start_time, "analysis_skipped")
         
         try:
             prompt = f"""
@@ -69,53 +356,54 @@ Rules:
 Return ONLY the JSON object, no other text.
 """
             
-            response = self.model.generate_content(prompt)
+            route = self.router.select("analyze", budget=budget)
+            response = await self.generate(prompt, "analysis", route, timeout=budget)
             response_text = response.text.strip()
-            
-            # Clean up response (remove markdown if present)
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-            elif response_text.startswith("```"):
-                response_text = response_text.replace("```", "").strip()
-            
-            analysis = json.loads(response_text)
+            analysis = parse_json_response(response_text)
             
             elapsed = time.time() - start_time
-            logger.info(f"✅ Analysis complete in {elapsed:.2f}s: {analysis['severity']} {analysis['incident_type']}")
+            logger.info(f"✅ Analysis complete in {elapsed:.2f}s ({route.model_name}): {analysis['severity']} {analysis['incident_type']}")
+            self._observe_node("analyze", elapsed)
             
             return {
-                **state,
                 "incident_analysis": analysis,
                 "agent_steps": [f"analyze_incident ({elapsed:.2f}s)"],
-                "errors": []
+                "node_timings": {"analyze": elapsed},
+                "model_routes": {"analyze": route.model_name},
+                "prompt_tokens": {"analyze": prompt_token_count(prompt, response)}
             }
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse analysis JSON: {e}")
             logger.error(f"Response was: {response_text}")
             # Provide fallback analysis
+            metrics.record_fallback("analyze")
             return {
-                **state,
-                "incident_analysis": {
-                    "severity": "P2",
-                    "incident_type": "application",
-                    "key_symptoms": ["error detected"],
-                    "technical_terms": [],
-                    "affected_systems": ["unknown"],
-                    "urgency_score": 5,
-                    "summary": "Unable to fully analyze incident"
-                },
+                "incident_analysis": dict(FALLBACK_ANALYSIS),
                 "agent_steps": ["analyze_incident (failed, using fallback)"],
+                "node_timings": {"analyze": time.time() - start_time},
                 "errors": [f"Analysis parsing error: {str(e)}"]
             }
+        except asyncio.TimeoutError:
+            logger.warning(f"Analysis for {state['request_id']} ran out of deadline budget ({budget:.1f}s)")
+            return self._analysis_fallback("analyze_incident", start_time, "analysis_timeout")
         except Exception as e:
             logger.error(f"Analysis error: {e}")
             raise
     
-    def create_search_strategy(self, state: AgentState) -> AgentState:
+    async def create_search_strategy(self, state: AgentState) -> Dict:
         """Strategy Agent: Determine how to search for solutions"""
         logger.info(f"🎯 Strategy Agent: Planning search for {state['request_id']}")
         start_time = time.time()
+        budget = stage_budget(state, self._reserve(state, "search", "synthesize"))
+        if budget is not None and budget < self._min_call_seconds("strategize"):
+            # Not worth an LLM call: the local strategy builder is instant
+            return {
+                "search_strategy": build_search_strategy(state['incident_analysis']),
+                "agent_steps": ["create_search_strategy (skipped for deadline, local strategy)"],
+                "node_timings": {"strategize": time.time() - start_time},
+                "degradations": ["strategy_skipped"]
+            }
         
         try:
             analysis = state['incident_analysis']
@@ -141,119 +429,308 @@ Focus on:
 Return ONLY the JSON object, no other text.
 """
             
-            response = self.model.generate_content(prompt)
+            route = self.router.select("strategize", analysis.get('severity'), budget)
+            response = await self.generate(prompt, "strategy", route, timeout=budget)
             response_text = response.text.strip()
+            strategy = parse_json_response(response_text)
             
-            # Clean up response
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-            elif response_text.startswith("```"):
-                response_text = response_text.replace("```", "").strip()
+            elapsed = time.time() - start_time
+            logger.info(f"✅ Strategy created in {elapsed:.2f}s ({route.model_name})")
+            self._observe_node("strategize", elapsed)
+            
+            return {
+                "search_strategy": strategy,
+                "agent_steps": [f"create_search_strategy ({elapsed:.2f}s)"],
+                "node_timings": {"strategize": elapsed},
+                "model_routes": {"strategize": route.model_name},
+                "prompt_tokens": {"strategize": prompt_token_count(prompt, response)}
+            }
             
-            strategy = json.loads(response_text)
+        except Exception as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            if timed_out:
+                logger.warning(f"Strategy for {state['request_id']} ran out of deadline budget ({budget:.1f}s)")
+            else:
+                logger.error(f"Strategy error: {e}")
+            # Fallback strategy
+            metrics.record_fallback("strategize")
+            output = {
+                "search_strategy": build_search_strategy(state['incident_analysis']),
+                "agent_steps": ["create_search_strategy (fallback)"],
+                "node_timings": {"strategize": time.time() - start_time}
+            }
+            if timed_out:
+                output["degradations"] = ["strategy_timeout"]
+            else:
+                output["errors"] = [f"Strategy error: {str(e)}"]
+            return output
+    
+    async def analyze_and_strategize(self, state: AgentState) -> Dict:
+        """Fast-mode Analyzer Agent: one LLM call returns both the analysis and the search strategy"""
+        logger.info(f"⚡ Fast Analyzer Agent: Processing incident {state['request_id']}")
+        start_time = time.time()
+        response_text = ""
+        budget = stage_budget(state, self._reserve(state, "search", "synthesize"))
+        if budget is not None and budget < self._min_call_seconds("analyze"):
+            return self._analysis_fallback("analyze_and_strategize", start_time, "analysis_skipped", with_strategy=True)
+        
+        try:
+            prompt = f"""
+You are an expert DevOps engineer analyzing a production incident and planning a search for similar past incidents.
+
+Incident Description:
+{state['incident_description']}
+
+Return ONLY a valid JSON object with exactly these two keys:
+{{
+    "analysis": {{
+        "severity": "P0 or P1 or P2 or P3",
+        "incident_type": "database or network or application or infrastructure or security",
+        "key_symptoms": ["symptom1", "symptom2"],
+        "technical_terms": ["term1", "term2"],
+        "affected_systems": ["system1", "system2"],
+        "urgency_score": 8,
+        "summary": "one-sentence technical summary"
+    }},
+    "search_strategy": {{
+        "primary_search_terms": ["term1", "term2", "term3"],
+        "search_filters": {{"incident_type": "database"}},
+        "search_priority": "past_incidents or documentation or logs"
+    }}
+}}
+
+Rules:
+- severity must be exactly one of: P0, P1, P2, P3
+- incident_type must be exactly one of: database, network, application, infrastructure, security
+- urgency_score must be an integer between 1-10
+- Extract actual technical terms, error codes, and system names
+- primary_search_terms should be error codes, exception names and system components that will find similar incidents
+- Be precise and technical
+
+Return ONLY the JSON object, no other text.
+"""
+            
+            route = self.router.select("analyze", budget=budget)
+            response = await self.generate(prompt, "analysis_strategy", route, timeout=budget)
+            response_text = response.text.strip()
+            result = parse_json_response(response_text)
+            
+            analysis = result['analysis']
+            strategy = build_search_strategy(analysis, result.get('search_strategy'))
             
             elapsed = time.time() - start_time
-            logger.info(f"✅ Strategy created in {elapsed:.2f}s")
+            logger.info(f"✅ Analysis and strategy complete in {elapsed:.2f}s ({route.model_name}): {analysis['severity']} {analysis['incident_type']}")
+            self._observe_node("analyze", elapsed)
             
             return {
-                **state,
+                "incident_analysis": analysis,
                 "search_strategy": strategy,
-                "agent_steps": [f"create_search_strategy ({elapsed:.2f}s)"]
+                "agent_steps": [f"analyze_and_strategize ({elapsed:.2f}s)"],
+                "node_timings": {"analyze": elapsed},
+                "model_routes": {"analyze": route.model_name},
+                "prompt_tokens": {"analyze": prompt_token_count(prompt, response)}
+            }
+            
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.error(f"Failed to parse fast analysis JSON: {e}")
+            logger.error(f"Response was: {response_text}")
+            metrics.record_fallback("analyze")
+            analysis = dict(FALLBACK_ANALYSIS)
+            return {
+                "incident_analysis": analysis,
+                "search_strategy": build_search_strategy(analysis),
+                "agent_steps": ["analyze_and_strategize (failed, using fallback)"],
+                "node_timings": {"analyze": time.time() - start_time},
+                "errors": [f"Analysis parsing error: {str(e)}"]
+            }
+        except asyncio.TimeoutError:
+            logger.warning(f"Fast analysis for {state['request_id']} ran out of deadline budget ({budget:.1f}s)")
+            return self._analysis_fallback("analyze_and_strategize", start_time, "analysis_timeout", with_strategy=True)
+    
+    async def generate_query_embedding(self, state: AgentState) -> Dict:
+        """Embedding Agent: Embed the raw incident description (runs alongside analysis)"""
+        logger.info(f"🧬 Embedding Agent: Embedding incident {state['request_id']}")
+        start_time = time.time()
+        
+        budget = stage_budget(state, self._reserve(state, "search", "synthesize"))
+        try:
+            if budget is None:
+                query_vector = await self.embed_text(state['incident_description'])
+            else:
+                query_vector = await asyncio.wait_for(self.embed_text(state['incident_description']), max(budget, 0.5))
+            
+            elapsed = time.time() - start_time
+            logger.info(f"✅ Embedding generated in {elapsed:.2f}s")
+            
+            return {
+                "query_vector": query_vector,
+                "agent_steps": [f"generate_query_embedding ({elapsed:.2f}s)"],
+                "node_timings": {"embed": elapsed}
             }
             
+        except asyncio.TimeoutError:
+            logger.warning(f"Embedding for {state['request_id']} ran out of deadline budget")
+            return {
+                "query_vector": [],
+                "agent_steps": ["generate_query_embedding (deadline, keyword search only)"],
+                "node_timings": {"embed": time.time() - start_time},
+                "degradations": ["embedding_timeout"]
+            }
         except Exception as e:
-            logger.error(f"Strategy error: {e}")
-            # Fallback strategy
+            logger.error(f"Embedding error: {e}")
             return {
-                **state,
-                "search_strategy": {
-                    "primary_search_terms": state['incident_analysis'].get('technical_terms', []),
-                    "search_filters": {"incident_type": state['incident_analysis']['incident_type']},
-                    "search_priority": "past_incidents"
-                },
-                "agent_steps": ["create_search_strategy (fallback)"],
-                "errors": [f"Strategy error: {str(e)}"]
+                "query_vector": [],
+                "agent_steps": ["generate_query_embedding (failed)"],
+                "node_timings": {"embed": time.time() - start_time},
+                "errors": [f"Embedding error: {str(e)}"]
+            }
+    
+    async def execute_candidate_search(self, state: AgentState) -> Dict:
+        """Candidate Agent: Vector-only first-pass search that needs no analysis"""
+        logger.info(f"🧲 Candidate Agent: Vector search for {state['request_id']}")
+        start_time = time.time()
+        
+        query_vector = state.get('query_vector') or []
+        if not query_vector:
+            return {
+                "vector_candidates": [],
+                "agent_steps": ["execute_candidate_search (skipped, no embedding)"],
+                "node_timings": {"candidate_search": time.time() - start_time}
+            }
+        
+        limits, degradations = self._search_limits(state)
+        if limits is None:
+            return {
+                "vector_candidates": [],
+                "agent_steps": ["execute_candidate_search (skipped for deadline)"],
+                "node_timings": {"candidate_search": time.time() - start_time},
+                "degradations": ["candidate_search_skipped"]
+            }
+        
+        try:
+            candidates = await self.search_engine.hybrid_search(
+                query_text="",
+                query_vector=query_vector,
+                filters=None,
+                size=10,
+                vector_boost=1.0,
+                **limits
+            )
+            
+            elapsed = time.time() - start_time
+            logger.info(f"✅ Candidate search complete in {elapsed:.2f}s: {len(candidates)} candidates")
+            
+            return {
+                "vector_candidates": candidates,
+                "agent_steps": [f"execute_candidate_search ({elapsed:.2f}s, {len(candidates)} candidates)"],
+                "node_timings": {"candidate_search": elapsed}
+            }
+            
+        except Exception as e:
+            logger.error(f"Candidate search error: {e}")
+            return {
+                "vector_candidates": [],
+                "agent_steps": ["execute_candidate_search (failed)"],
+                "node_timings": {"candidate_search": time.time() - start_time},
+                "errors": [f"Candidate search error: {str(e)}"]
             }
     
-    def execute_search(self, state: AgentState) -> AgentState:
-        """Search Agent: Execute hybrid search"""
+    async def execute_search(self, state: AgentState) -> Dict:
+        """
+        Search Agent: fan the strategy out into sub-queries (one _msearch on
+        engines with multi_query_search) and fuse them with the vector candidates
+        """
         logger.info(f"🔎 Search Agent: Executing search for {state['request_id']}")
         start_time = time.time()
+        strategy = state.get('search_strategy', {})
+        filters = strategy.get('search_filters', {})
+        # The candidate search ran before the strategy existed, so it is unfiltered
+        candidates = [c for c in state.get('vector_candidates') or [] if matches_filters(c, filters)]
+        limits, degradations = self._search_limits(state)
+        if limits is None:
+            return {
+                "search_results": candidates,
+                "agent_steps": ["execute_search (skipped for deadline, using vector candidates)"],
+                "node_timings": {"search": time.time() - start_time},
+                "degradations": degradations
+            }
         
         try:
-            # Generate embedding for semantic search
-            embedding_text = state['incident_description']
-            embedding_response = self.embedding_model.generate_content(embedding_text)
-            query_vector = embedding_response.embeddings[0].values
+            # Reuse the embedding computed in parallel with analysis
+            query_vector = state.get('query_vector') or []
             
             # Prepare search query
-            strategy = state.get('search_strategy', {})
             search_terms = strategy.get('primary_search_terms', [])
             search_text = " ".join(search_terms + state['incident_analysis'].get('technical_terms', []))
             
-            filters = strategy.get('search_filters', {})
+            if hasattr(self.search_engine, "multi_query_search"):
+                sub_queries = build_sub_queries(
+                    state['incident_description'], state['incident_analysis'], strategy, query_vector
+                )
+                hybrid_results = await self.search_engine.multi_query_search(sub_queries, filters=filters, size=10, **limits)
+            else:
+                hybrid_results = await self.search_engine.hybrid_search(
+                    query_text=search_text,
+                    query_vector=query_vector,
+                    filters=filters,
+                    size=10,
+                    keyword_boost=1.0,
+                    vector_boost=2.0,
+                    **limits
+                )
             
-            # Execute hybrid search
-            results = self.search_engine.hybrid_search(
-                query_text=search_text,
-                query_vector=query_vector,
-                filters=filters,
-                size=10,
-                keyword_boost=1.0,
-                vector_boost=2.0
-            )
+            # Fuse strategy-driven results with the vector candidates that pass its filters
+            results = reciprocal_rank_fusion([hybrid_results, candidates], size=10)
             
             elapsed = time.time() - start_time
             logger.info(f"✅ Search complete in {elapsed:.2f}s: {len(results)} results")
+            self._observe_node("search", elapsed)
             
             return {
-                **state,
                 "search_results": results,
-                "agent_steps": [f"execute_search ({elapsed:.2f}s, {len(results)} results)"]
+                "agent_steps": [f"execute_search ({elapsed:.2f}s, {len(results)} results)"],
+                "node_timings": {"search": elapsed},
+                "degradations": degradations
             }
             
         except Exception as e:
             logger.error(f"Search error: {e}")
+            metrics.record_fallback("search")
             return {
-                **state,
-                "search_results": [],
-                "agent_steps": ["execute_search (failed)"],
+                "search_results": candidates,
+                "agent_steps": ["execute_search (failed, using vector candidates)" if candidates else "execute_search (failed)"],
+                "node_timings": {"search": time.time() - start_time},
                 "errors": [f"Search error: {str(e)}"]
             }
     
-    def synthesize_resolution(self, state: AgentState) -> AgentState:
+    async def synthesize_resolution(self, state: AgentState) -> Dict:
         """Synthesis Agent: Generate actionable resolution recommendation"""
         logger.info(f"🎓 Synthesis Agent: Generating resolution for {state['request_id']}")
         start_time = time.time()
+        budget = stage_budget(state, RESPONSE_MARGIN_SECONDS)
+        if budget is not None and budget < self._min_call_seconds("synthesize"):
+            return self._templated_resolution(state, start_time, "synthesis_skipped")
         
         try:
-            # Prepare context from top search results
-            top_results = state['search_results'][:5]
-            
-            if not top_results:
-                results_context = "No similar incidents found in database."
-            else:
-                results_context = "\n\n".join([
-                    f"Similar Incident {i+1} (Similarity: {r['similarity_score']:.2f}):\n"
-                    f"ID: {r['incident_id']}\n"
-                    f"Title: {r['title']}\n"
-                    f"Type: {r['incident_type']}, Severity: {r['severity']}\n"
-                    f"Resolution: {r['resolution_steps'][:300]}...\n"
-                    f"Time to resolve: {r['resolution_time_minutes']} minutes"
-                    for i, r in enumerate(top_results)
-                ])
+            # Budgeted context: deduplicated, diversified results packed most informative field first
+            context = build_synthesis_context(
+                state['incident_description'],
+                state['incident_analysis'],
+                state['search_results'],
+                token_budget=self.synthesis_context_tokens
+            )
             
             prompt = f"""
 You are an expert DevOps engineer providing incident resolution guidance.
 
 Current Incident:
-{state['incident_description']}
+{context['incident']}
 
 Incident Analysis:
-{json.dumps(state['incident_analysis'], indent=2)}
+{context['analysis']}
 
 Similar Past Incidents:
-{results_context}
+{context['results_context']}
 
 Provide a comprehensive resolution recommendation as JSON:
 {{
@@ -279,31 +756,31 @@ Requirements:
 Return ONLY the JSON object, no other text.
 """
             
-            response = self.model.generate_content(prompt)
+            route = self.router.select("synthesize", state['incident_analysis'].get('severity'), budget)
+            response = await self.generate(prompt, "synthesis", route, timeout=budget)
             response_text = response.text.strip()
-            
-            # Clean up response
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-            elif response_text.startswith("```"):
-                response_text = response_text.replace("```", "").strip()
-            
-            recommendation = json.loads(response_text)
+            recommendation = parse_json_response(response_text)
             
             elapsed = time.time() - start_time
-            logger.info(f"✅ Resolution synthesized in {elapsed:.2f}s (confidence: {recommendation['confidence_score']:.2f})")
+            logger.info(f"✅ Resolution synthesized in {elapsed:.2f}s ({route.model_name}, confidence: {recommendation['confidence_score']:.2f})")
+            self._observe_node("synthesize", elapsed)
             
             return {
-                **state,
                 "resolution_recommendation": recommendation,
-                "agent_steps": [f"synthesize_resolution ({elapsed:.2f}s)"]
+                "agent_steps": [f"synthesize_resolution ({elapsed:.2f}s)"],
+                "node_timings": {"synthesize": elapsed},
+                "model_routes": {"synthesize": route.model_name},
+                "prompt_tokens": {"synthesize": prompt_token_count(prompt, response)}
             }
             
+        except asyncio.TimeoutError:
+            logger.warning(f"Synthesis for {state['request_id']} ran out of deadline budget ({budget:.1f}s)")
+            return self._templated_resolution(state, start_time, "synthesis_timeout")
         except Exception as e:
             logger.error(f"Synthesis error: {e}")
             # Provide fallback recommendation
+            metrics.record_fallback("synthesize")
             return {
-                **state,
                 "resolution_recommendation": {
                     "immediate_actions": ["Check system logs", "Verify service health", "Review recent deployments"],
                     "root_cause_hypothesis": "Unable to determine specific root cause without similar incidents",
@@ -316,29 +793,60 @@ Return ONLY the JSON object, no other text.
                     "risk_assessment": "medium"
                 },
                 "agent_steps": ["synthesize_resolution (fallback)"],
+                "node_timings": {"synthesize": time.time() - start_time},
                 "errors": [f"Synthesis error: {str(e)}"]
             }
+    
+    def _templated_resolution(self, state: AgentState, start_time: float, degradation: str) -> Dict:
+        metrics.record_fallback("synthesize")
+        return {
+            "resolution_recommendation": templated_recommendation(state['incident_analysis'], state.get('search_results') or []),
+            "agent_steps": [f"synthesize_resolution ({degradation.replace('_', ' ')}, templated from search results)"],
+            "node_timings": {"synthesize": time.time() - start_time},
+            "degradations": [degradation]
+        }
 
-def create_workflow(search_engine, project_id: str, region: str) -> StateGraph:
+def create_workflow(search_engine, project_id: str, region: str, mode: str = WorkflowMode.FULL) -> StateGraph:
     """Create the LangGraph workflow"""
     agent = DevOpsOracleAgent(search_engine, project_id, region)
+    return build_workflow(agent, mode)
+
+def build_workflow(agent: DevOpsOracleAgent, mode: str = WorkflowMode.FULL) -> StateGraph:
+    """
+    Compile the LangGraph workflow around an existing agent.
     
+    FULL runs analyze -> strategize as two LLM calls; FAST replaces both with a
+    single analyze_and_strategize call.
+    """
     # Create graph
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("analyze", agent.analyze_incident)
-    workflow.add_node("strategize", agent.create_search_strategy)
+    if mode == WorkflowMode.FAST:
+        workflow.add_node("analyze", agent.analyze_and_strategize)
+    else:
+        workflow.add_node("analyze", agent.analyze_incident)
+        workflow.add_node("strategize", agent.create_search_strategy)
+    workflow.add_node("embed", agent.generate_query_embedding)
+    workflow.add_node("candidate_search", agent.execute_candidate_search)
     workflow.add_node("search", agent.execute_search)
     workflow.add_node("synthesize", agent.synthesize_resolution)
     
-    # Define edges (linear flow)
-    workflow.add_edge("analyze", "strategize")
-    workflow.add_edge("strategize", "search")
+    # Define edges: the embedding and vector-only candidate search depend only on
+    # the raw description, so they run in parallel with the analysis branch
+    workflow.add_edge(START, "analyze")
+    workflow.add_edge(START, "embed")
+    workflow.add_edge("embed", "candidate_search")
+    
+    if mode == WorkflowMode.FAST:
+        analysis_branch_end = "analyze"
+    else:
+        workflow.add_edge("analyze", "strategize")
+        analysis_branch_end = "strategize"
+    
+    # Join both branches, fuse, then synthesize
+    workflow.add_edge([analysis_branch_end, "candidate_search"], "search")
     workflow.add_edge("search", "synthesize")
     workflow.add_edge("synthesize", END)
     
-    # Set entry point
-    workflow.set_entry_point("analyze")
-    
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile()
@@ -0,0 +1,304 @@
+"""
+Batch analysis for alert storms
+
+An outage fires many related alerts at once. Rather than running one workflow
+per alert, a batch is analyzed in stages that share work across items:
+
+1. exact duplicates (same normalized description) are folded together
+2. the remaining descriptions are embedded in one multi-input request
+3. near-identical descriptions (cosine >= dedup threshold) are folded into
+   the first one, and representatives are checked against the response cache
+4. representatives get their LLM analysis concurrently
+5. every representative's candidate and strategy searches go out in one
+   multi_search (a single Elasticsearch _msearch)
+6. synthesis runs concurrently; each result is emitted, with its duplicates,
+   as soon as it is ready
+"""
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from app import metrics
+from app.models import WorkflowMode
+from app.response_cache import ResponseCache, description_hash, error_numbers
+from app.agent_workflow import build_sub_queries
+from app.search_engine import reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+# LLM calls one workflow makes per incident
+LLM_CALLS_PER_ITEM = {WorkflowMode.FULL: 3, WorkflowMode.FAST: 2}
+SEARCH_SIZE = 10
+
+class BatchItem:
+    def __init__(self, index: int, description: str):
+        self.index = index
+        self.description = description
+        self.vector: Optional[List[float]] = None
+        self.duplicate_of: Optional[int] = None
+        self.similarity: Optional[float] = None
+        self.state: Dict = {}
+
+class BatchAnalyzer:
+    """
+    Runs one batch through the shared stages and yields events as items finish:
+    {"kind": "result", "item", "state"} for representatives that ran the
+    workflow, {"kind": "cached", "item", "entry", "tier", "similarity"} for
+    response cache hits, {"kind": "error", "item", "error"}, and
+    {"kind": "duplicate", "item", "of"} right after the item it duplicates.
+    """
+    
+    def __init__(
+        self,
+        agent,
+        response_cache: Optional[ResponseCache] = None,
+        dedup_threshold: float = 0.97,
+        max_concurrency: int = 8,
+        workflow_mode: WorkflowMode = WorkflowMode.FULL,
+        bypass_cache: bool = False
+    ):
+        self.agent = agent
+        self.response_cache = None if bypass_cache else response_cache
+        self.dedup_threshold = dedup_threshold
+        self.llm_slots = asyncio.Semaphore(max_concurrency)
+        self.workflow_mode = WorkflowMode(workflow_mode)
+        self.counts = {
+            "items": 0, "unique": 0, "duplicates": 0, "cache_hits": 0, "errors": 0,
+            "llm_calls": 0, "embedding_requests": 0, "search_requests": 0
+        }
+    
+    def summary(self) -> Dict:
+        """Work done for the batch next to what N single requests would have cost"""
+        items = self.counts["items"]
+        return {
+            **self.counts,
+            "single_call_llm_calls": items * LLM_CALLS_PER_ITEM[self.workflow_mode],
+            "single_call_embedding_requests": items,
+            "single_call_search_requests": items * 2
+        }
+    
+    async def run(self, descriptions: List[str], batch_id: str) -> AsyncIterator[Dict]:
+        items = [BatchItem(i, description) for i, description in enumerate(descriptions)]
+        self.counts["items"] = len(items)
+        duplicates: Dict[int, List[BatchItem]] = {}
+        
+        def emit_with_duplicates(event: Dict) -> List[Dict]:
+            index = event["item"].index
+            return [event] + [{"kind": "duplicate", "item": dup, "of": index} for dup in duplicates.get(index, [])]
+        
+        # Exact duplicates, on the same normalized form the response cache uses
+        # (volatile ids masked; status codes, exit codes and ports kept)
+        first_by_hash = {}
+        representatives = []
+        for item in items:
+            key = description_hash(item.description)
+            if key in first_by_hash:
+                item.duplicate_of, item.similarity = first_by_hash[key].index, 1.0
+                duplicates.setdefault(item.duplicate_of, []).append(item)
+            else:
+                first_by_hash[key] = item
+                representatives.append(item)
+        
+        pending = []
+        for item in representatives:
+            entry = self.response_cache.lookup_exact(item.description) if self.response_cache else None
+            if entry is not None:
+                self.counts["cache_hits"] += 1
+                for event in emit_with_duplicates({"kind": "cached", "item": item, "entry": entry, "tier": "exact", "similarity": 1.0}):
+                    yield event
+            else:
+                pending.append(item)
+        
+        # One embedding request for every description still pending
+        if pending:
+            try:
+                vectors = await self.agent.embed_texts([item.description for item in pending])
+                self.counts["embedding_requests"] += 1
+                for item, vector in zip(pending, vectors):
+                    item.vector = vector
+            except Exception as e:
+                logger.warning(f"Batch {batch_id}: embedding failed, continuing without vectors: {e}")
+        
+        pending = self._fold_near_duplicates(pending, duplicates)
+        
+        workers = []
+        for item in pending:
+            match = self.response_cache.lookup_semantic(item.vector, item.description) if self.response_cache and item.vector else None
+            if match:
+                entry, similarity = match
+                self.counts["cache_hits"] += 1
+                for event in emit_with_duplicates({"kind": "cached", "item": item, "entry": entry, "tier": "semantic", "similarity": similarity}):
+                    yield event
+            else:
+                workers.append(item)
+        self.counts["duplicates"] = sum(len(dups) for dups in duplicates.values())
+        self.counts["unique"] = self.counts["items"] - self.counts["duplicates"]
+        
+        # LLM analysis for every representative, then all searches in one round-trip
+        analyzed = await asyncio.gather(*(self._analyze(item, batch_id) for item in workers))
+        ready = []
+        for item, error in zip(workers, analyzed):
+            if error:
+                self.counts["errors"] += 1
+                for event in emit_with_duplicates({"kind": "error", "item": item, "error": error}):
+                    yield event
+            else:
+                ready.append(item)
+        await self._search(ready)
+        
+        synthesis = [asyncio.ensure_future(self._synthesize(item)) for item in ready]
+        for finished in asyncio.as_completed(synthesis):
+            item = await finished
+            for event in emit_with_duplicates({"kind": "result", "item": item, "state": item.state}):
+                yield event
+    
+    def _fold_near_duplicates(self, pending: List[BatchItem], duplicates: Dict[int, List[BatchItem]]) -> List[BatchItem]:
+        """
+        Greedy clustering: an item joins the most similar earlier representative
+        above the threshold that reports the same error numbers. Embeddings of
+        "HTTP 502" and "HTTP 504" alerts are nearly identical, so similarity
+        alone would fold distinct errors together.
+        """
+        kept: List[BatchItem] = []
+        with_vectors: List[BatchItem] = []
+        unit_vectors = []
+        for item in pending:
+            if not item.vector:
+                kept.append(item)
+                continue
+            vector = np.asarray(item.vector, dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            vector = vector / norm if norm else vector
+            if unit_vectors:
+                similarities = np.vstack(unit_vectors) @ vector
+                numbers = error_numbers(item.description)
+                similarities[[error_numbers(r.description) != numbers for r in with_vectors]] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.dedup_threshold:
+                    representative = with_vectors[best]
+                    item.duplicate_of, item.similarity = representative.index, float(similarities[best])
+                    duplicates.setdefault(representative.index, []).append(item)
+                    # Exact duplicates of this item follow it to the representative
+                    for duplicate in duplicates.pop(item.index, []):
+                        duplicate.duplicate_of = representative.index
+                        duplicates[representative.index].append(duplicate)
+                    continue
+            unit_vectors.append(vector)
+            with_vectors.append(item)
+            kept.append(item)
+        return kept
+    
+    def _initial_state(self, item: BatchItem, batch_id: str) -> Dict:
+        return {
+            "incident_description": item.description,
+            "request_id": f"{batch_id}-{item.index}",
+            "query_vector": item.vector or [],
+            "node_timings": {},
+            "agent_steps": [],
+            "errors": []
+        }
+    
+    @staticmethod
+    def _merge(state: Dict, output: Dict):
+        for key, value in output.items():
+            # The same reducers AgentState declares: merge_dicts and operator.add
+            if key in ("node_timings", "model_routes", "prompt_tokens"):
+                state[key] = {**state.get(key, {}), **value}
+            elif key in ("agent_steps", "errors", "degradations"):
+                state[key] = state.get(key, []) + value
+            else:
+                state[key] = value
+    
+    async def _analyze(self, item: BatchItem, batch_id: str) -> Optional[str]:
+        """Analysis (and strategy) for one representative; returns an error message on failure"""
+        item.state = self._initial_state(item, batch_id)
+        try:
+            async with self.llm_slots:
+                if self.workflow_mode == WorkflowMode.FAST:
+                    self.counts["llm_calls"] += 1
+                    self._merge(item.state, await self.agent.analyze_and_strategize(item.state))
+                else:
+                    self.counts["llm_calls"] += 1
+                    self._merge(item.state, await self.agent.analyze_incident(item.state))
+                    self.counts["llm_calls"] += 1
+                    self._merge(item.state, await self.agent.create_search_strategy(item.state))
+            return None
+        except Exception as e:
+            logger.error(f"Batch item {item.state['request_id']} analysis failed: {e}")
+            return f"Analysis failed: {e}"
+    
+    def _queries(self, item: BatchItem, fan_out: bool) -> List[Dict]:
+        """The vector-only candidate search and the strategy-driven search of execute_search"""
+        strategy = item.state.get('search_strategy', {})
+        analysis = item.state['incident_analysis']
+        if fan_out:
+            queries = [{
+                "sub_queries": build_sub_queries(item.description, analysis, strategy, item.vector or []),
+                "filters": strategy.get('search_filters', {}),
+                "size": SEARCH_SIZE
+            }]
+        else:
+            search_text = " ".join(strategy.get('primary_search_terms', []) + analysis.get('technical_terms', []))
+            queries = [{
+                "query_text": search_text,
+                "query_vector": item.vector or [],
+                "filters": strategy.get('search_filters', {}),
+                "size": SEARCH_SIZE,
+                "keyword_boost": 1.0,
+                "vector_boost": 2.0
+            }]
+        if item.vector:
+            # The strategy is known here, so the candidate leg takes its filters too
+            queries.append({
+                "query_text": "",
+                "query_vector": item.vector,
+                "filters": strategy.get('search_filters', {}),
+                "size": SEARCH_SIZE,
+                "vector_boost": 1.0
+            })
+        return queries
+    
+    async def _search(self, items: List[BatchItem]):
+        if not items:
+            return
+        start_time = time.time()
+        search_engine = self.agent.search_engine
+        plans = [self._queries(item, hasattr(search_engine, "multi_query_search")) for item in items]
+        queries = [query for plan in plans for query in plan]
+        try:
+            if hasattr(search_engine, "multi_search"):
+                results = await search_engine.multi_search(queries)
+            else:
+                results = await asyncio.gather(*(search_engine.hybrid_search(**query) for query in queries))
+            self.counts["search_requests"] += 1
+            error = None
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}")
+            metrics.record_fallback("search")
+            results = [[] for _ in queries]
+            error = f"Search error: {e}"
+        
+        elapsed = time.time() - start_time
+        position = 0
+        for item, plan in zip(items, plans):
+            hybrid_results, *candidates = results[position:position + len(plan)]
+            position += len(plan)
+            output = {
+                "vector_candidates": candidates[0] if candidates else [],
+                "search_results": reciprocal_rank_fusion([hybrid_results] + candidates, size=SEARCH_SIZE),
+                "agent_steps": [f"batch_search ({elapsed:.2f}s, {len(items)} incidents in one request)"],
+                "node_timings": {"search": elapsed}
+            }
+            if error:
+                output["errors"] = [error]
+            self._merge(item.state, output)
+    
+    async def _synthesize(self, item: BatchItem) -> BatchItem:
+        async with self.llm_slots:
+            self.counts["llm_calls"] += 1
+            self._merge(item.state, await self.agent.synthesize_resolution(item.state))
+        metrics.observe_node_timings(item.state.get('node_timings'))
+        return item
@@ -0,0 +1,401 @@
+"""
+In-memory BM25 keyword engine mirroring the Elasticsearch index, so ranking can
+be tested and benchmarked offline.
+
+Analysis follows elasticsearch_setup.INDEX_MAPPING: technical_analyzer
+(standard tokenizer, lowercase, English stop words, Porter stemming) for the
+analyzed text fields, the plain standard analyzer for root_cause and exact
+matching for the technical_terms keyword field. Scoring follows Lucene's
+BM25Similarity (k1=1.2, b=0.75) and multi_match best_fields (max over boosted
+fields, tie_breaker 0). Fuzzy expansion ("fuzziness": "AUTO") is not mirrored.
+
+Postings are stored per field in CSR layout: indptr[term] .. indptr[term + 1]
+slices into parallel int32 document id and uint8 term frequency arrays.
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+from app.search_engine import KEYWORD_FIELDS
+
+# Lucene EnglishAnalyzer.ENGLISH_STOP_WORDS_SET (the "_english_" stop list)
+ENGLISH_STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+    "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+    "they", "this", "to", "was", "will", "with"
+])
+
+# Approximates the UAX#29 standard tokenizer: letters/digits/underscore runs,
+# joined across '.' and apostrophes (java.sql.SQLException, 10.0.0.12, don't)
+_TOKEN = re.compile(r"\w+(?:[.'’]\w+)*")
+
+K1 = 1.2
+B = 0.75
+
+# "title^3" -> {"title": 3.0}: the same fields and boosts as the ES keyword leg
+FIELD_BOOSTS = {
+    field.split("^")[0]: float(field.split("^")[1]) if "^" in field else 1.0
+    for field in KEYWORD_FIELDS
+}
+
+class PorterStemmer:
+    """The original Porter (1980) algorithm, as used by Lucene's porter_stem filter"""
+    
+    def _cons(self, i: int) -> bool:
+        ch = self.b[i]
+        if ch in "aeiou":
+            return False
+        if ch == "y":
+            return i == 0 or not self._cons(i - 1)
+        return True
+    
+    def _m(self) -> int:
+        """Number of consonant-vowel sequences in b[0..j]"""
+        n = 0
+        i = 0
+        while True:
+            if i > self.j:
+                return n
+            if not self._cons(i):
+                break
+            i += 1
+        i += 1
+        while True:
+            while True:
+                if i > self.j:
+                    return n
+                if self._cons(i):
+                    break
+                i += 1
+            i += 1
+            n += 1
+            while True:
+                if i > self.j:
+                    return n
+                if not self._cons(i):
+                    break
+                i += 1
+            i += 1
+    
+    def _vowel_in_stem(self) -> bool:
+        return any(not self._cons(i) for i in range(self.j + 1))
+    
+    def _doublec(self, j: int) -> bool:
+        return j >= 1 and self.b[j] == self.b[j - 1] and self._cons(j)
+    
+    def _cvc(self, i: int) -> bool:
+        if i < 2 or not self._cons(i) or self._cons(i - 1) or not self._cons(i - 2):
+            return False
+        return self.b[i] not in "wxy"
+    
+    def _ends(self, s: str) -> bool:
+        length = len(s)
+        if length > self.k + 1 or self.b[self.k - length + 1:self.k + 1] != s:
+            return False
+        self.j = self.k - length
+        return True
+    
+    def _setto(self, s: str):
+        self.b = self.b[:self.j + 1] + s + self.b[self.k + 1:]
+        self.k = self.j + len(s)
+    
+    def _r(self, s: str):
+        if self._m() > 0:
+            self._setto(s)
+    
+    def _step1ab(self):
+        if self.b[self.k] == "s":
+            if self._ends("sses"):
+                self.k -= 2
+            elif self._ends("ies"):
+                self._setto("i")
+            elif self.b[self.k - 1] != "s":
+                self.k -= 1
+        if self._ends("eed"):
+            if self._m() > 0:
+                self.k -= 1
+        elif (self._ends("ed") or self._ends("ing")) and self._vowel_in_stem():
+            self.k = self.j
+            if self._ends("at"):
+                self._setto("ate")
+            elif self._ends("bl"):
+                self._setto("ble")
+            elif self._ends("iz"):
+                self._setto("ize")
+            elif self._doublec(self.k):
+                self.k -= 1
+                if self.b[self.k] in "lsz":
+                    self.k += 1
+            else:
+                self.j = self.k
+                if self._m() == 1 and self._cvc(self.k):
+                    self._setto("e")
+    
+    def _step1c(self):
+        if self._ends("y") and self._vowel_in_stem():
+            self.b = self.b[:self.k] + "i" + self.b[self.k + 1:]
+    
+    _STEP2 = {
+        "a": [("ational", "ate"), ("tional", "tion")],
+        "c": [("enci", "ence"), ("anci", "ance")],
+        "e": [("izer", "ize")],
+        "l": [("bli", "ble"), ("alli", "al"), ("entli", "ent"), ("eli", "e"), ("ousli", "ous")],
+        "o": [("ization", "ize"), ("ation", "ate"), ("ator", "ate")],
+        "s": [("alism", "al"), ("iveness", "ive"), ("fulness", "ful"), ("ousness", "ous")],
+        "t": [("aliti", "al"), ("iviti", "ive"), ("biliti", "ble")],
+        "g": [("logi", "log")],
+    }
+    
+    _STEP3 = {
+        "e": [("icate", "ic"), ("ative", ""), ("alize", "al")],
+        "i": [("iciti", "ic")],
+        "l": [("ical", "ic"), ("ful", "")],
+        "s": [("ness", "")],
+    }
+    
+    _STEP4 = {
+        "a": ["al"],
+        "c": ["ance", "ence"],
+        "e": ["er"],
+        "i": ["ic"],
+        "l": ["able", "ible"],
+        "n": ["ant", "ement", "ment", "ent"],
+        "s": ["ism"],
+        "t": ["ate", "iti"],
+        "u": ["ous"],
+        "v": ["ive"],
+        "z": ["ize"],
+    }
+    
+    def _step2(self):
+        for suffix, replacement in self._STEP2.get(self.b[self.k - 1], []):
+            if self._ends(suffix):
+                self._r(replacement)
+                return
+    
+    def _step3(self):
+        for suffix, replacement in self._STEP3.get(self.b[self.k], []):
+            if self._ends(suffix):
+                self._r(replacement)
+                return
+    
+    def _step4(self):
+        ch = self.b[self.k - 1]
+        if ch == "o":
+            if self._ends("ion") and self.j >= 0 and self.b[self.j] in "st":
+                pass
+            elif not self._ends("ou"):
+                return
+        elif not any(self._ends(suffix) for suffix in self._STEP4.get(ch, [])):
+            return
+        if self._m() > 1:
+            self.k = self.j
+    
+    def _step5(self):
+        self.j = self.k
+        if self.b[self.k] == "e":
+            a = self._m()
+            if a > 1 or (a == 1 and not self._cvc(self.k - 1)):
+                self.k -= 1
+        if self.b[self.k] == "l" and self._doublec(self.k) and self._m() > 1:
+            self.k -= 1
+    
+    def stem(self, word: str) -> str:
+        if len(word) <= 2:
+            return word
+        self.b = word
+        self.k = len(word) - 1
+        self.j = 0
+        self._step1ab()
+        if self.k > 0:
+            self._step1c()
+            self._step2()
+            self._step3()
+            self._step4()
+            self._step5()
+        return self.b[:self.k + 1]
+
+_stemmer = PorterStemmer()
+_stem_cache = {}
+
+def stem(token: str) -> str:
+    cached = _stem_cache.get(token)
+    if cached is None:
+        cached = _stemmer.stem(token)
+        if len(_stem_cache) < 200000:
+            _stem_cache[token] = cached
+    return cached
+
+def standard_tokens(text: str) -> List[str]:
+    """Standard analyzer: tokenize and lowercase (no stop words)"""
+    return [token.lower() for token in _TOKEN.findall(text or "")]
+
+def technical_tokens(text: str) -> List[str]:
+    """technical_analyzer: standard tokenizer, lowercase, stop, porter_stem"""
+    return [stem(token) for token in standard_tokens(text) if token not in ENGLISH_STOP_WORDS]
+
+def keyword_tokens(value) -> List[str]:
+    """keyword fields are not analyzed: each value is one exact term"""
+    if value is None:
+        return []
+    return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+
+FIELD_ANALYZERS = {
+    "title": technical_tokens,
+    "description": technical_tokens,
+    "error_messages": technical_tokens,
+    "resolution_steps": technical_tokens,
+    "root_cause": standard_tokens,
+    "technical_terms": keyword_tokens
+}
+
+def _field_text(value) -> str:
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+class BM25IndexBuilder:
+    """Accumulates documents, then packs per-field CSR postings"""
+    
+    def __init__(self):
+        self.vocabulary = {}
+        self.count = 0
+        self._terms = {field: array('I') for field in FIELD_BOOSTS}
+        self._docs = {field: array('I') for field in FIELD_BOOSTS}
+        self._tfs = {field: array('B') for field in FIELD_BOOSTS}
+        self._lengths = {field: array('I') for field in FIELD_BOOSTS}
+    
+    def add(self, document: Dict):
+        doc_id = self.count
+        for field, analyzer in FIELD_ANALYZERS.items():
+            value = document.get(field)
+            tokens = analyzer(value) if field == "technical_terms" else analyzer(_field_text(value))
+            self._lengths[field].append(len(tokens))
+            frequencies = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            for token, tf in frequencies.items():
+                term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                self._terms[field].append(term_id)
+                self._docs[field].append(doc_id)
+                self._tfs[field].append(min(tf, 255))
+        self.count += 1
+    
+    def build(self) -> "BM25Index":
+        vocabulary_size = len(self.vocabulary)
+        fields = {}
+        for field in FIELD_BOOSTS:
+            terms = np.frombuffer(self._terms[field], dtype=np.uint32)
+            # Stable sort keeps document ids ascending inside each posting list
+            order = np.argsort(terms, kind="stable")
+            indptr = np.zeros(vocabulary_size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=vocabulary_size), out=indptr[1:])
+            fields[field] = {
+                "indptr": indptr,
+                "doc_ids": np.frombuffer(self._docs[field], dtype=np.uint32)[order].astype(np.int32),
+                "tfs": np.frombuffer(self._tfs[field], dtype=np.uint8)[order],
+                "lengths": np.frombuffer(self._lengths[field], dtype=np.uint32).astype(np.float32)
+            }
+        return BM25Index(self.vocabulary, fields, self.count)
+
+class BM25Index:
+    """best_fields BM25 over the boosted incident fields"""
+    
+    def __init__(self, vocabulary: Dict[str, int], fields: Dict[str, Dict[str, np.ndarray]], count: int):
+        self.vocabulary = vocabulary
+        self.fields = fields
+        self.count = count
+        self._stats = {}
+        for field, data in fields.items():
+            lengths = data["lengths"]
+            with_field = int(np.count_nonzero(lengths))
+            self._stats[field] = {
+                "doc_count": with_field,
+                "avgdl": float(lengths.sum() / with_field) if with_field else 0.0
+            }
+    
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict]) -> "BM25Index":
+        builder = BM25IndexBuilder()
+        for document in documents:
+            builder.add(document)
+        return builder.build()
+    
+    def _query_terms(self, field: str, query_text: str) -> List[str]:
+        if field == "technical_terms":
+            return [query_text]  # keyword field: the whole query is one term
+        return FIELD_ANALYZERS[field](query_text)
+    
+    def field_scores(self, field: str, query_text: str) -> Optional[np.ndarray]:
+        data = self.fields[field]
+        stats = self._stats[field]
+        if not stats["doc_count"]:
+            return None
+        
+        scores = None
+        norms = K1 * (1 - B + B * data["lengths"] / stats["avgdl"]) if stats["avgdl"] else None
+        for token in self._query_terms(field, query_text):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = data["indptr"][term_id], data["indptr"][term_id + 1]
+            if start == end:
+                continue
+            doc_ids = data["doc_ids"][start:end]
+            tfs = data["tfs"][start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (stats["doc_count"] - df + 0.5) / (df + 0.5))
+            if scores is None:
+                scores = np.zeros(self.count, dtype=np.float32)
+            scores[doc_ids] += idf * tfs / (tfs + norms[doc_ids])
+        return scores
+    
+    def scores(self, query_text: str) -> np.ndarray:
+        """Dense best_fields score for every document (0 where nothing matched)"""
+        best = np.zeros(self.count, dtype=np.float32)
+        for field, boost in FIELD_BOOSTS.items():
+            field_scores = self.field_scores(field, query_text)
+            if field_scores is not None:
+                np.maximum(best, field_scores * boost, out=best)
+        return best
+    
+    def search(self, query_text: str, size: int = 10, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k matching documents as (rows, scores), optionally restricted by a filter mask"""
+        scores = self.scores(query_text)
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+        matched = np.flatnonzero(scores > 0)
+        if not len(matched) or size <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(matched) > size:
+            matched = matched[np.argpartition(-scores[matched], size - 1)[:size]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return matched, scores[matched]
+    
+    def memory_bytes(self) -> int:
+        return sum(a.nbytes for data in self.fields.values() for a in data.values())
+    
+    def save(self, path: str):
+        arrays = {f"{field}.{name}": a for field, data in self.fields.items() for name, a in data.items()}
+        np.savez(os.path.join(path, "bm25.npz"), **arrays)
+        with open(os.path.join(path, "bm25_vocabulary.json"), "w") as f:
+            json.dump({"count": self.count, "terms": sorted(self.vocabulary, key=self.vocabulary.get)}, f)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        if not os.path.exists(os.path.join(path, "bm25.npz")):
+            return None
+        with open(os.path.join(path, "bm25_vocabulary.json")) as f:
+            meta = json.load(f)
+        vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+        fields = {}
+        with np.load(os.path.join(path, "bm25.npz")) as arrays:
+            for key in arrays.files:
+                field, name = key.split(".", 1)
+                fields.setdefault(field, {})[name] = arrays[key]
+        return cls(vocabulary, fields, meta["count"])
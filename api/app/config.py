@@ -17,12 +17,62 @@ class Settings(BaseSettings):
     # Elasticsearch
     ELASTIC_CLOUD_ID: str
     ELASTIC_API_KEY: str
-    ELASTIC_INDEX_NAME: str = "devops-incidents"
+    ELASTIC_INDEX_NAME: str = "devops-incidents"  # alias over the versioned index (elasticsearch_setup.py)
+    VECTOR_PROFILE: str = "hnsw"  # embedding dims + quantization, see app.vector_profiles; must match the index
+    
+    # Search backend: elasticsearch, or local (in-process snapshot built by app.local_index)
+    SEARCH_BACKEND: str = "elasticsearch"
+    LOCAL_INDEX_PATH: str = "local_index"
+    LOCAL_INDEX_FALLBACK: bool = True  # serve from the local snapshot when Elasticsearch fails
     
     # Search settings
     SEARCH_RESULT_LIMIT: int = 10
     KEYWORD_BOOST: float = 1.0
     VECTOR_BOOST: float = 2.0
+    SEARCH_RETRIEVAL_MODE: str = "knn"  # knn (HNSW + BM25 fused with RRF) or script_score (exact scan)
+    KNN_NUM_CANDIDATES: int = 100
+    RRF_RANK_CONSTANT: int = 60
+    
+    # Embedding cache
+    EMBEDDING_CACHE_BACKEND: str = "memory"  # memory, sqlite (shared across workers/ingest) or none
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.sqlite3"
+    
+    # Response cache (exact description hash, then embedding similarity)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_TTL_SECONDS: float = 900
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.97
+    
+    # Model routing (app.model_routing): one model per LLM node; a node falls back to
+    # FAST_MODEL for severities outside REASONING_SEVERITIES or when its p95 won't fit the deadline
+    ANALYSIS_MODEL: str = "gemini-2.0-flash-001"
+    STRATEGY_MODEL: str = "gemini-2.0-flash-001"
+    SYNTHESIS_MODEL: str = "deepseek-r1-0528-maas"
+    FAST_MODEL: str = "gemini-2.0-flash-001"
+    REASONING_SEVERITIES: list = ["P0", "P1", "P2"]
+    MODEL_DEFAULT_EXPECTED_SECONDS: float = 15  # assumed p95 of a model until it has been observed
+    
+    # Synthesis prompt context (app.context_builder)
+    SYNTHESIS_CONTEXT_TOKENS: int = 1500  # incident + analysis + similar incidents
+    
+    # Workflow settings
+    WORKFLOW_MODE: str = "full"  # full (analyze + strategize) or fast (single LLM call)
+    MAX_CONCURRENT_WORKFLOWS: int = 0  # workflows running at once per instance; 0 = unlimited, excess requests queue
+    COALESCE_REQUESTS: bool = True  # identical concurrent analyses share one workflow run
+    REQUEST_DEADLINE_SECONDS: float = 55  # per-request budget (the frontend gives up at 60s); 0 = no deadline
+    MAX_REQUEST_DEADLINE_SECONDS: float = 300
+    
+    # Health and stats snapshots (refreshed in the background, read by probes)
+    HEALTH_REFRESH_SECONDS: float = 15
+    HEALTH_MAX_STALENESS_SECONDS: float = 60  # older snapshots fail readiness
+    VERTEX_HEALTH_CHECK_SECONDS: float = 60  # one uncached embedding request per interval
+    MAX_EVENT_LOOP_LAG_SECONDS: float = 0.5
+    
+    # Batch analysis (/api/v1/incidents/analyze/batch)
+    BATCH_MAX_ITEMS: int = 200
+    BATCH_MAX_CONCURRENCY: int = 8  # LLM calls in flight per batch
+    BATCH_DEDUP_SIMILARITY_THRESHOLD: float = 0.97  # descriptions this similar share one analysis
     
     # CORS
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
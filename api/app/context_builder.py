@@ -0,0 +1,188 @@
+"""
+Token-budgeted context for the synthesis prompt
+
+The synthesis prompt carries the incident, its analysis and the closest past
+incidents. build_synthesis_context keeps that context within a token budget:
+
+1. near-duplicate results (same incident filed again) are collapsed into the
+   first one, whose entry lists their ids, and the rest are re-ordered with
+   maximal marginal relevance so each slot adds something new
+2. the incident description is capped at a share of the budget and the
+   analysis is sent as compact JSON of the fields synthesis uses
+3. results are packed most informative field first: a header line and the
+   resolution for every result, then error highlights, then descriptions,
+   while budget remains. The resolution is the compact summary computed at
+   ingest (app/resolution_summary.py) when the index has one, otherwise the
+   raw resolution steps cut to fit
+
+Token counts are estimated at ~4 characters per token; Vertex AI's own count
+(usage_metadata) is reported for the sent prompt where the response has it.
+"""
+from collections import Counter
+from typing import Dict, List, Tuple
+import json
+import math
+import re
+
+CHARS_PER_TOKEN = 4
+MMR_LAMBDA = 0.7  # relevance vs novelty
+DUPLICATE_SIMILARITY = 0.85  # term cosine at which a result is the same incident again
+DESCRIPTION_BUDGET_SHARE = 0.3
+RESOLUTION_TOKENS_PER_RESULT = 150
+HIGHLIGHT_TOKENS_PER_RESULT = 60
+DESCRIPTION_TOKENS_PER_RESULT = 60
+ANALYSIS_FIELDS = ("severity", "incident_type", "summary", "key_symptoms", "technical_terms", "affected_systems")
+
+_TERM = re.compile(r"[a-z0-9][a-z0-9_.+-]{2,}")
+_MARK = re.compile(r"</?mark>")
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def prompt_token_count(prompt: str, response=None) -> int:
+    """Prompt tokens as counted by Vertex AI when the response reports it, else estimated"""
+    usage = getattr(response, "usage_metadata", None)
+    counted = getattr(usage, "prompt_token_count", None)
+    return counted if isinstance(counted, int) and counted > 0 else estimate_tokens(prompt)
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to about tokens, at a word boundary, keeping its head and tail"""
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    if limit < 40:
+        return text[:limit].rsplit(" ", 1)[0] + " …"
+    head = text[:int(limit * 0.75)].rsplit(" ", 1)[0]
+    tail = text[-int(limit * 0.2):].split(" ", 1)[-1]
+    return f"{head} … {tail}"
+
+def _terms(result: Dict) -> Counter:
+    text = f"{result.get('title', '')} {result.get('description', '')} {result.get('resolution_steps', '')}"
+    return Counter(_TERM.findall(text.lower()))
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+def diversify(
+    results: List[Dict],
+    limit: int,
+    mmr_lambda: float = MMR_LAMBDA,
+    duplicate_similarity: float = DUPLICATE_SIMILARITY
+) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """
+    Up to limit results chosen by maximal marginal relevance, and for each
+    chosen incident_id the ids of the near-duplicates folded into it
+    """
+    if not results:
+        return [], {}
+    top_score = max(r.get('similarity_score') or 0.0 for r in results) or 1.0
+    candidates = [(r, (r.get('similarity_score') or 0.0) / top_score, _terms(r)) for r in results]
+    selected: List[Tuple[Dict, Counter]] = []
+    collapsed: Dict[str, List[str]] = {}
+    
+    while candidates and len(selected) < limit:
+        best, best_score = None, -math.inf
+        remaining = []
+        for result, relevance, terms in candidates:
+            similarities = [_cosine(terms, chosen_terms) for _, chosen_terms in selected]
+            max_similarity = max(similarities, default=0.0)
+            if max_similarity >= duplicate_similarity:
+                representative = selected[similarities.index(max_similarity)][0]
+                collapsed[representative['incident_id']].append(result['incident_id'])
+                continue
+            remaining.append((result, relevance, terms))
+            score = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+            if score > best_score:
+                best, best_score = (result, relevance, terms), score
+        if best is None:
+            break
+        selected.append((best[0], best[2]))
+        collapsed[best[0]['incident_id']] = []
+        candidates = [c for c in remaining if c[0] is not best[0]]
+    
+    # Anything left once the slots are full may still duplicate a chosen result
+    for result, _, terms in candidates:
+        similarities = [_cosine(terms, chosen_terms) for _, chosen_terms in selected]
+        if similarities and max(similarities) >= duplicate_similarity:
+            representative = selected[similarities.index(max(similarities))][0]
+            collapsed[representative['incident_id']].append(result['incident_id'])
+    
+    return [result for result, _ in selected], collapsed
+
+def _header(position: int, result: Dict, duplicates: List[str]) -> str:
+    header = (
+        f"Similar Incident {position} ({result['incident_id']}, similarity {result.get('similarity_score') or 0.0:.2f}): "
+        f"{result.get('title')} [{result.get('incident_type')}, {result.get('severity')}, "
+        f"resolved in {result.get('resolution_time_minutes')} min]"
+    )
+    if duplicates:
+        header += f"\nAlso filed as: {', '.join(duplicates)}"
+    return header
+
+def _resolution_text(result: Dict) -> Tuple[str, str]:
+    """Label and text of the result's resolution: its stored summary, else the raw steps"""
+    summary = (result.get('resolution_summary') or {}).get('text')
+    if summary:
+        return "Resolution summary", summary
+    return "Resolution", result.get('resolution_steps') or ""
+
+def _highlight_text(result: Dict) -> str:
+    fragments = (result.get('highlights') or {}).get('error_messages') or []
+    return _MARK.sub("", " … ".join(fragments))
+
+def build_synthesis_context(
+    description: str,
+    analysis: Dict,
+    results: List[Dict],
+    token_budget: int = 1500,
+    max_results: int = 5
+) -> Dict:
+    """
+    The incident, analysis and results_context sections of the synthesis
+    prompt within token_budget, with what was kept and collapsed
+    """
+    analysis_text = json.dumps({k: analysis[k] for k in ANALYSIS_FIELDS if analysis.get(k)}, separators=(",", ":"))
+    incident_text = truncate_to_tokens(description, int(token_budget * DESCRIPTION_BUDGET_SHARE))
+    remaining = token_budget - estimate_tokens(incident_text) - estimate_tokens(analysis_text)
+    
+    chosen, collapsed = diversify(results, max_results)
+    sections = [[] for _ in chosen]
+    
+    def add(i: int, label: str, text: str, cap: int):
+        """Append "label: text" to result i's section, cut to the cap and what is left"""
+        nonlocal remaining
+        prefix = f"\n{label}: "
+        text = truncate_to_tokens(text, min(cap, remaining - estimate_tokens(prefix)))
+        if text.strip(" …"):
+            sections[i].append(prefix.lstrip("\n") + text)
+            remaining -= estimate_tokens(prefix + text)
+    
+    # Pass 1: header and resolution for each result, in rank order
+    for i, result in enumerate(chosen):
+        header = _header(i + 1, result, collapsed.get(result['incident_id'], []))
+        if estimate_tokens("\n\n" + header) > remaining:
+            chosen, sections = chosen[:i], sections[:i]
+            break
+        remaining -= estimate_tokens("\n\n" + header)
+        sections[i].append(header)
+        add(i, *_resolution_text(result), RESOLUTION_TOKENS_PER_RESULT)
+    
+    # Pass 2: error highlights, then descriptions, with what is left
+    for label, cap, text_of in (
+        ("Matched errors", HIGHLIGHT_TOKENS_PER_RESULT, _highlight_text),
+        ("Description", DESCRIPTION_TOKENS_PER_RESULT, lambda r: r.get('description') or "")
+    ):
+        for i, result in enumerate(chosen):
+            add(i, label, text_of(result), cap)
+    
+    results_context = "\n\n".join("\n".join(section) for section in sections) or "No similar incidents found in database."
+    return {
+        "incident": incident_text,
+        "analysis": analysis_text,
+        "results_context": results_context,
+        "included": [r['incident_id'] for r in chosen],
+        "collapsed": {k: v for k, v in collapsed.items() if v and k in {r['incident_id'] for r in chosen}},
+        "context_tokens": estimate_tokens(incident_text) + estimate_tokens(analysis_text) + estimate_tokens(results_context)
+    }
@@ -0,0 +1,206 @@
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+
+def embedding_cache_key(text: str, model_name: str, dimensions: Optional[int] = None) -> str:
+    """Content-hash key: the same text embedded by the same model always maps to one entry"""
+    payload = f"{model_name}\x00{dimensions or ''}\x00{text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Base class for embedding caches; tracks hit/miss counters. Async callers
+    use aget_many/aput_many, which move backends that do I/O (blocking = True)
+    off the event loop.
+    """
+    backend = "none"
+    blocking = False
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+    
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return vector
+    
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._put(key, list(vector))
+            self._flush()
+    
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        return [self.get(key) for key in keys]
+    
+    def put_many(self, items: List[Tuple[str, List[float]]]):
+        """Store several vectors in one write"""
+        with self._lock:
+            for key, vector in items:
+                self._put(key, list(vector))
+            self._flush()
+    
+    async def aget_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get_many, keys)
+        return self.get_many(keys)
+    
+    async def aput_many(self, items: List[Tuple[str, List[float]]]):
+        if self.blocking:
+            await asyncio.to_thread(self.put_many, items)
+        else:
+            self.put_many(items)
+    
+    def _get(self, key: str) -> Optional[List[float]]:
+        return None
+    
+    def _put(self, key: str, vector: List[float]):
+        pass
+    
+    def _flush(self):
+        """Write out anything _put buffered"""
+        pass
+    
+    def __len__(self) -> int:
+        return 0
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+    
+    def close(self):
+        pass
+
+class InMemoryEmbeddingCache(EmbeddingCache):
+    """Per-process LRU cache"""
+    backend = "memory"
+    
+    def __init__(self, max_entries: int = 10000):
+        super().__init__(max_entries)
+        self._entries = OrderedDict()
+    
+    def _get(self, key: str) -> Optional[List[float]]:
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+        return vector
+    
+    def _put(self, key: str, vector: List[float]):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteEmbeddingCache(EmbeddingCache):
+    """
+    Persistent LRU cache in a SQLite file (WAL mode), shared by uvicorn workers
+    and ingest runs on the same host. Vectors are stored as float32 blobs.
+    
+    Reads do not write: hits are recorded in memory and their last_access is
+    written in one transaction once access_flush_size hits have accumulated or
+    access_flush_seconds have passed, with the next write, or on close. The LRU
+    order is only approximate between flushes.
+    """
+    backend = "sqlite"
+    blocking = True
+    eviction_check_interval = 256  # puts between size checks; COUNT(*) is not free
+    access_flush_size = 256
+    access_flush_seconds = 30.0
+    
+    def __init__(self, path: str, max_entries: int = 100000):
+        super().__init__(max_entries)
+        self.path = path
+        self._puts_since_check = 0
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+    
+    def _get(self, key: str) -> Optional[List[float]]:
+        row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._pending_access[key] = time.time()
+        if (len(self._pending_access) >= self.access_flush_size
+                or time.monotonic() - self._last_access_flush >= self.access_flush_seconds):
+            self._flush()
+        return array('f', row[0]).tolist()
+    
+    def _put(self, key: str, vector: List[float]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+            (key, array('f', vector).tobytes(), time.time())
+        )
+        self._pending_access.pop(key, None)
+        self._puts_since_check += 1
+        if self._puts_since_check >= self.eviction_check_interval:
+            self._puts_since_check = 0
+            self._evict()
+    
+    def _flush(self):
+        """Write buffered last_access times and commit, in one transaction"""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._last_access_flush = time.monotonic()
+        self._conn.commit()
+    
+    def _evict(self):
+        """Drop least recently used rows beyond max_entries"""
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+def create_embedding_cache(backend: str, max_entries: int = 10000, path: str = "embedding_cache.sqlite3") -> EmbeddingCache:
+    """Build the cache for the configured backend: memory, sqlite or none"""
+    if backend == "memory":
+        return InMemoryEmbeddingCache(max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteEmbeddingCache(path=path, max_entries=max_entries)
+    if backend == "none":
+        return EmbeddingCache(max_entries=0)
+    raise ValueError(f"Unknown embedding cache backend: {backend}")
@@ -0,0 +1,152 @@
+"""
+Health and stats snapshots refreshed in the background
+
+Probes and dashboards poll far more often than the cluster state changes, so
+instead of querying Elasticsearch on every call a background task refreshes
+the index stats every refresh_seconds (and checks Vertex AI reachability every
+vertex_check_seconds), while a second task samples event-loop lag. Probe
+endpoints only read the latest snapshot; readiness fails when the snapshot is
+older than max_staleness_seconds, i.e. the refresher itself is stuck.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Search backend states that can still serve requests ("degraded" = local fallback)
+SERVING_STATUSES = ("healthy", "degraded")
+LAG_SAMPLES = 10
+
+class HealthMonitor:
+    def __init__(
+        self,
+        search_engine,
+        agent,
+        refresh_seconds: float = 15.0,
+        max_staleness_seconds: float = 60.0,
+        vertex_check_seconds: float = 60.0,
+        max_loop_lag_seconds: float = 0.5,
+        lag_sample_seconds: float = 0.5,
+        check_timeout_seconds: float = 5.0
+    ):
+        self.search_engine = search_engine
+        self.agent = agent
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.vertex_check_seconds = vertex_check_seconds
+        self.max_loop_lag_seconds = max_loop_lag_seconds
+        self.lag_sample_seconds = lag_sample_seconds
+        self.check_timeout_seconds = check_timeout_seconds
+        
+        self._snapshot: Optional[Dict] = None
+        self._refreshed_at = 0.0
+        self._vertex = {"status": "unknown"}
+        self._vertex_checked_at = None
+        self._lag_samples = deque(maxlen=LAG_SAMPLES)
+        self._refresh_lock = asyncio.Lock()
+        self._tasks = []
+    
+    async def start(self):
+        """Take the first snapshot, then keep refreshing it in the background"""
+        await self.refresh()
+        self._tasks = [asyncio.create_task(self._refresh_loop()), asyncio.create_task(self._lag_loop())]
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def refresh(self):
+        async with self._refresh_lock:
+            try:
+                index_stats = await asyncio.wait_for(self.search_engine.get_index_stats(), self.check_timeout_seconds)
+            except Exception as e:
+                index_stats = {"status": "error", "error": str(e) or type(e).__name__}
+            
+            now = time.monotonic()
+            if self._vertex_checked_at is None or now - self._vertex_checked_at >= self.vertex_check_seconds:
+                try:
+                    await asyncio.wait_for(self.agent.check_vertex_ai(), self.check_timeout_seconds)
+                    self._vertex = {"status": "healthy"}
+                except Exception as e:
+                    logger.warning(f"Vertex AI health check failed: {e}")
+                    self._vertex = {"status": "unhealthy", "error": str(e) or type(e).__name__}
+                self._vertex_checked_at = time.monotonic()
+            
+            self._snapshot = {
+                "elasticsearch": index_stats,
+                "vertex_ai": self._vertex,
+                "refreshed_at": datetime.now().isoformat()
+            }
+            self._refreshed_at = time.monotonic()
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health snapshot refresh failed: {e}")
+    
+    async def _lag_loop(self):
+        """How late a short sleep wakes up: time the loop spent busy with other work"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start_time = loop.time()
+            await asyncio.sleep(self.lag_sample_seconds)
+            lag = max(0.0, loop.time() - start_time - self.lag_sample_seconds)
+            self._lag_samples.append(lag)
+            metrics.EVENT_LOOP_LAG.set(lag)
+    
+    @property
+    def loop_lag_seconds(self) -> float:
+        """Worst lag over the last few samples"""
+        return max(self._lag_samples, default=0.0)
+    
+    def age_seconds(self) -> Optional[float]:
+        return time.monotonic() - self._refreshed_at if self._snapshot else None
+    
+    def snapshot(self) -> Optional[Dict]:
+        """Latest snapshot with its age; never touches the backends"""
+        if self._snapshot is None:
+            return None
+        age = self.age_seconds()
+        return {
+            **self._snapshot,
+            "age_seconds": round(age, 3),
+            "stale": age > self.max_staleness_seconds,
+            "event_loop_lag_seconds": round(self.loop_lag_seconds, 4)
+        }
+    
+    async def current(self) -> Dict:
+        """The snapshot, refreshed first if it is past the staleness bound"""
+        age = self.age_seconds()
+        if age is None or age > self.max_staleness_seconds:
+            await self.refresh()
+        return self.snapshot()
+    
+    def readiness(self) -> Tuple[bool, Dict[str, str]]:
+        """Whether to route traffic here, with the state of each check"""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return False, {"snapshot": "missing"}
+        checks = {
+            "elasticsearch": snapshot["elasticsearch"].get("status", "unknown"),
+            "vertex_ai": snapshot["vertex_ai"]["status"],
+            "snapshot": "stale" if snapshot["stale"] else "fresh",
+            "event_loop": "lagging" if self.loop_lag_seconds > self.max_loop_lag_seconds else "ok"
+        }
+        ready = (
+            checks["elasticsearch"] in SERVING_STATUSES
+            and checks["vertex_ai"] != "unhealthy"
+            and checks["snapshot"] == "fresh"
+            and checks["event_loop"] == "ok"
+        )
+        return ready, checks
@@ -0,0 +1,96 @@
+"""
+Index settings for serving and for bulk loads
+
+While a backfill runs, the index is switched to BULK_LOAD_SETTINGS: no
+periodic refresh, no replicas to copy every document to, and a larger
+translog before flushes. Afterwards the previous settings are restored, the
+index is refreshed and force-merged into one segment (one HNSW graph to
+search instead of one per segment), and a few kNN queries page the graph
+back into the filesystem cache before real traffic hits it.
+"""
+from contextlib import contextmanager
+from typing import Dict, Optional
+import math
+import time
+
+from app.vector_profiles import NATIVE_DIMS
+
+SERVING_SETTINGS = {
+    "number_of_replicas": 1,
+    "refresh_interval": "1s",
+    "translog.flush_threshold_size": "512mb"
+}
+
+BULK_LOAD_SETTINGS = {
+    "number_of_replicas": 0,
+    "refresh_interval": "-1",
+    "translog.flush_threshold_size": "2gb"
+}
+
+# Sizing: keep shards around 30GB; a document is its float vector in _source
+# and the HNSW files plus roughly 6KB of text, inverted index and doc values
+TARGET_SHARD_BYTES = 30 * 1024 ** 3
+DOC_OVERHEAD_BYTES = 6 * 1024
+MAX_SHARDS = 32
+
+FORCE_MERGE_TIMEOUT_SECONDS = 6 * 3600
+WARMUP_QUERIES = 20
+
+def shard_count(expected_docs: int, dims: int = NATIVE_DIMS) -> int:
+    """Primary shard count for a corpus of expected_docs incidents"""
+    doc_bytes = DOC_OVERHEAD_BYTES + dims * 4 * 2
+    return max(1, min(MAX_SHARDS, math.ceil(expected_docs * doc_bytes / TARGET_SHARD_BYTES)))
+
+def current_settings(es, index_name: str, keys=BULK_LOAD_SETTINGS) -> Dict:
+    """Current values of keys on index_name (an alias resolves to its index); None if unset"""
+    response = es.indices.get_settings(index=index_name, flat_settings=True)
+    settings = next(iter(response.values()))['settings']
+    return {key: settings.get(f"index.{key}") for key in keys}
+
+def warm_knn(es, index_name: str, field: str = "description_embedding", queries: int = WARMUP_QUERIES) -> int:
+    """Run kNN queries with stored vectors as queries so the HNSW graph is paged in"""
+    response = es.search(
+        index=index_name, size=queries, source_includes=[field],
+        query={"function_score": {"query": {"exists": {"field": field}}, "random_score": {}}}
+    )
+    vectors = [hit['_source'][field] for hit in response['hits']['hits'] if hit['_source'].get(field)]
+    for vector in vectors:
+        es.search(index=index_name, size=10, source=False,
+                  knn={"field": field, "query_vector": vector, "k": 10, "num_candidates": 100})
+    return len(vectors)
+
+def finish_bulk_load(es, index_name: str, restore: Dict, force_merge: bool = True, warm: bool = True) -> Dict:
+    """Restore settings, refresh, force-merge and warm; returns the seconds each step took"""
+    timings = {}
+    start_time = time.perf_counter()
+    es.indices.put_settings(index=index_name, settings=restore)
+    es.indices.refresh(index=index_name)
+    timings["restore_refresh_seconds"] = time.perf_counter() - start_time
+    if force_merge:
+        start_time = time.perf_counter()
+        es.options(request_timeout=FORCE_MERGE_TIMEOUT_SECONDS).indices.forcemerge(index=index_name, max_num_segments=1)
+        timings["force_merge_seconds"] = time.perf_counter() - start_time
+    if warm:
+        start_time = time.perf_counter()
+        warm_knn(es, index_name)
+        timings["warm_seconds"] = time.perf_counter() - start_time
+    return timings
+
+@contextmanager
+def bulk_load(es, index_name: str, restore: Optional[Dict] = None, force_merge: bool = True, warm: bool = True):
+    """
+    Apply BULK_LOAD_SETTINGS to index_name for the duration of the block.
+    Settings are put back (to restore, or to what they were before) even if
+    the block fails; force-merge and warm-up only run after a clean finish.
+    Yields a dict that receives the finishing step timings.
+    """
+    if restore is None:
+        restore = current_settings(es, index_name)
+    es.indices.put_settings(index=index_name, settings=BULK_LOAD_SETTINGS)
+    timings = {}
+    try:
+        yield timings
+    except BaseException:
+        es.indices.put_settings(index=index_name, settings=restore)
+        raise
+    timings.update(finish_bulk_load(es, index_name, restore, force_merge, warm))
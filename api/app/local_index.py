@@ -0,0 +1,366 @@
+"""
+In-process vector index used as a HybridSearchEngine-compatible backend for
+development, CI, and as a degraded-mode fallback when Elasticsearch is down.
+
+Snapshot layout (one directory):
+    manifest.json     count, dims, ids and where each filter value is stored
+    vectors.f32       row-major float32 matrix (count x dims), L2-normalized
+    documents.jsonl   incident sources without embeddings, one per line
+    offsets.npy       byte offset of every line in documents.jsonl
+    bitmaps.npy       packed document bitmaps for frequent (field, value) filters
+    postings.npy      sorted document ids for rare (field, value) filters
+    bm25.npz          per-field CSR keyword postings (see app.bm25)
+    bm25_vocabulary.json  term strings in term-id order
+"""
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+from app.bm25 import BM25Index, BM25IndexBuilder
+from app.resolution_summary import summarize_resolution
+from app.search_engine import reciprocal_rank_fusion
+from app.vector_profiles import NATIVE_DIMS, fit_dimensions, get_vector_profile
+
+logger = logging.getLogger(__name__)
+
+# Keyword fields with precomputed inverted indexes (bitmaps or posting lists)
+FILTER_FIELDS = ("severity", "incident_type", "status", "source_type", "affected_systems", "technical_terms", "tags")
+
+# Inputs per embedding request when building a snapshot from JSON (as ingest_data.py)
+EMBED_BATCH_SIZE = 32
+
+# Fields returned in search results, matching HybridSearchEngine
+RESULT_FIELDS = ("incident_id", "title", "description", "severity", "incident_type",
+                 "resolution_steps", "resolution_summary", "resolution_time_minutes", "created_at")
+
+def build_snapshot(
+    incidents: Iterable[Dict],
+    output_dir: str,
+    embed_fn: Optional[Callable[[Dict], List[float]]] = None,
+    source: str = "unknown"
+) -> Dict:
+    """
+    Stream incidents into a snapshot directory. Uses each incident's
+    description_embedding when present, otherwise embed_fn(incident), and
+    computes the resolution_summary that ingest would have stored when missing.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    postings = {field: {} for field in FILTER_FIELDS}
+    keyword_index = BM25IndexBuilder()
+    offsets = array('q')
+    ids = []
+    dims = None
+    count = 0
+    
+    with open(os.path.join(output_dir, "vectors.f32"), "wb") as vector_file, \
+            open(os.path.join(output_dir, "documents.jsonl"), "wb") as document_file:
+        for incident in incidents:
+            incident = dict(incident)
+            vector = incident.pop("description_embedding", None)
+            if "resolution_summary" not in incident:
+                incident["resolution_summary"] = summarize_resolution(incident)
+            if vector is None:
+                if embed_fn is None:
+                    raise ValueError(f"Incident {incident.get('incident_id')} has no embedding and no embed_fn was given")
+                vector = embed_fn(incident)
+            
+            vector = np.asarray(vector, dtype=np.float32)
+            if dims is None:
+                dims = len(vector)
+            elif len(vector) != dims:
+                raise ValueError(f"Embedding dimension mismatch: expected {dims}, got {len(vector)}")
+            norm = np.linalg.norm(vector)
+            vector_file.write((vector / norm if norm else vector).tobytes())
+            
+            offsets.append(document_file.tell())
+            document_file.write(json.dumps(incident, default=str).encode("utf-8") + b"\n")
+            ids.append(incident.get("incident_id"))
+            keyword_index.add(incident)
+            
+            for field in FILTER_FIELDS:
+                values = incident.get(field)
+                if values is None:
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    postings[field].setdefault(str(value), array('I')).append(count)
+            count += 1
+    
+    # Frequent values get one packed bitmap row each; rare values keep a sorted
+    # posting list instead, since a bitmap costs count/8 bytes regardless of df
+    filter_rows = {}
+    dense = [(f, v, ids_) for f, values in postings.items() for v, ids_ in values.items() if len(ids_) * 32 >= count]
+    bitmaps = np.zeros((len(dense), (count + 7) // 8), dtype=np.uint8)
+    for row, (field, value, doc_ids) in enumerate(dense):
+        mask = np.zeros(count, dtype=bool)
+        mask[np.frombuffer(doc_ids, dtype=np.uint32)] = True
+        bitmaps[row] = np.packbits(mask)
+        filter_rows.setdefault(field, {})[value] = ["bitmap", row]
+    
+    sparse_postings = array('I')
+    for field, values in postings.items():
+        for value, doc_ids in values.items():
+            if value not in filter_rows.get(field, {}):
+                start = len(sparse_postings)
+                sparse_postings.extend(doc_ids)
+                filter_rows.setdefault(field, {})[value] = ["postings", start, len(sparse_postings)]
+    
+    np.save(os.path.join(output_dir, "bitmaps.npy"), bitmaps)
+    np.save(os.path.join(output_dir, "postings.npy"), np.frombuffer(sparse_postings, dtype=np.uint32))
+    np.save(os.path.join(output_dir, "offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+    keyword_index.build().save(output_dir)
+    
+    manifest = {
+        "count": count,
+        "dims": dims or 0,
+        "source": source,
+        "created_at": datetime.now().isoformat(),
+        "ids": ids,
+        "filter_rows": filter_rows
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    
+    logger.info(f"✅ Built local index snapshot with {count} incidents ({dims} dims) in {output_dir}")
+    return {"count": count, "dims": dims}
+
+class LocalVectorIndex:
+    """Memory-mapped, pre-normalized float32 matrix with bitmap filters"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        
+        self.count = manifest["count"]
+        self.dims = manifest["dims"]
+        self.source = manifest.get("source", "unknown")
+        self.ids = manifest["ids"]
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.filter_rows = manifest["filter_rows"]
+        
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(self.count, self.dims)) if self.count else np.empty((0, self.dims), dtype=np.float32)
+        self.bitmaps = np.load(os.path.join(path, "bitmaps.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self._documents = open(os.path.join(path, "documents.jsonl"), "rb")
+        # Snapshots built before the BM25 engine existed have no keyword index
+        self.keyword_index = BM25Index.load(path)
+    
+    def close(self):
+        self._documents.close()
+    
+    def document(self, row: int) -> Dict:
+        self._documents.seek(int(self.offsets[row]))
+        return json.loads(self._documents.readline())
+    
+    def filter_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """AND across fields, OR across the values of one field; None means no filtering"""
+        if not filters:
+            return None
+        
+        mask = np.ones(self.count, dtype=bool)
+        for field, value in filters.items():
+            field_mask = np.zeros(self.count, dtype=bool)
+            for v in value if isinstance(value, list) else [value]:
+                entry = self.filter_rows.get(field, {}).get(str(v))
+                if entry is None:
+                    continue
+                if entry[0] == "bitmap":
+                    field_mask |= np.unpackbits(self.bitmaps[entry[1]], count=self.count).astype(bool)
+                else:
+                    field_mask[self.postings[entry[1]:entry[2]]] = True
+            mask &= field_mask
+        return mask
+    
+    def search(self, query_vector: List[float], size: int = 10, mask: Optional[np.ndarray] = None):
+        """Exact cosine top-k: one matrix-vector product plus argpartition"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if len(query) != self.dims:
+            raise ValueError(f"Query vector has {len(query)} dims, index has {self.dims}")
+        norm = np.linalg.norm(query)
+        if not norm or not self.count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        scores = self.vectors @ (query / norm)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        
+        size = min(size, self.count)
+        if size <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, size - 1)[:size]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+class LocalSearchEngine:
+    """Drop-in replacement for HybridSearchEngine backed by a LocalVectorIndex snapshot"""
+    
+    def __init__(self, path: str, rrf_rank_constant: int = 60):
+        self.index = LocalVectorIndex(path)
+        self.index_name = f"local:{path}"
+        self.rrf_rank_constant = rrf_rank_constant
+    
+    async def verify_connection(self):
+        keyword = "with" if self.index.keyword_index is not None else "without"
+        logger.info(f"✅ Loaded local index snapshot ({self.index.count} incidents, source: {self.index.source}, {keyword} BM25)")
+    
+    async def close(self):
+        self.index.close()
+    
+    def _format_result(self, row: int, score: float) -> Dict:
+        source = self.index.document(row)
+        result = {field: source.get(field) for field in RESULT_FIELDS}
+        result['resolution_time_minutes'] = source.get('resolution_time_minutes', 0)
+        result['similarity_score'] = score
+        result['highlights'] = {}
+        return result
+    
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_vector: List[float],
+        filters: Optional[Dict] = None,
+        size: int = 10,
+        keyword_boost: float = 1.0,
+        vector_boost: float = 2.0,
+        retrieval_mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Vector and BM25 legs fused with RRF, like HybridSearchEngine's knn mode.
+        Vector scores use the ES cosine scale (1 + cos) / 2. timeout and
+        terminate_after are accepted for interface parity; in-process searches
+        are not bounded.
+        """
+        mask = self.index.filter_mask(filters)
+        window = size * 2
+        
+        ranked = {}
+        if query_vector:
+            rows, scores = self.index.search(query_vector, size=window, mask=mask)
+            ranked['vector'] = [self._format_result(int(row), (1.0 + float(score)) / 2.0) for row, score in zip(rows, scores)]
+        if query_text and self.index.keyword_index is not None:
+            rows, scores = self.index.keyword_index.search(query_text, size=window, mask=mask)
+            ranked['keyword'] = [self._format_result(int(row), float(score)) for row, score in zip(rows, scores)]
+        
+        if not ranked:
+            return []
+        
+        results = reciprocal_rank_fusion(list(ranked.values()), k=self.rrf_rank_constant, size=size)
+        
+        vector_scores = {r['incident_id']: r['similarity_score'] for r in ranked.get('vector', [])}
+        keyword_scores = {r['incident_id']: r['similarity_score'] for r in ranked.get('keyword', [])}
+        max_keyword = max(keyword_scores.values(), default=0.0) or 1.0
+        for result in results:
+            doc_id = result['incident_id']
+            if doc_id in vector_scores:
+                result['similarity_score'] = vector_scores[doc_id]
+            else:
+                result['similarity_score'] = keyword_scores[doc_id] / max_keyword
+        
+        logger.info(f"Found {len(results)} results for query (local {' + '.join(ranked)})")
+        return results
+    
+    async def multi_query_search(
+        self,
+        sub_queries: List[Dict],
+        filters: Optional[Dict] = None,
+        size: int = 10,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Each sub-query as its own vector or BM25 search, fused with RRF like
+        HybridSearchEngine.multi_query_search. The local BM25 index has no
+        per-field postings, so a sub-query's "fields" are not applied.
+        """
+        result_lists = []
+        for sub_query in sub_queries:
+            if sub_query.get('query_vector'):
+                result_lists.append(await self.hybrid_search("", sub_query['query_vector'], filters, size * 2))
+            elif sub_query.get('query_text'):
+                result_lists.append(await self.hybrid_search(sub_query['query_text'], [], filters, size * 2))
+        return reciprocal_rank_fusion(result_lists, k=self.rrf_rank_constant, size=size)
+    
+    async def multi_search(
+        self,
+        queries: List[Dict],
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """Several hybrid searches; in-process, so there is no round-trip to batch"""
+        results = []
+        for query in queries:
+            if 'sub_queries' in query:
+                results.append(await self.multi_query_search(query['sub_queries'], query.get('filters'), query.get('size', 10)))
+            else:
+                results.append(await self.hybrid_search(**query))
+        return results
+    
+    async def get_incident_by_id(self, incident_id: str) -> Optional[Dict]:
+        row = self.index.id_to_row.get(incident_id)
+        return self.index.document(row) if row is not None else None
+    
+    async def get_index_stats(self) -> Dict:
+        return {
+            "document_count": self.index.count,
+            "index_size_bytes": self.index.vectors.nbytes + self.index.bitmaps.nbytes + self.index.postings.nbytes
+                + (self.index.keyword_index.memory_bytes() if self.index.keyword_index is not None else 0),
+            "backend": "local",
+            "status": "healthy"
+        }
+
+def export_from_elasticsearch(es, index_name: str, output_dir: str) -> Dict:
+    """Snapshot every document (with its stored embedding) from an ES index"""
+    from elasticsearch import helpers
+    hits = helpers.scan(es, index=index_name, query={"query": {"match_all": {}}}, size=1000)
+    return build_snapshot((hit['_source'] for hit in hits), output_dir, source=f"elasticsearch:{index_name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local vector index snapshot")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--from-es", action="store_true", help="Export the configured Elasticsearch index")
+    group.add_argument("--from-json", help="Incident JSON file, e.g. ../sample_incidents.json")
+    parser.add_argument("--output", default="local_index")
+    args = parser.parse_args()
+    
+    from app.config import get_settings
+    settings = get_settings()
+    
+    if args.from_es:
+        from elasticsearch import Elasticsearch
+        es = Elasticsearch(cloud_id=settings.ELASTIC_CLOUD_ID, api_key=settings.ELASTIC_API_KEY)
+        export_from_elasticsearch(es, settings.ELASTIC_INDEX_NAME, args.output)
+        return
+    
+    # Incidents without stored embeddings are embedded like ingest_data.py does:
+    # text-embedding-004, several inputs per request, at the profile's dimensions
+    from vertexai.language_models import TextEmbeddingModel
+    import vertexai
+    vertexai.init(project=settings.GOOGLE_CLOUD_PROJECT, location=settings.GOOGLE_CLOUD_REGION)
+    embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
+    dims = get_vector_profile(settings.VECTOR_PROFILE)["dims"]
+    kwargs = {"output_dimensionality": dims} if dims != NATIVE_DIMS else {}
+    
+    with open(args.from_json) as f:
+        incidents = json.load(f)
+    pending = [incident for incident in incidents if incident.get("description_embedding") is None]
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[start:start + EMBED_BATCH_SIZE]
+        texts = [f"{incident['title']} {incident['description']} {incident['error_messages']}" for incident in batch]
+        for incident, embedding in zip(batch, embedding_model.get_embeddings(texts, **kwargs)):
+            incident["description_embedding"] = fit_dimensions(embedding.values, dims)
+    build_snapshot(incidents, args.output, source=args.from_json)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
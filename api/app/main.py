@@ -1,20 +1,33 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
 import logging
 import uuid
 from datetime import datetime
 import time
 import json
+import os
 from contextlib import asynccontextmanager
+from typing import Dict, Optional
 
+from app import metrics
 from app.config import get_settings
 from app.models import (
     IncidentRequest, IncidentResponse, HealthResponse, ErrorResponse,
-    IncidentAnalysis, SearchResult, ResolutionRecommendation
+    IncidentAnalysis, SearchResult, ResolutionRecommendation, WorkflowMode,
+    BatchIncidentRequest, BatchIncidentResponse, BatchItemResult, BatchSummary
 )
-from app.search_engine import HybridSearchEngine
-from app.agent_workflow import create_workflow
+from app.search_engine import HybridSearchEngine, FallbackSearchEngine
+from app.local_index import LocalSearchEngine
+from app.agent_workflow import RESPONSE_MARGIN_SECONDS, DevOpsOracleAgent, build_workflow
+from app.batch_analysis import BatchAnalyzer
+from app.embedding_cache import create_embedding_cache
+from app.health import HealthMonitor
+from app.model_routing import ModelRouter
+from app.response_cache import ResponseCache, description_hash
+from app.single_flight import SingleFlight
+from app.vector_profiles import get_vector_profile
 
 # Configure logging
 logging.basicConfig(
@@ -25,44 +38,105 @@ logger = logging.getLogger(__name__)
 
 # Global variables for dependencies
 search_engine = None
-agent_workflow = None
+oracle_agent = None
+agent_workflows = {}
+response_cache = None
+workflow_slots = None  # semaphore bounding concurrent workflows, None when unlimited
+in_flight = None  # SingleFlight coalescing identical concurrent analyses, None when disabled
+health_monitor = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global search_engine, agent_workflow
+    global search_engine, oracle_agent, agent_workflows, response_cache, workflow_slots, in_flight, health_monitor
     
     settings = get_settings()
     logger.info(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     
-    # Initialize Elasticsearch
+    # Initialize search backend
     try:
-        search_engine = HybridSearchEngine(
-            cloud_id=settings.ELASTIC_CLOUD_ID,
-            api_key=settings.ELASTIC_API_KEY,
-            index_name=settings.ELASTIC_INDEX_NAME
-        )
-        logger.info("✅ Elasticsearch initialized")
+        if settings.SEARCH_BACKEND == "local":
+            search_engine = LocalSearchEngine(settings.LOCAL_INDEX_PATH, rrf_rank_constant=settings.RRF_RANK_CONSTANT)
+        else:
+            search_engine = HybridSearchEngine(
+                cloud_id=settings.ELASTIC_CLOUD_ID,
+                api_key=settings.ELASTIC_API_KEY,
+                index_name=settings.ELASTIC_INDEX_NAME,
+                retrieval_mode=settings.SEARCH_RETRIEVAL_MODE,
+                num_candidates=settings.KNN_NUM_CANDIDATES,
+                rrf_rank_constant=settings.RRF_RANK_CONSTANT
+            )
+            if settings.LOCAL_INDEX_FALLBACK and os.path.exists(settings.LOCAL_INDEX_PATH):
+                search_engine = FallbackSearchEngine(
+                    search_engine,
+                    LocalSearchEngine(settings.LOCAL_INDEX_PATH, rrf_rank_constant=settings.RRF_RANK_CONSTANT)
+                )
+        await search_engine.verify_connection()
+        logger.info(f"✅ Search backend initialized ({settings.SEARCH_BACKEND})")
     except Exception as e:
-        logger.error(f"❌ Failed to initialize Elasticsearch: {e}")
+        logger.error(f"❌ Failed to initialize search backend: {e}")
         raise
     
     # Initialize agent workflow
     try:
-        agent_workflow = create_workflow(
+        embedding_cache = create_embedding_cache(
+            backend=settings.EMBEDDING_CACHE_BACKEND,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            path=settings.EMBEDDING_CACHE_PATH
+        )
+        oracle_agent = DevOpsOracleAgent(
             search_engine=search_engine,
             project_id=settings.GOOGLE_CLOUD_PROJECT,
-            region=settings.GOOGLE_CLOUD_REGION
+            region=settings.GOOGLE_CLOUD_REGION,
+            embedding_cache=embedding_cache,
+            embedding_dims=get_vector_profile(settings.VECTOR_PROFILE)["dims"],
+            router=ModelRouter(
+                node_models={
+                    "analyze": settings.ANALYSIS_MODEL,
+                    "strategize": settings.STRATEGY_MODEL,
+                    "synthesize": settings.SYNTHESIS_MODEL
+                },
+                fast_model=settings.FAST_MODEL,
+                reasoning_severities=settings.REASONING_SEVERITIES,
+                default_expected_seconds=settings.MODEL_DEFAULT_EXPECTED_SECONDS
+            ),
+            synthesis_context_tokens=settings.SYNTHESIS_CONTEXT_TOKENS
         )
-        logger.info("✅ Agent workflow initialized")
+        agent_workflows = {mode: build_workflow(oracle_agent, mode) for mode in WorkflowMode}
+        if settings.MAX_CONCURRENT_WORKFLOWS > 0:
+            workflow_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_WORKFLOWS)
+        if settings.COALESCE_REQUESTS:
+            in_flight = SingleFlight()
+        logger.info(f"✅ Agent workflow initialized (default mode: {settings.WORKFLOW_MODE})")
+        
+        if settings.RESPONSE_CACHE_ENABLED:
+            response_cache = ResponseCache(
+                max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+                similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD
+            )
     except Exception as e:
         logger.error(f"❌ Failed to initialize agent workflow: {e}")
         raise
     
+    health_monitor = HealthMonitor(
+        search_engine,
+        oracle_agent,
+        refresh_seconds=settings.HEALTH_REFRESH_SECONDS,
+        max_staleness_seconds=settings.HEALTH_MAX_STALENESS_SECONDS,
+        vertex_check_seconds=settings.VERTEX_HEALTH_CHECK_SECONDS,
+        max_loop_lag_seconds=settings.MAX_EVENT_LOOP_LAG_SECONDS
+    )
+    await health_monitor.start()
+    
     yield
     
     # Cleanup
     logger.info("👋 Shutting down...")
+    await health_monitor.stop()
+    await search_engine.close()
+    if oracle_agent:
+        oracle_agent.embedding_cache.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -81,6 +155,52 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.PrometheusMiddleware)
+
+def get_workflow(mode: Optional[WorkflowMode] = None):
+    """Select the compiled workflow for a request, falling back to the configured default"""
+    return agent_workflows[WorkflowMode(mode or settings.WORKFLOW_MODE)]
+
+def request_deadline(request: IncidentRequest, header_value: Optional[float]) -> Optional[float]:
+    """Seconds the request may take: the body field, else the X-Request-Deadline header, else the default"""
+    budget = request.deadline_seconds or header_value or settings.REQUEST_DEADLINE_SECONDS
+    return min(budget, settings.MAX_REQUEST_DEADLINE_SECONDS) if budget and budget > 0 else None
+
+def build_incident_response(request_id: str, description: str, result: dict, processing_time: float,
+                            workflow_mode: WorkflowMode, deadline_seconds: Optional[float] = None) -> IncidentResponse:
+    """IncidentResponse from a finished workflow state"""
+    return IncidentResponse(
+        request_id=request_id,
+        timestamp=datetime.now(),
+        incident_description=description,
+        analysis=IncidentAnalysis(**result['incident_analysis']),
+        search_results=[SearchResult(**r) for r in result['search_results']],
+        recommendation=ResolutionRecommendation(**result['resolution_recommendation']),
+        processing_time_seconds=round(processing_time, 2),
+        agent_steps=result['agent_steps'],
+        node_timings=result.get('node_timings', {}),
+        model_routes=result.get('model_routes', {}),
+        prompt_tokens=result.get('prompt_tokens', {}),
+        workflow_mode=workflow_mode,
+        deadline_seconds=deadline_seconds,
+        degradations=result.get('degradations', [])
+    )
+
+def cached_incident_response(entry, request_id: str, description: str, tier: str, similarity: float,
+                             processing_time: float) -> IncidentResponse:
+    """A response cache entry re-addressed to a new request"""
+    return entry.response.model_copy(update={
+        "request_id": request_id,
+        "timestamp": datetime.now(),
+        "incident_description": description,
+        "processing_time_seconds": round(processing_time, 2),
+        "agent_steps": [f"response_cache ({tier} hit, {processing_time:.2f}s)"],
+        "node_timings": {},
+        "model_routes": {},
+        "prompt_tokens": {},
+        "cache_hit": tier,
+        "cache_similarity": round(similarity, 4)
+    })
 
 @app.get("/", response_model=dict)
 async def root():
@@ -94,28 +214,37 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
-    try:
-        # Check Elasticsearch
-        es_stats = search_engine.get_index_stats()
-        es_status = es_stats.get('status', 'unknown')
-        
-        return HealthResponse(
-            status="healthy" if es_status == "healthy" else "degraded",
-            version=settings.APP_VERSION,
-            timestamp=datetime.now(),
-            services={
-                "elasticsearch": es_status,
-                "agent_workflow": "healthy" if agent_workflow else "unhealthy",
-                "vertex_ai": "healthy"
-            }
-        )
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        raise HTTPException(status_code=503, detail="Service unhealthy")
+    """Health summary read from the background snapshot; makes no backend calls"""
+    ready, checks = health_monitor.readiness() if health_monitor else (False, {"snapshot": "missing"})
+    healthy = ready and checks.get("elasticsearch") == "healthy"
+    return HealthResponse(
+        status="healthy" if healthy else "degraded",
+        version=settings.APP_VERSION,
+        timestamp=datetime.now(),
+        services={**checks, "agent_workflow": "healthy" if agent_workflows else "unhealthy"},
+        snapshot_age_seconds=health_monitor.age_seconds() if health_monitor else None
+    )
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and its event loop is answering"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready", response_model=HealthResponse, responses={503: {"model": HealthResponse}})
+async def readiness():
+    """Readiness probe: search backend, Vertex AI, snapshot freshness and event-loop lag"""
+    ready, checks = health_monitor.readiness() if health_monitor else (False, {"snapshot": "missing"})
+    response = HealthResponse(
+        status="ready" if ready else "not_ready",
+        version=settings.APP_VERSION,
+        timestamp=datetime.now(),
+        services=checks,
+        snapshot_age_seconds=health_monitor.age_seconds() if health_monitor else None
+    )
+    return JSONResponse(status_code=200 if ready else 503, content=response.model_dump(mode="json"))
 
 @app.post("/api/v1/incidents/analyze", response_model=IncidentResponse)
-async def analyze_incident(request: IncidentRequest):
+async def analyze_incident(request: IncidentRequest, x_request_deadline: Optional[float] = Header(None)):
     """
     Analyze an incident and provide resolution recommendations
     
@@ -124,39 +253,87 @@ async def analyze_incident(request: IncidentRequest):
     2. Create search strategy
     3. Execute hybrid search across knowledge base
     4. Synthesize resolution recommendation
+    
+    Every stage runs within the request's deadline budget and degrades (local
+    strategy, templated recommendation, ...) rather than overrunning it.
     """
     request_id = str(uuid.uuid4())
     start_time = time.time()
+    deadline_seconds = request_deadline(request, x_request_deadline)
     
     logger.info(f"📨 Received incident analysis request {request_id}")
     logger.info(f"Description: {request.description[:100]}...")
     
     try:
+        # Serve near-duplicate reports from the response cache
+        query_vector = None
+        if response_cache and not request.bypass_cache:
+            entry = response_cache.lookup_exact(request.description)
+            tier, similarity = "exact", 1.0
+            if entry is None:
+                try:
+                    query_vector = await oracle_agent.embed_text(request.description)
+                except Exception as e:
+                    logger.warning(f"Embedding for response cache lookup failed: {e}")
+                match = response_cache.lookup_semantic(query_vector, request.description)
+                entry, similarity = match if match else (None, None)
+                tier = "semantic"
+            
+            if entry is not None:
+                processing_time = time.time() - start_time
+                logger.info(f"♻️ Request {request_id} served from response cache ({tier}, similarity {similarity:.3f})")
+                return cached_incident_response(entry, request_id, request.description, tier, similarity, processing_time)
+        
         # Execute agent workflow
         initial_state = {
             "incident_description": request.description,
             "request_id": request_id,
+            "deadline": start_time + deadline_seconds if deadline_seconds else None,
+            "node_timings": {},
             "agent_steps": [],
-            "errors": []
+            "errors": [],
+            "degradations": []
         }
         
-        result = agent_workflow.invoke(initial_state)
+        workflow_mode = WorkflowMode(request.workflow_mode or settings.WORKFLOW_MODE)
+        
+        async def run_workflow():
+            async with metrics.workflow_slot(workflow_slots):
+                result = await get_workflow(workflow_mode).ainvoke(initial_state)
+            metrics.observe_node_timings(result.get('node_timings'))
+            return result
+        
+        # Identical reports already being analyzed share that run's result. Only
+        # case and whitespace are ignored: a live run's answer is returned as the
+        # caller's own, so reports differing in any token are run separately.
+        # A follower waits no longer than its own deadline allows, then runs
+        # (degraded) on its own budget rather than inheriting the leader's
+        coalesced = False
+        if in_flight:
+            key = f"{workflow_mode.value}:{description_hash(request.description, mask_volatile=False)}"
+            deadline = initial_state["deadline"]
+            wait_seconds = deadline - time.time() - RESPONSE_MARGIN_SECONDS if deadline else None
+            result, coalesced = await in_flight.run(key, run_workflow, wait_seconds)
+        else:
+            result = await run_workflow()
         
         processing_time = time.time() - start_time
         
         # Build response
-        response = IncidentResponse(
-            request_id=request_id,
-            timestamp=datetime.now(),
-            incident_description=request.description,
-            analysis=IncidentAnalysis(**result['incident_analysis']),
-            search_results=[SearchResult(**r) for r in result['search_results']],
-            recommendation=ResolutionRecommendation(**result['resolution_recommendation']),
-            processing_time_seconds=round(processing_time, 2),
-            agent_steps=result['agent_steps']
+        response = build_incident_response(
+            request_id, request.description, result, processing_time, workflow_mode, deadline_seconds
         )
+        if coalesced:
+            response.coalesced_with = result['request_id']
+            logger.info(f"🔗 Request {request_id} coalesced with in-flight {result['request_id']} ({processing_time:.2f}s)")
+            return response
+        
+        degraded = f", degraded: {', '.join(response.degradations)}" if response.degradations else ""
+        logger.info(f"✅ Request {request_id} completed in {processing_time:.2f}s{degraded}")
         
-        logger.info(f"✅ Request {request_id} completed in {processing_time:.2f}s")
+        # Only cache complete answers, never fallbacks or deadline shortcuts
+        if response_cache and not result.get('errors') and not result.get('degradations'):
+            response_cache.put(request.description, query_vector or result.get('query_vector'), response, processing_time)
         
         return response
         
@@ -167,45 +344,165 @@ async def analyze_incident(request: IncidentRequest):
             detail=f"Failed to process incident: {str(e)}"
         )
 
+@app.post("/api/v1/incidents/analyze/batch", response_model=BatchIncidentResponse)
+async def analyze_incident_batch(request: BatchIncidentRequest):
+    """
+    Analyze many incidents (e.g. an alert storm) in one request
+    
+    Duplicate and near-identical descriptions share one analysis, all
+    descriptions are embedded in one request and all searches go out in one
+    _msearch. With stream=true, each item is sent as an NDJSON line as soon as
+    it completes, followed by a summary line.
+    """
+    if len(request.descriptions) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_ITEMS} descriptions per batch")
+    
+    batch_id = str(uuid.uuid4())
+    start_time = time.time()
+    workflow_mode = WorkflowMode(request.workflow_mode or settings.WORKFLOW_MODE)
+    analyzer = BatchAnalyzer(
+        oracle_agent,
+        response_cache=response_cache,
+        dedup_threshold=settings.BATCH_DEDUP_SIMILARITY_THRESHOLD,
+        max_concurrency=settings.BATCH_MAX_CONCURRENCY,
+        workflow_mode=workflow_mode,
+        bypass_cache=request.bypass_cache
+    )
+    logger.info(f"📨 Received batch {batch_id} with {len(request.descriptions)} incidents")
+    
+    async def item_results():
+        # Finished items by index, so duplicates can copy their representative's outcome
+        finished = {}
+        async for event in analyzer.run(request.descriptions, batch_id):
+            item = event["item"]
+            request_id = f"{batch_id}-{item.index}"
+            elapsed = time.time() - start_time
+            kind = event["kind"]
+            if kind == "duplicate":
+                source = finished[event["of"]]
+                result = source.result.model_copy(update={
+                    "request_id": request_id,
+                    "incident_description": item.description
+                }) if source.result else None
+                outcome = BatchItemResult(
+                    index=item.index, status=source.status, duplicate_of=event["of"],
+                    duplicate_similarity=round(item.similarity, 4), result=result, error=source.error
+                )
+            elif kind == "cached":
+                response = cached_incident_response(event["entry"], request_id, item.description,
+                                                     event["tier"], event["similarity"], elapsed)
+                outcome = BatchItemResult(index=item.index, status="ok", result=response)
+            elif kind == "error":
+                outcome = BatchItemResult(index=item.index, status="error", error=event["error"])
+            else:
+                try:
+                    response = build_incident_response(request_id, item.description, event["state"], elapsed, workflow_mode)
+                except Exception as e:
+                    logger.error(f"Batch item {request_id} produced an invalid response: {e}")
+                    outcome = BatchItemResult(index=item.index, status="error", error=str(e))
+                else:
+                    outcome = BatchItemResult(index=item.index, status="ok", result=response)
+                    if response_cache and not event["state"].get('errors'):
+                        response_cache.put(item.description, item.vector, response, elapsed)
+            finished[item.index] = outcome
+            yield outcome
+    
+    def summary() -> BatchSummary:
+        return BatchSummary(**analyzer.summary(), processing_time_seconds=round(time.time() - start_time, 2))
+    
+    if request.stream:
+        async def ndjson_lines():
+            try:
+                async for outcome in item_results():
+                    yield json.dumps({"type": "item", **outcome.model_dump(mode="json")}) + "\n"
+                yield json.dumps({"type": "summary", **summary().model_dump(mode="json")}) + "\n"
+            except Exception as e:
+                logger.error(f"❌ Error streaming batch {batch_id}: {e}", exc_info=True)
+                yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    
+    try:
+        items = [outcome async for outcome in item_results()]
+    except Exception as e:
+        logger.error(f"❌ Error processing batch {batch_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process batch: {str(e)}")
+    
+    batch_summary = summary()
+    logger.info(f"✅ Batch {batch_id}: {batch_summary.items} incidents, {batch_summary.unique} unique, "
+                f"{batch_summary.llm_calls} LLM calls in {batch_summary.processing_time_seconds:.2f}s")
+    return BatchIncidentResponse(
+        batch_id=batch_id,
+        timestamp=datetime.now(),
+        items=sorted(items, key=lambda outcome: outcome.index),
+        summary=batch_summary
+    )
+
+# SSE events emitted for each workflow node: node -> [(event type, state key)]
+STREAM_NODE_EVENTS = {
+    "analyze": [("analysis", "incident_analysis"), ("strategy", "search_strategy")],
+    "strategize": [("strategy", "search_strategy")],
+    "candidate_search": [("candidates", "vector_candidates")],
+    "search": [("search_results", "search_results")],
+    "synthesize": [("recommendation", "resolution_recommendation")],
+}
+
 @app.post("/api/v1/incidents/analyze/stream")
-async def analyze_incident_stream(request: IncidentRequest):
+async def analyze_incident_stream(request: IncidentRequest, x_request_deadline: Optional[float] = Header(None)):
     """
     Stream incident analysis results in real-time
     
-    Returns Server-Sent Events (SSE) for real-time updates during analysis
+    Returns Server-Sent Events (SSE) as each workflow node completes:
+    analysis, strategy, search_results and recommendation events each carry
+    the node's own duration and the elapsed time since the request started.
     """
     request_id = str(uuid.uuid4())
+    deadline_seconds = request_deadline(request, x_request_deadline)
     
     async def event_generator():
+        start_time = time.time()
+        agent_steps = []
+        degradations = []
+        
         try:
             yield f"data: {json.dumps({'type': 'start', 'request_id': request_id})}\n\n"
             
-            # Execute workflow with streaming updates
             initial_state = {
                 "incident_description": request.description,
                 "request_id": request_id,
+                "deadline": start_time + deadline_seconds if deadline_seconds else None,
+                "node_timings": {},
                 "agent_steps": [],
-                "errors": []
+                "errors": [],
+                "degradations": []
             }
             
-            # For streaming, we'll execute and send updates at each step
-            # Note: This is a simplified version. For true streaming, you'd need to modify the workflow
-            
-            yield f"data: {json.dumps({'type': 'step', 'step': 'Analyzing incident...'})}\n\n"
-            
-            result = agent_workflow.invoke(initial_state)
-            
-            # Send analysis
-            yield f"data: {json.dumps({'type': 'analysis', 'data': result['incident_analysis']})}\n\n"
-            
-            # Send search results
-            yield f"data: {json.dumps({'type': 'search_results', 'data': result['search_results']})}\n\n"
-            
-            # Send recommendation
-            yield f"data: {json.dumps({'type': 'recommendation', 'data': result['resolution_recommendation']})}\n\n"
+            # Emit each node's output as soon as that node finishes
+            workflow = get_workflow(request.workflow_mode)
+            async with metrics.workflow_slot(workflow_slots):
+                async for update in workflow.astream(initial_state, stream_mode="updates"):
+                    for node, output in update.items():
+                        output = output or {}
+                        steps = output.get('agent_steps', [])
+                        agent_steps.extend(steps)
+                        degradations.extend(output.get('degradations', []))
+                        metrics.observe_node_timings(output.get('node_timings'))
+                        
+                        timing = {
+                            'node': node,
+                            'node_seconds': round(output.get('node_timings', {}).get(node, 0.0), 3),
+                            'elapsed_seconds': round(time.time() - start_time, 3)
+                        }
+                        
+                        for step in steps:
+                            yield f"data: {json.dumps({'type': 'step', 'step': step, **timing})}\n\n"
+                        
+                        for event_type, state_key in STREAM_NODE_EVENTS.get(node, []):
+                            if state_key in output:
+                                yield f"data: {json.dumps({'type': event_type, 'data': output[state_key], **timing}, default=str)}\n\n"
             
             # Send complete
-            yield f"data: {json.dumps({'type': 'complete', 'agent_steps': result['agent_steps']})}\n\n"
+            yield f"data: {json.dumps({'type': 'complete', 'agent_steps': agent_steps, 'degradations': degradations, 'processing_time_seconds': round(time.time() - start_time, 2)})}\n\n"
             
         except Exception as e:
             logger.error(f"Streaming error: {e}")
@@ -217,6 +514,7 @@ async def analyze_incident_stream(request: IncidentRequest):
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
         }
     )
 
@@ -224,7 +522,7 @@ async def analyze_incident_stream(request: IncidentRequest):
 async def get_incident(incident_id: str):
     """Retrieve a specific incident by ID"""
     try:
-        incident = search_engine.get_incident_by_id(incident_id)
+        incident = await search_engine.get_incident_by_id(incident_id)
         if not incident:
             raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
         return incident
@@ -234,19 +532,37 @@ async def get_incident(incident_id: str):
         logger.error(f"Error retrieving incident: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def embedding_cache_stats() -> Dict:
+    """Embedding cache stats; a persistent cache counts its rows off the event loop"""
+    if not oracle_agent:
+        return {}
+    cache = oracle_agent.embedding_cache
+    return await asyncio.to_thread(cache.stats) if cache.blocking else cache.stats()
+
 @app.get("/api/v1/stats")
 async def get_stats():
-    """Get system statistics"""
+    """Get system statistics (index stats from the health snapshot)"""
     try:
-        stats = search_engine.get_index_stats()
+        snapshot = await health_monitor.current()
         return {
-            "elasticsearch": stats,
+            "elasticsearch": snapshot["elasticsearch"],
+            "snapshot_age_seconds": snapshot["age_seconds"],
+            "embedding_cache": await embedding_cache_stats(),
+            "response_cache": response_cache.stats() if response_cache else {},
+            "request_coalescing": in_flight.stats() if in_flight else {},
+            "model_routing": oracle_agent.router.stats() if oracle_agent else {},
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = metrics.render_latest()
+    return Response(content=payload, headers={"Content-Type": content_type})
+
 # Error handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
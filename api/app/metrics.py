@@ -0,0 +1,182 @@
+"""Prometheus metrics for the API, the agent workflow and its backends"""
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import asyncio
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Seconds; spans cached ES lookups (ms) to slow LLM synthesis calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "devops_oracle_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "devops_oracle_requests_in_flight",
+    "HTTP requests currently being processed"
+)
+
+WORKFLOW_QUEUE_DEPTH = Gauge(
+    "devops_oracle_workflow_queue_depth",
+    "Requests waiting for a workflow slot (MAX_CONCURRENT_WORKFLOWS)"
+)
+
+WORKFLOWS_RUNNING = Gauge(
+    "devops_oracle_workflows_running",
+    "Agent workflows currently executing"
+)
+
+NODE_LATENCY = Histogram(
+    "devops_oracle_node_duration_seconds",
+    "Duration of each LangGraph workflow node",
+    ["node"],
+    buckets=LATENCY_BUCKETS
+)
+
+VERTEX_AI_LATENCY = Histogram(
+    "devops_oracle_vertex_ai_duration_seconds",
+    "Vertex AI call latency by model and prompt type",
+    ["model", "prompt_type", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+ELASTICSEARCH_LATENCY = Histogram(
+    "devops_oracle_elasticsearch_duration_seconds",
+    "Client-side Elasticsearch request latency, including network",
+    ["operation", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+ELASTICSEARCH_TOOK = Histogram(
+    "devops_oracle_elasticsearch_took_seconds",
+    "Server-side Elasticsearch execution time reported in 'took'",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+FALLBACKS = Counter(
+    "devops_oracle_fallbacks_total",
+    "Degraded results served instead of a failed step",
+    ["component"]
+)
+
+EVENT_LOOP_LAG = Gauge(
+    "devops_oracle_event_loop_lag_seconds",
+    "How late the event loop woke a short sleep (latest sample)"
+)
+
+PROMPT_TOKENS = Histogram(
+    "devops_oracle_prompt_tokens",
+    "Prompt tokens per LLM call (Vertex AI's count, else estimated)",
+    ["prompt_type"],
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+)
+
+MODEL_ROUTES = Counter(
+    "devops_oracle_model_routes_total",
+    "LLM calls by workflow node, the model routed to and why (node, severity or budget)",
+    ["node", "model", "reason"]
+)
+
+COALESCED_REQUESTS = Counter(
+    "devops_oracle_coalesced_requests_total",
+    "Requests that joined an identical analysis already in flight instead of running a workflow"
+)
+
+def observe_node_timings(node_timings: Optional[Dict[str, float]]):
+    for node, seconds in (node_timings or {}).items():
+        NODE_LATENCY.labels(node=node).observe(seconds)
+
+def observe_elasticsearch(operation: str, seconds: float, status: str, response=None):
+    ELASTICSEARCH_LATENCY.labels(operation=operation, status=status).observe(seconds)
+    # elasticsearch-py wraps bodies in ObjectApiResponse, which has no .get()
+    body = getattr(response, 'body', response)
+    took = body.get('took') if isinstance(body, dict) else None
+    if took is not None:
+        ELASTICSEARCH_TOOK.labels(operation=operation).observe(took / 1000.0)
+
+def record_fallback(component: str):
+    FALLBACKS.labels(component=component).inc()
+
+def observe_prompt_tokens(prompt_type: str, tokens: int):
+    PROMPT_TOKENS.labels(prompt_type=prompt_type).observe(tokens)
+
+def record_model_route(node: str, model: str, reason: str):
+    MODEL_ROUTES.labels(node=node, model=model, reason=reason).inc()
+
+def record_coalesced():
+    COALESCED_REQUESTS.inc()
+
+@asynccontextmanager
+async def track_vertex_call(model: str, prompt_type: str):
+    """Time one Vertex AI call; failures are recorded with status="error" and re-raised"""
+    start_time = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        VERTEX_AI_LATENCY.labels(model=model, prompt_type=prompt_type, status=status).observe(
+            time.perf_counter() - start_time
+        )
+
+@asynccontextmanager
+async def workflow_slot(semaphore: Optional[asyncio.Semaphore]):
+    """Wait for a workflow slot (counted as queue depth), then count the run as executing"""
+    if semaphore is not None:
+        WORKFLOW_QUEUE_DEPTH.inc()
+        try:
+            await semaphore.acquire()
+        finally:
+            WORKFLOW_QUEUE_DEPTH.dec()
+    
+    WORKFLOWS_RUNNING.inc()
+    try:
+        yield
+    finally:
+        WORKFLOWS_RUNNING.dec()
+        if semaphore is not None:
+            semaphore.release()
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware timing every HTTP request until its last body chunk is sent,
+    so streamed (SSE) responses are measured end to end, not to first byte.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(method=scope["method"], route=route, status=str(status_code)).observe(
+                time.perf_counter() - start_time
+            )
+
+def render_latest():
+    """Exposition payload and content type for the /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,104 @@
+"""
+Per-node model routing
+
+Each LLM node (analyze, strategize, synthesize) has its own configured model.
+A node's model is swapped for the fast model when the incident's severity does
+not warrant a reasoning model, or when the model's observed p95 latency does
+not fit the remaining deadline budget. Every decision is counted by node,
+model and reason, and every successful call's latency is kept per model, so
+the cost/latency trade-off can be tuned from /metrics and /api/v1/stats.
+"""
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+import threading
+
+import numpy as np
+
+from app import metrics
+
+LATENCY_WINDOW = 200  # recent calls per model used for the p50/p95
+MIN_LATENCY_SAMPLES = 10  # fewer observations than this fall back to default_expected_seconds
+
+class ModelRoute:
+    def __init__(self, node: str, model_name: str, reason: str, model):
+        self.node = node
+        self.model_name = model_name
+        self.reason = reason  # "node", "severity" or "budget"
+        self.model = model
+
+class ModelRouter:
+    def __init__(
+        self,
+        node_models: Dict[str, str],
+        fast_model: str,
+        reasoning_severities: Iterable[str] = ("P0", "P1", "P2"),
+        default_expected_seconds: float = 15.0,
+        models: Optional[Dict[str, object]] = None,
+        model_factory: Optional[Callable[[str], object]] = None
+    ):
+        self.node_models = dict(node_models)
+        self.fast_model = fast_model
+        self.reasoning_severities = set(reasoning_severities)
+        self.default_expected_seconds = default_expected_seconds
+        self._models = dict(models or {})
+        self._model_factory = model_factory
+        self._latencies: Dict[str, deque] = {}
+        self._decisions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def model(self, name: str):
+        """Model client for name, created on first use"""
+        if name not in self._models:
+            if self._model_factory is None:
+                from vertexai.generative_models import GenerativeModel
+                self._model_factory = GenerativeModel
+            self._models[name] = self._model_factory(name)
+        return self._models[name]
+    
+    def expected_seconds(self, name: str) -> float:
+        """p95 of recent calls to the model, or the default until there are enough"""
+        with self._lock:
+            samples = list(self._latencies.get(name, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.default_expected_seconds
+        return float(np.percentile(samples, 95))
+    
+    def select(self, node: str, severity: Optional[str] = None, budget: Optional[float] = None) -> ModelRoute:
+        """
+        The node's configured model, unless the (known) severity is below the
+        reasoning tier or the model's p95 does not fit the budget in seconds
+        """
+        name, reason = self.node_models.get(node, self.fast_model), "node"
+        if name != self.fast_model and severity and severity not in self.reasoning_severities:
+            name, reason = self.fast_model, "severity"
+        if name != self.fast_model and budget is not None and self.expected_seconds(name) > budget:
+            name, reason = self.fast_model, "budget"
+        
+        metrics.record_model_route(node, name, reason)
+        with self._lock:
+            key = f"{node}:{name}:{reason}"
+            self._decisions[key] = self._decisions.get(key, 0) + 1
+        return ModelRoute(node, name, reason, self.model(name))
+    
+    def observe(self, name: str, seconds: float):
+        """Latency of a successful call"""
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            latencies = {name: list(samples) for name, samples in self._latencies.items()}
+            decisions = dict(self._decisions)
+        return {
+            "node_models": self.node_models,
+            "fast_model": self.fast_model,
+            "decisions": decisions,
+            "latency": {
+                name: {
+                    "calls": len(samples),
+                    "p50_seconds": round(float(np.percentile(samples, 50)), 3),
+                    "p95_seconds": round(float(np.percentile(samples, 95)), 3)
+                }
+                for name, samples in latencies.items() if samples
+            }
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Annotated, List, Dict, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -16,9 +16,18 @@ class IncidentType(str, Enum):
     INFRASTRUCTURE = "infrastructure"
     SECURITY = "security"
 
+class WorkflowMode(str, Enum):
+    FULL = "full"  # separate analysis and search strategy LLM calls
+    FAST = "fast"  # one LLM call returns both analysis and search strategy
+
 class IncidentRequest(BaseModel):
     description: str = Field(..., min_length=10, description="Detailed incident description")
     user_id: Optional[str] = Field(None, description="User ID for tracking")
+    workflow_mode: Optional[WorkflowMode] = Field(None, description="Workflow layout; defaults to the WORKFLOW_MODE setting")
+    bypass_cache: bool = Field(False, description="Always run the workflow, ignoring cached responses")
+    deadline_seconds: Optional[float] = Field(
+        None, gt=0, description="Time budget for the whole request; overrides the X-Request-Deadline header and the default"
+    )
     
     class Config:
         json_schema_extra = {
@@ -44,6 +53,7 @@ class SearchResult(BaseModel):
     severity: str
     incident_type: str
     resolution_steps: str
+    resolution_summary: Optional[Dict] = None
     resolution_time_minutes: int
     similarity_score: float
     created_at: str
@@ -69,12 +79,59 @@ class IncidentResponse(BaseModel):
     recommendation: ResolutionRecommendation
     processing_time_seconds: float
     agent_steps: List[str]
+    node_timings: Dict[str, float] = Field(default_factory=dict, description="Seconds spent in each workflow node")
+    workflow_mode: Optional[WorkflowMode] = None
+    cache_hit: Optional[str] = Field(None, description="'exact' or 'semantic' when served from the response cache")
+    cache_similarity: Optional[float] = None
+    coalesced_with: Optional[str] = Field(None, description="request_id of the in-flight analysis whose result this request shared")
+    deadline_seconds: Optional[float] = Field(None, description="Time budget the request ran under")
+    degradations: List[str] = Field(default_factory=list, description="Shortcuts taken to meet the deadline, e.g. strategy_skipped")
+    model_routes: Dict[str, str] = Field(default_factory=dict, description="Model each LLM node was routed to")
+    prompt_tokens: Dict[str, int] = Field(default_factory=dict, description="Prompt tokens each LLM node sent")
+
+class BatchIncidentRequest(BaseModel):
+    descriptions: List[Annotated[str, Field(min_length=10)]] = Field(
+        ..., min_length=1, description="Incident descriptions, e.g. every alert of one storm"
+    )
+    user_id: Optional[str] = Field(None, description="User ID for tracking")
+    workflow_mode: Optional[WorkflowMode] = Field(None, description="Workflow layout; defaults to the WORKFLOW_MODE setting")
+    bypass_cache: bool = Field(False, description="Always run the workflow, ignoring cached responses")
+    stream: bool = Field(False, description="Stream per-item results as NDJSON lines as they complete")
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the description in the request")
+    status: str = Field(..., description="'ok' or 'error'")
+    duplicate_of: Optional[int] = Field(None, description="Index of the item whose analysis this one shares")
+    duplicate_similarity: Optional[float] = None
+    result: Optional[IncidentResponse] = None
+    error: Optional[str] = None
+
+class BatchSummary(BaseModel):
+    items: int
+    unique: int
+    duplicates: int
+    cache_hits: int
+    errors: int
+    llm_calls: int
+    embedding_requests: int
+    search_requests: int
+    single_call_llm_calls: int = Field(..., description="LLM calls the same items would take as single requests")
+    single_call_embedding_requests: int
+    single_call_search_requests: int
+    processing_time_seconds: float
+
+class BatchIncidentResponse(BaseModel):
+    batch_id: str
+    timestamp: datetime
+    items: List[BatchItemResult]
+    summary: BatchSummary
 
 class HealthResponse(BaseModel):
     status: str
     version: str
     timestamp: datetime
     services: Dict[str, str]
+    snapshot_age_seconds: Optional[float] = Field(None, description="Age of the background health snapshot the status was read from")
 
 class ErrorResponse(BaseModel):
     error: str
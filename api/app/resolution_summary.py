@@ -0,0 +1,133 @@
+"""
+Compact resolution summaries computed at ingest time
+
+Past incidents are read by every synthesis request that retrieves them, and
+their resolution_steps and root_cause are long free text. summarize_resolution
+reduces them once, when the incident is ingested, to a structured summary of
+a fixed maximum size:
+
+- key_actions: the remediation steps (investigation-only steps are dropped
+  when there are enough others), in their original order
+- commands: shell, kubectl, SQL and similar commands quoted in the steps
+- root_cause_category: a coarse category matched from the root cause text
+- text: the three rendered as one line within SUMMARY_TOKENS, which the
+  synthesis context uses in place of the raw steps
+
+The summary is deterministic, so re-ingesting an unchanged incident produces
+the same one; bump SUMMARY_VERSION when the rules change so incremental
+ingest rewrites the stored summaries.
+"""
+from typing import Dict, List
+import re
+
+from app.context_builder import estimate_tokens, truncate_to_tokens
+
+SUMMARY_VERSION = 2
+SUMMARY_TOKENS = 56
+MAX_KEY_ACTIONS = 3
+MAX_COMMANDS = 3
+ACTION_TOKENS = 14
+COMMAND_TOKENS = 16
+ROOT_CAUSE_TOKENS = 14
+
+# First match wins; checked against the root cause, then the title and steps
+ROOT_CAUSE_CATEGORIES = (
+    ("deployment", ("deploy", "release", "rollout", "regression", "code change", "merged")),
+    ("configuration", ("config", "misconfigur", "setting", "parameter", "feature flag", "typo")),
+    ("capacity", ("traffic spike", "capacity", "load", "pool", "throttl", "rate limit", "scal")),
+    ("resource_exhaustion", ("memory", "oom", "disk", "cpu", "leak", "exhaust", "file descriptor", "quota")),
+    ("certificate", ("certificate", "cert ", "tls", "ssl", "expired")),
+    ("dependency", ("third-party", "upstream", "vendor", "dependency", "provider", "external")),
+    ("network", ("network", "dns", "latency", "packet", "firewall", "load balancer", "timeout")),
+    ("data", ("index", "query", "schema", "migration", "replication", "lock", "corrupt")),
+    ("security", ("credential", "permission", "unauthori", "secret", "attack", "ddos")),
+)
+
+# Steps that only looked at something; kept only when nothing better is left
+INVESTIGATION_VERBS = ("checked", "investigated", "analyzed", "analysed", "reviewed", "observed",
+                       "monitored", "identified", "found", "noticed", "confirmed", "verified", "looked")
+
+COMMAND_PREFIXES = (
+    "kubectl", "helm", "docker", "systemctl", "terraform", "aws", "gcloud", "az", "psql", "mysql",
+    "redis-cli", "curl", "git", "sudo", "ansible", "nginx", "service", "iptables", "openssl",
+    "CREATE", "ALTER", "DROP", "UPDATE", "DELETE", "VACUUM", "ANALYZE", "REINDEX", "SET", "GRANT"
+)
+
+_STEP_PREFIX = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+_BACKTICKS = re.compile(r"`([^`]+)`")
+_COMMAND = re.compile(r"(?:^|:\s+)((?:" + "|".join(COMMAND_PREFIXES) + r")\b[^;]*)")
+
+def split_steps(resolution_steps: str) -> List[str]:
+    """Numbered or bulleted lines, or sentences when the text is one paragraph"""
+    lines = [line for line in resolution_steps.splitlines() if line.strip()]
+    if len(lines) <= 1:
+        lines = re.split(r"(?<=[.;])\s+", resolution_steps)
+    return [_STEP_PREFIX.sub("", line).strip() for line in lines if _STEP_PREFIX.sub("", line).strip()]
+
+def extract_commands(steps: List[str], limit: int = MAX_COMMANDS) -> List[str]:
+    commands = []
+    for step in steps:
+        found = _BACKTICKS.findall(step) or [match.strip().rstrip(".") for match in _COMMAND.findall(step)]
+        for command in found:
+            command = truncate_to_tokens(command.strip(), COMMAND_TOKENS)
+            if command and command not in commands:
+                commands.append(command)
+            if len(commands) == limit:
+                return commands
+    return commands
+
+def key_actions(steps: List[str], limit: int = MAX_KEY_ACTIONS) -> List[str]:
+    """Up to limit steps, remediation before investigation, in their original order"""
+    def investigative(step: str) -> bool:
+        return step.lower().startswith(INVESTIGATION_VERBS)
+    
+    chosen = [i for i, step in enumerate(steps) if not investigative(step)][:limit]
+    chosen += [i for i, step in enumerate(steps) if investigative(step)][:limit - len(chosen)]
+    return [truncate_to_tokens(steps[i], ACTION_TOKENS) for i in sorted(chosen)]
+
+def root_cause_category(incident: Dict) -> str:
+    for text in (incident.get('root_cause') or "", f"{incident.get('title', '')} {incident.get('resolution_steps', '')}"):
+        lowered = text.lower()
+        for category, keywords in ROOT_CAUSE_CATEGORIES:
+            if any(keyword in lowered for keyword in keywords):
+                return category
+    return "unknown"
+
+def render_summary(category: str, root_cause: str, actions: List[str], commands: List[str],
+                   tokens: int = SUMMARY_TOKENS) -> str:
+    # Commands an action already quotes in full are not repeated
+    commands = [command for command in commands if not any(command in action for action in actions)]
+    
+    def render(actions: List[str], commands: List[str]) -> str:
+        parts = [f"Root cause [{category}]" + (f": {truncate_to_tokens(root_cause, ROOT_CAUSE_TOKENS)}" if root_cause else "")]
+        if actions:
+            parts.append("Actions: " + "; ".join(actions))
+        if commands:
+            parts.append("Commands: " + "; ".join(commands))
+        return ". ".join(parts)
+    
+    # Drop the last command, then the last action, until it fits; truncate as a last resort
+    text = render(actions, commands)
+    while estimate_tokens(text) > tokens and (commands or len(actions) > 1):
+        if commands:
+            commands = commands[:-1]
+        else:
+            actions = actions[:-1]
+        text = render(actions, commands)
+    return truncate_to_tokens(text, tokens)
+
+def summarize_resolution(incident: Dict, tokens: int = SUMMARY_TOKENS) -> Dict:
+    """The resolution_summary field for an incident"""
+    steps = split_steps(incident.get('resolution_steps') or "")
+    actions = key_actions(steps)
+    commands = extract_commands(steps)
+    category = root_cause_category(incident)
+    text = render_summary(category, (incident.get('root_cause') or "").strip(), actions, commands, tokens)
+    return {
+        "key_actions": actions,
+        "commands": commands,
+        "root_cause_category": category,
+        "text": text,
+        "tokens": estimate_tokens(text),
+        "version": SUMMARY_VERSION
+    }
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+# Tokens that differ between otherwise identical alerts: UUIDs, timestamps,
+# IP addresses, epoch times, pod-name suffixes and hex ids. Status codes, exit
+# codes and ports (including the :port after an address) carry the error itself
+# and are kept.
+_VOLATILE_TOKENS = (
+    re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"),
+    re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b"),
+    re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"),
+    re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b"),
+    re.compile(r"\b\d{10,13}\b"),
+    re.compile(r"(?<=-)(?=[a-z]{0,9}\d)[a-z0-9]{8,10}-[a-z0-9]{5}\b"),
+    re.compile(r"\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{6,}\b"),
+)
+_WHITESPACE = re.compile(r"\s+")
+# Numbers that identify the error rather than the instance: values after
+# status/code/exit/errno/port-like words, a :port, and bare 4xx/5xx status
+# codes. Replica, node and shard numbers are left out
+_ERROR_NUMBERS = (
+    re.compile(r"\b(?:http|status|code|exit|errno|error|err|signal|sig|rc|port)\W{0,3}(\d+)\b"),
+    re.compile(r":(\d{2,5})\b"),
+    re.compile(r"\b([45]\d{2})\b"),
+)
+
+def normalize_description(description: str, mask_volatile: bool = True) -> str:
+    """Canonical form used for exact-match caching and batch deduplication"""
+    text = description.lower()
+    if mask_volatile:
+        for pattern in _VOLATILE_TOKENS:
+            text = pattern.sub("#", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def error_numbers(description: str) -> frozenset:
+    """Status codes, exit codes, errno values and ports in the normalized description"""
+    text = normalize_description(description)
+    return frozenset(number for pattern in _ERROR_NUMBERS for number in pattern.findall(text))
+
+def description_hash(description: str, mask_volatile: bool = True) -> str:
+    return hashlib.sha256(normalize_description(description, mask_volatile).encode("utf-8")).hexdigest()
+
+class CacheEntry:
+    def __init__(self, response, vector: Optional[np.ndarray], numbers: frozenset, processing_time: float):
+        self.response = response
+        self.vector = vector
+        self.numbers = numbers
+        self.processing_time = processing_time
+        self.created_at = time.monotonic()
+
+class ResponseCache:
+    """
+    Two-tier cache of answered incidents. The exact tier matches the normalized
+    description hash; the semantic tier matches any recent entry whose embedding
+    is within the cosine similarity threshold. Entries expire after ttl_seconds
+    and the least recently used entry is evicted beyond max_entries.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 900, similarity_threshold: float = 0.97):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Stacked unit vectors for the semantic tier, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_keys = []
+        
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved_seconds = 0.0
+    
+    def _expire(self):
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if now - e.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+    
+    def _hit(self, key: str, tier: str, lookup_start: float) -> CacheEntry:
+        entry = self._entries[key]
+        self._entries.move_to_end(key)
+        if tier == "exact":
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        self.latency_saved_seconds += max(0.0, entry.processing_time - (time.perf_counter() - lookup_start))
+        return entry
+    
+    def lookup_exact(self, description: str) -> Optional[CacheEntry]:
+        """Exact tier: normalized description hash"""
+        lookup_start = time.perf_counter()
+        key = description_hash(description)
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                return self._hit(key, "exact", lookup_start)
+        return None
+    
+    def lookup_semantic(self, vector: List[float], description: str) -> Optional[Tuple[CacheEntry, float]]:
+        """
+        Semantic tier: nearest cached embedding above the similarity threshold,
+        among entries with the same error numbers as description (embeddings of
+        "HTTP 502" and "HTTP 504" alerts are nearly identical)
+        """
+        lookup_start = time.perf_counter()
+        query = _unit(vector)
+        numbers = error_numbers(description)
+        with self._lock:
+            self._expire()
+            if query is not None and self._entries:
+                if self._matrix is None:
+                    self._rebuild_matrix()
+                if self._matrix_keys:
+                    similarities = self._matrix @ query
+                    similarities[[self._entries[k].numbers != numbers for k in self._matrix_keys]] = -np.inf
+                    best = int(np.argmax(similarities))
+                    similarity = float(similarities[best])
+                    if similarity >= self.similarity_threshold:
+                        return self._hit(self._matrix_keys[best], "semantic", lookup_start), similarity
+            self.misses += 1
+        return None
+    
+    def put(self, description: str, vector: Optional[List[float]], response, processing_time: float):
+        key = description_hash(description)
+        with self._lock:
+            self._entries[key] = CacheEntry(response, _unit(vector), error_numbers(description), processing_time)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+    
+    def _rebuild_matrix(self):
+        keys = [k for k, e in self._entries.items() if e.vector is not None]
+        self._matrix_keys = keys
+        self._matrix = np.vstack([self._entries[k].vector for k in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+    
+    def stats(self) -> Dict:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 2)
+        }
+
+def _unit(vector: Optional[List[float]]) -> Optional[np.ndarray]:
+    if vector is None or len(vector) == 0:
+        return None
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else None
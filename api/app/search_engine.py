@@ -1,126 +1,487 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, NotFoundError
 from typing import List, Dict, Optional
 import logging
+import time
+
+from app import metrics
 
 logger = logging.getLogger(__name__)
 
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict]],
+    k: int = 60,
+    size: Optional[int] = None,
+    id_field: str = 'incident_id'
+) -> List[Dict]:
+    """
+    Fuse several ranked result lists with reciprocal rank fusion: each document
+    scores sum(1 / (k + rank)) over the lists it appears in. The first occurrence
+    of a document keeps its fields; the fused score is added as 'fusion_score'.
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            doc_id = result.get(id_field)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(doc_id, result)
+    
+    ranked = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+    fused = [{**documents[doc_id], 'fusion_score': scores[doc_id]} for doc_id in ranked]
+    return fused[:size] if size else fused
+
+def matches_filters(result: Dict, filters: Optional[Dict]) -> bool:
+    """
+    Whether a search result passes term/terms filters the way Elasticsearch
+    applies them: every field must hold one of the allowed values, and a
+    result without the field does not match
+    """
+    for field, allowed in (filters or {}).items():
+        allowed = set(allowed) if isinstance(allowed, list) else {allowed}
+        value = result.get(field)
+        values = set(value) if isinstance(value, list) else {value}
+        if not values & allowed:
+            return False
+    return True
+
+# Fields searched by the keyword (BM25) leg, with boosts
+KEYWORD_FIELDS = [
+    "title^3",
+    "description^2",
+    "error_messages^2",
+    "resolution_steps",
+    "root_cause",
+    "technical_terms^2"
+]
+
+# Fields of the error-message-focused sub-query (see multi_query_search)
+ERROR_MESSAGE_FIELDS = [
+    "error_messages^3",
+    "root_cause"
+]
+
+HIGHLIGHT = {
+    "fields": {
+        "description": {"fragment_size": 150, "number_of_fragments": 3},
+        "error_messages": {"fragment_size": 150, "number_of_fragments": 2},
+        "resolution_steps": {"fragment_size": 200, "number_of_fragments": 3}
+    },
+    "pre_tags": ["<mark>"],
+    "post_tags": ["</mark>"]
+}
+
 class HybridSearchEngine:
-    def __init__(self, cloud_id: str, api_key: str, index_name: str):
-        self.es = Elasticsearch(
+    def __init__(
+        self,
+        cloud_id: str,
+        api_key: str,
+        index_name: str,
+        retrieval_mode: str = "knn",
+        num_candidates: int = 100,
+        rrf_rank_constant: int = 60
+    ):
+        self.es = AsyncElasticsearch(
             cloud_id=cloud_id,
             api_key=api_key
         )
         self.index_name = index_name
-        self._verify_connection()
+        self.retrieval_mode = retrieval_mode
+        self.num_candidates = num_candidates
+        self.rrf_rank_constant = rrf_rank_constant
     
-    def _verify_connection(self):
+    async def verify_connection(self):
         """Verify Elasticsearch connection"""
         try:
-            if not self.es.ping():
+            if not await self.es.ping():
                 raise ConnectionError("Cannot connect to Elasticsearch")
             logger.info(f"✅ Connected to Elasticsearch cluster")
         except Exception as e:
             logger.error(f"❌ Elasticsearch connection failed: {e}")
             raise
     
-    def hybrid_search(
+    async def close(self):
+        """Close the underlying connection pool"""
+        await self.es.close()
+    
+    def _client(self, timeout: Optional[float]):
+        """The client, with a request timeout when the caller has a time budget"""
+        return self.es.options(request_timeout=timeout) if timeout else self.es
+    
+    def _limit_bodies(self, bodies: List[Dict], timeout: Optional[float], terminate_after: Optional[int]):
+        """
+        Bound each search server-side: 'timeout' returns the hits collected so far
+        when it runs out, 'terminate_after' caps the documents each shard collects
+        for the BM25 bodies (kNN searches are already bounded by num_candidates).
+        """
+        for body in bodies:
+            if timeout:
+                body["timeout"] = f"{max(1, int(timeout * 1000))}ms"
+            if terminate_after and "knn" not in body:
+                body["terminate_after"] = terminate_after
+    
+    def _check_timed_out(self, responses: List[Dict]):
+        if any(r.get('timed_out') for r in responses):
+            metrics.record_fallback("search_timeout")
+            logger.warning("Search timed out on the cluster; returning partial hits")
+    
+    async def _request(self, operation: str, call, **kwargs):
+        """Run one Elasticsearch API call, recording client latency and the server 'took'"""
+        start_time = time.perf_counter()
+        response = None
+        status = "error"
+        try:
+            response = await call(**kwargs)
+            status = "ok"
+            return response
+        finally:
+            metrics.observe_elasticsearch(operation, time.perf_counter() - start_time, status, response)
+    
+    def _build_filters(self, filters: Optional[Dict]) -> List[Dict]:
+        filter_clauses = []
+        if filters:
+            for field, value in filters.items():
+                if isinstance(value, list):
+                    filter_clauses.append({"terms": {field: value}})
+                else:
+                    filter_clauses.append({"term": {field: value}})
+        return filter_clauses
+    
+    def _keyword_clause(self, query_text: str, boost: float = 1.0, fields: Optional[List[str]] = None) -> Dict:
+        return {
+            "multi_match": {
+                "query": query_text,
+                "fields": fields or KEYWORD_FIELDS,
+                "type": "best_fields",
+                "boost": boost,
+                "fuzziness": "AUTO"
+            }
+        }
+    
+    def _knn_clause(self, query_vector: List[float], k: int, filter_clauses: List[Dict]) -> Dict:
+        """Approximate (HNSW) kNN with filters applied as a pre-filter"""
+        knn = {
+            "field": "description_embedding",
+            "query_vector": query_vector,
+            "k": k,
+            "num_candidates": max(self.num_candidates, k)
+        }
+        if filter_clauses:
+            knn["filter"] = filter_clauses
+        return knn
+    
+    def _format_hit(self, hit: Dict) -> Dict:
+        source = hit['_source']
+        return {
+            'incident_id': source.get('incident_id'),
+            'title': source.get('title'),
+            'description': source.get('description'),
+            'severity': source.get('severity'),
+            'incident_type': source.get('incident_type'),
+            'resolution_steps': source.get('resolution_steps'),
+            'resolution_summary': source.get('resolution_summary'),
+            'resolution_time_minutes': source.get('resolution_time_minutes', 0),
+            'created_at': source.get('created_at'),
+            'similarity_score': hit['_score'],
+            'highlights': hit.get('highlight', {})
+        }
+    
+    async def hybrid_search(
         self,
         query_text: str,
         query_vector: List[float],
         filters: Optional[Dict] = None,
         size: int = 10,
         keyword_boost: float = 1.0,
-        vector_boost: float = 2.0
+        vector_boost: float = 2.0,
+        retrieval_mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
     ) -> List[Dict]:
         """
-        Perform hybrid search combining keyword (BM25) and vector (semantic) search
+        Perform hybrid search combining keyword (BM25) and vector (semantic) search.
+        
+        retrieval_mode "knn" (default) runs HNSW kNN and BM25 as separate legs and
+        fuses them with reciprocal rank fusion; "script_score" is the exact
+        brute-force cosine scan summed with BM25 using the boosts. timeout
+        (seconds) and terminate_after bound the search for callers on a deadline.
+        """
+        if (retrieval_mode or self.retrieval_mode) == "script_score":
+            return await self._script_score_search(
+                query_text, query_vector, filters, size, keyword_boost, vector_boost, timeout, terminate_after
+            )
+        return await self._knn_search(query_text, query_vector, filters, size, timeout, terminate_after)
+    
+    async def multi_query_search(
+        self,
+        sub_queries: List[Dict],
+        filters: Optional[Dict] = None,
+        size: int = 10,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Fan one search out into several sub-queries, sent in a single _msearch
+        and fused with reciprocal rank fusion. Each sub-query is either
+        {"query_vector": [...]} (a kNN leg) or {"query_text": "...", "fields":
+        [...]} (a BM25 leg over fields, default KEYWORD_FIELDS), plus an
+        optional "name". Filters apply to every leg.
+        """
+        query = {"sub_queries": sub_queries, "filters": filters, "size": size}
+        return (await self.multi_search([query], timeout=timeout, terminate_after=terminate_after))[0]
+    
+    async def multi_search(
+        self,
+        queries: List[Dict],
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """
+        Run several hybrid searches in a single _msearch round-trip. Each query
+        is a dict of hybrid_search keyword arguments, or of multi_query_search
+        arguments when it has "sub_queries"; results come back in the same order.
         """
         try:
-            # Build should clauses for hybrid search
-            should_clauses = []
+            searches = []
+            plans = []
+            for query in queries:
+                mode = query.get('retrieval_mode') or self.retrieval_mode
+                filter_clauses = self._build_filters(query.get('filters'))
+                size = query.get('size', 10)
+                if 'sub_queries' in query:
+                    mode = "knn"
+                    legs, bodies = self._sub_query_legs(query['sub_queries'], filter_clauses, size * 2)
+                elif mode == "script_score":
+                    body = self._script_score_body(
+                        query.get('query_text', ''), query.get('query_vector'), filter_clauses, size,
+                        query.get('keyword_boost', 1.0), query.get('vector_boost', 2.0)
+                    )
+                    legs = ["script_score"] if body else []
+                    bodies = [body] if body else []
+                else:
+                    legs, bodies = self._knn_legs(query.get('query_text', ''), query.get('query_vector'), filter_clauses, size * 2)
+                self._limit_bodies(bodies, timeout, terminate_after)
+                for body in bodies:
+                    searches.extend([{"index": self.index_name}, body])
+                plans.append((mode, legs, size))
             
-            # Keyword search (BM25)
-            if query_text:
-                should_clauses.append({
-                    "multi_match": {
-                        "query": query_text,
-                        "fields": [
-                            "title^3",
-                            "description^2",
-                            "error_messages^2",
-                            "resolution_steps",
-                            "root_cause",
-                            "technical_terms^2"
-                        ],
-                        "type": "best_fields",
-                        "boost": keyword_boost,
-                        "fuzziness": "AUTO"
-                    }
-                })
+            if not searches:
+                return [[] for _ in queries]
             
-            # Vector search (semantic similarity)
-            if query_vector:
-                should_clauses.append({
-                    "script_score": {
-                        "query": {"match_all": {}},
-                        "script": {
-                            "source": "cosineSimilarity(params.query_vector, 'description_embedding') + 1.0",
-                            "params": {"query_vector": query_vector}
-                        },
-                        "boost": vector_boost
-                    }
-                })
+            response = await self._request("msearch", self._client(timeout).msearch, searches=searches)
+            self._check_timed_out(response['responses'])
+            
+            responses = iter(response['responses'])
+            results = []
+            for mode, legs, size in plans:
+                ranked = self._ranked_legs(legs, [next(responses) for _ in legs])
+                if mode == "script_score":
+                    results.append(ranked.get("script_score", []))
+                else:
+                    results.append(self._fuse_legs(ranked, size) if ranked else [])
             
-            # Build filter clauses
-            filter_clauses = []
-            if filters:
-                for field, value in filters.items():
-                    if isinstance(value, list):
-                        filter_clauses.append({"terms": {field: value}})
-                    else:
-                        filter_clauses.append({"term": {field: value}})
+            logger.info(f"Ran {len(queries)} searches in one msearch ({len(searches) // 2} legs)")
+            return results
             
-            # Construct query
-            query = {
-                "size": size,
+        except Exception as e:
+            logger.error(f"Multi-search error: {e}")
+            raise
+    
+    def _knn_legs(self, query_text: str, query_vector: Optional[List[float]], filter_clauses: List[Dict], window: int):
+        """The kNN and BM25 search bodies for one query, and which leg each is"""
+        legs = []
+        bodies = []
+        if query_vector:
+            bodies.append({
+                "size": window,
+                "knn": self._knn_clause(query_vector, window, filter_clauses),
+                "_source": {"excludes": ["description_embedding"]}
+            })
+            legs.append("vector")
+        if query_text:
+            bodies.append({
+                "size": window,
                 "query": {
                     "bool": {
-                        "should": should_clauses,
-                        "filter": filter_clauses,
-                        "minimum_should_match": 1
+                        "must": [self._keyword_clause(query_text)],
+                        "filter": filter_clauses
                     }
                 },
-                "highlight": {
-                    "fields": {
-                        "description": {"fragment_size": 150, "number_of_fragments": 3},
-                        "error_messages": {"fragment_size": 150, "number_of_fragments": 2},
-                        "resolution_steps": {"fragment_size": 200, "number_of_fragments": 3}
+                "highlight": HIGHLIGHT,
+                "_source": {"excludes": ["description_embedding"]}
+            })
+            legs.append("keyword")
+        return legs, bodies
+    
+    def _sub_query_legs(self, sub_queries: List[Dict], filter_clauses: List[Dict], window: int):
+        """One search body per sub-query; leg names are "vector:<name>" or "keyword:<name>" """
+        legs = []
+        bodies = []
+        for position, sub_query in enumerate(sub_queries):
+            name = sub_query.get('name', str(position))
+            if sub_query.get('query_vector'):
+                bodies.append({
+                    "size": window,
+                    "knn": self._knn_clause(sub_query['query_vector'], window, filter_clauses),
+                    "_source": {"excludes": ["description_embedding"]}
+                })
+                legs.append(f"vector:{name}")
+            elif sub_query.get('query_text'):
+                bodies.append({
+                    "size": window,
+                    "query": {
+                        "bool": {
+                            "must": [self._keyword_clause(sub_query['query_text'], fields=sub_query.get('fields'))],
+                            "filter": filter_clauses
+                        }
+                    },
+                    "highlight": HIGHLIGHT,
+                    "_source": {"excludes": ["description_embedding"]}
+                })
+                legs.append(f"keyword:{name}")
+        return legs, bodies
+    
+    def _ranked_legs(self, legs: List[str], leg_responses: List[Dict]) -> Dict[str, List[Dict]]:
+        ranked = {}
+        for leg, leg_response in zip(legs, leg_responses):
+            if 'error' in leg_response:
+                raise RuntimeError(f"{leg} search failed: {leg_response['error']}")
+            ranked[leg] = [self._format_hit(hit) for hit in leg_response['hits']['hits']]
+        return ranked
+    
+    async def _knn_search(
+        self,
+        query_text: str,
+        query_vector: List[float],
+        filters: Optional[Dict],
+        size: int,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """kNN + BM25 legs in one _msearch round-trip, fused with RRF"""
+        try:
+            # Each leg returns a deeper window than requested so fusion has room to rerank
+            legs, bodies = self._knn_legs(query_text, query_vector, self._build_filters(filters), size * 2)
+            if not bodies:
+                return []
+            self._limit_bodies(bodies, timeout, terminate_after)
+            
+            searches = []
+            for body in bodies:
+                searches.extend([{"index": self.index_name}, body])
+            response = await self._request("msearch", self._client(timeout).msearch, searches=searches)
+            self._check_timed_out(response['responses'])
+            
+            results = self._fuse_legs(self._ranked_legs(legs, response['responses']), size)
+            logger.info(f"Found {len(results)} results for query (knn + rrf)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            raise
+    
+    def _fuse_legs(self, ranked: Dict[str, List[Dict]], size: int) -> List[Dict]:
+        """RRF over the vector and keyword legs, reporting a comparable similarity_score"""
+        results = reciprocal_rank_fusion(list(ranked.values()), k=self.rrf_rank_constant, size=size)
+        
+        # Report the semantic similarity when a vector leg found the document,
+        # otherwise its best keyword score relative to the top hit of that leg
+        vector_scores = {}
+        keyword_scores = {}
+        highlights = {}
+        for leg, hits in ranked.items():
+            if leg.split(':')[0] == "vector":
+                for r in hits:
+                    vector_scores.setdefault(r['incident_id'], r['similarity_score'])
+                continue
+            max_keyword = max((r['similarity_score'] for r in hits), default=0.0) or 1.0
+            for r in hits:
+                doc_id = r['incident_id']
+                keyword_scores[doc_id] = max(keyword_scores.get(doc_id, 0.0), r['similarity_score'] / max_keyword)
+                highlights.setdefault(doc_id, {}).update(r['highlights'])
+        for result in results:
+            doc_id = result['incident_id']
+            if doc_id in vector_scores:
+                result['similarity_score'] = vector_scores[doc_id]
+            else:
+                result['similarity_score'] = keyword_scores[doc_id]
+            if doc_id in highlights:
+                result['highlights'] = highlights[doc_id]
+        return results
+    
+    def _script_score_body(
+        self,
+        query_text: str,
+        query_vector: Optional[List[float]],
+        filter_clauses: List[Dict],
+        size: int,
+        keyword_boost: float,
+        vector_boost: float
+    ) -> Optional[Dict]:
+        """Search body for the exact scan, or None when there is nothing to match"""
+        # Build should clauses for hybrid search
+        should_clauses = []
+        
+        # Keyword search (BM25)
+        if query_text:
+            should_clauses.append(self._keyword_clause(query_text, keyword_boost))
+        
+        # Vector search (semantic similarity)
+        if query_vector:
+            should_clauses.append({
+                "script_score": {
+                    "query": {"match_all": {}},
+                    "script": {
+                        "source": "cosineSimilarity(params.query_vector, 'description_embedding') + 1.0",
+                        "params": {"query_vector": query_vector}
                     },
-                    "pre_tags": ["<mark>"],
-                    "post_tags": ["</mark>"]
+                    "boost": vector_boost
                 }
-            }
+            })
+        
+        if not should_clauses:
+            return None
+        return {
+            "size": size,
+            "query": {
+                "bool": {
+                    "should": should_clauses,
+                    "filter": filter_clauses,
+                    "minimum_should_match": 1
+                }
+            },
+            "highlight": HIGHLIGHT
+        }
+    
+    async def _script_score_search(
+        self,
+        query_text: str,
+        query_vector: List[float],
+        filters: Optional[Dict],
+        size: int,
+        keyword_boost: float,
+        vector_boost: float,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """Exact brute-force cosine scoring over every document, summed with BM25"""
+        try:
+            query = self._script_score_body(
+                query_text, query_vector, self._build_filters(filters), size, keyword_boost, vector_boost
+            )
+            if query is None:
+                return []
+            # The vector clause scans every document, so terminate_after applies here too
+            if timeout:
+                query["timeout"] = f"{max(1, int(timeout * 1000))}ms"
+            if terminate_after:
+                query["terminate_after"] = terminate_after
             
             # Execute search
-            response = self.es.search(index=self.index_name, body=query)
+            response = await self._request("search", self._client(timeout).search, index=self.index_name, body=query)
+            self._check_timed_out([getattr(response, "body", response)])
             
             # Format results
-            results = []
-            for hit in response['hits']['hits']:
-                source = hit['_source']
-                result = {
-                    'incident_id': source.get('incident_id'),
-                    'title': source.get('title'),
-                    'description': source.get('description'),
-                    'severity': source.get('severity'),
-                    'incident_type': source.get('incident_type'),
-                    'resolution_steps': source.get('resolution_steps'),
-                    'resolution_time_minutes': source.get('resolution_time_minutes', 0),
-                    'created_at': source.get('created_at'),
-                    'similarity_score': hit['_score'],
-                    'highlights': hit.get('highlight', {})
-                }
-                results.append(result)
+            results = [self._format_hit(hit) for hit in response['hits']['hits']]
             
             logger.info(f"Found {len(results)} results for query")
             return results
@@ -129,26 +490,79 @@ class HybridSearchEngine:
             logger.error(f"Search error: {e}")
             raise
     
-    def get_incident_by_id(self, incident_id: str) -> Optional[Dict]:
-        """Retrieve a specific incident by ID"""
+    async def get_incident_by_id(self, incident_id: str) -> Optional[Dict]:
+        """Retrieve a specific incident by ID; None if it does not exist, other errors raise"""
         try:
-            response = self.es.get(index=self.index_name, id=incident_id)
+            response = await self._request("get", self.es.get, index=self.index_name, id=incident_id)
             return response['_source']
-        except Exception as e:
-            logger.warning(f"Incident {incident_id} not found: {e}")
+        except NotFoundError:
+            logger.warning(f"Incident {incident_id} not found")
             return None
     
-    def get_index_stats(self) -> Dict:
+    async def get_index_stats(self) -> Dict:
         """Get statistics about the index"""
         try:
-            count = self.es.count(index=self.index_name)
-            stats = self.es.indices.stats(index=self.index_name)
+            count = await self._request("count", self.es.count, index=self.index_name)
+            stats = await self._request("index_stats", self.es.indices.stats, index=self.index_name)
             
+            # index_name is an alias; stats are keyed by the versioned index behind it
             return {
                 "document_count": count['count'],
-                "index_size_bytes": stats['indices'][self.index_name]['total']['store']['size_in_bytes'],
+                "index": ", ".join(stats['indices']),
+                "index_size_bytes": stats['_all']['total']['store']['size_in_bytes'],
                 "status": "healthy"
             }
         except Exception as e:
             logger.error(f"Failed to get index stats: {e}")
-            return {"status": "error", "error": str(e)}
\ No newline at end of file
+            return {"status": "error", "error": str(e)}
+
+class FallbackSearchEngine:
+    """
+    Routes calls to the primary engine and, when it fails (e.g. Elasticsearch
+    unreachable), serves them from the fallback engine instead.
+    """
+    
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.index_name = primary.index_name
+        self.fallback_count = 0
+    
+    async def verify_connection(self):
+        try:
+            await self.primary.verify_connection()
+        except Exception as e:
+            logger.warning(f"⚠️ Primary search engine unavailable, using fallback: {e}")
+        await self.fallback.verify_connection()
+    
+    async def close(self):
+        await self.primary.close()
+        await self.fallback.close()
+    
+    async def _call(self, method: str, *args, **kwargs):
+        try:
+            return await getattr(self.primary, method)(*args, **kwargs)
+        except Exception as e:
+            self.fallback_count += 1
+            metrics.record_fallback("search_backend")
+            logger.warning(f"⚠️ {method} failed on primary search engine, using fallback: {e}")
+            return await getattr(self.fallback, method)(*args, **kwargs)
+    
+    async def hybrid_search(self, *args, **kwargs) -> List[Dict]:
+        return await self._call("hybrid_search", *args, **kwargs)
+    
+    async def multi_search(self, *args, **kwargs) -> List[List[Dict]]:
+        return await self._call("multi_search", *args, **kwargs)
+    
+    async def multi_query_search(self, *args, **kwargs) -> List[Dict]:
+        return await self._call("multi_query_search", *args, **kwargs)
+    
+    async def get_incident_by_id(self, incident_id: str) -> Optional[Dict]:
+        return await self._call("get_incident_by_id", incident_id)
+    
+    async def get_index_stats(self) -> Dict:
+        stats = await self.primary.get_index_stats()
+        if stats.get("status") != "healthy":
+            fallback_stats = await self.fallback.get_index_stats()
+            return {**fallback_stats, "status": "degraded", "primary_error": stats.get("error")}
+        return {**stats, "fallback_count": self.fallback_count}
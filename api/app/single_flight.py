@@ -0,0 +1,61 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+
+from app import metrics
+
+class SingleFlight:
+    """
+    In-flight deduplication: while a call for a key is running, later callers
+    with the same key wait for it and share its result (or its exception)
+    instead of starting their own. The key is dropped as soon as the call
+    finishes, so nothing is cached beyond the lifetime of the call.
+    
+    A caller that joins with wait_seconds waits at most that long; if the call
+    in flight has not finished by then, it runs call() on its own instead.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.wait_timeouts = 0
+    
+    async def run(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        wait_seconds: Optional[float] = None
+    ) -> Tuple[Any, bool]:
+        """Result of call() for key, and whether this caller got it from a call already in flight"""
+        task = self._calls.get(key)
+        joined = task is not None
+        if joined:
+            self.coalesced += 1
+            metrics.record_coalesced()
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        # Shielded, so one disconnecting client (or timing-out waiter) does not cancel the run for the others
+        if joined and wait_seconds is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), max(0.0, wait_seconds)), True
+            except asyncio.TimeoutError:
+                self.wait_timeouts += 1
+                return await call(), False
+        return await asyncio.shield(task), joined
+    
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter has gone away
+    
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "wait_timeouts": self.wait_timeouts
+        }
@@ -0,0 +1,79 @@
+"""
+Vector storage profiles for description_embedding
+
+A profile fixes the embedding dimensionality and the HNSW index_options of the
+dense_vector field. elasticsearch_setup.py builds the mapping from it,
+ingest_data.py requests embeddings of the same size, and the API trims query
+embeddings to match, so all three agree as long as they read the same
+VECTOR_PROFILE. text-embedding-004 is trained so that a prefix of its 768-dim
+output is itself a usable embedding; trimming and re-normalizing matches
+asking the model for fewer dimensions.
+
+The default stays plain float32 hnsw. The quantized profiles are opt-in: they
+need a newer server (int8_hnsw Elasticsearch 8.12+, int4_hnsw 8.15+) than the
+pinned 8.11 client targets, and should only become the default once
+benchmarks/vector_profiles.py shows their recall holds on the real corpus.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+NATIVE_DIMS = 768  # text-embedding-004
+HNSW_M = 16  # Elasticsearch default
+DEFAULT_PROFILE = "hnsw"
+
+VECTOR_PROFILES = {
+    # Full-precision float32 graph: the reference for recall
+    "hnsw": {"dims": NATIVE_DIMS, "index_options": {"type": "hnsw"}},
+    # Scalar quantization to 1 byte (4x less vector memory) or half a byte (8x)
+    "int8_hnsw": {"dims": NATIVE_DIMS, "index_options": {"type": "int8_hnsw"}},
+    "int4_hnsw": {"dims": NATIVE_DIMS, "index_options": {"type": "int4_hnsw"}},
+    # Quantization on top of 256-dim (truncated) embeddings
+    "int8_hnsw_256": {"dims": 256, "index_options": {"type": "int8_hnsw"}},
+    "int4_hnsw_256": {"dims": 256, "index_options": {"type": "int4_hnsw"}},
+}
+
+# Bytes per dimension of the vectors HNSW searches over, and fixed bytes per
+# vector (quantization corrections), per index_options type
+_BYTES_PER_DIM = {"hnsw": 4.0, "int8_hnsw": 1.0, "int4_hnsw": 0.5}
+_BYTES_PER_VECTOR = {"hnsw": 0, "int8_hnsw": 4, "int4_hnsw": 4}
+
+def get_vector_profile(name: str) -> Dict:
+    if name not in VECTOR_PROFILES:
+        raise ValueError(f"Unknown vector profile '{name}'; expected one of {', '.join(VECTOR_PROFILES)}")
+    return VECTOR_PROFILES[name]
+
+def dense_vector_mapping(name: str) -> Dict:
+    profile = get_vector_profile(name)
+    mapping = {
+        "type": "dense_vector",
+        "dims": profile["dims"],
+        "index": True,
+        "similarity": "cosine"
+    }
+    # Plain hnsw is the dense_vector default; leaving it out keeps the mapping as before profiles
+    if profile["index_options"]["type"] != "hnsw":
+        mapping["index_options"] = dict(profile["index_options"])
+    return mapping
+
+def fit_dimensions(vector: List[float], dims: int) -> List[float]:
+    """Trim an embedding to dims and re-normalize it to unit length"""
+    if len(vector) == dims:
+        return list(vector)
+    if len(vector) < dims:
+        raise ValueError(f"Embedding has {len(vector)} dims, profile needs {dims}")
+    array = np.asarray(vector[:dims], dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return (array / norm if norm else array).tolist()
+
+def estimated_memory_bytes(name: str, num_vectors: int) -> int:
+    """
+    Off-heap memory HNSW needs to keep the profile's vectors and graph in the
+    page cache (the sizing formula from the Elasticsearch kNN tuning guide).
+    Quantized profiles also keep the float32 vectors on disk for rescoring.
+    """
+    profile = get_vector_profile(name)
+    kind = profile["index_options"]["type"]
+    vectors = num_vectors * (profile["dims"] * _BYTES_PER_DIM[kind] + _BYTES_PER_VECTOR[kind])
+    graph = num_vectors * 4 * HNSW_M
+    return int(vectors + graph)
@@ -0,0 +1 @@
+"""Offline benchmarks for the DevOps Oracle API (no Vertex AI or Elasticsearch needed)"""
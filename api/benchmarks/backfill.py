@@ -0,0 +1,145 @@
+"""
+Backfill throughput with and without the bulk-load settings profile
+
+Bulk indexes the same synthetic incidents (random unit vectors, so Vertex AI
+is not involved) into two scratch indices: one left on SERVING_SETTINGS and
+one switched to BULK_LOAD_SETTINGS for the load. Both are then refreshed,
+force-merged and warmed the same way, so the report shows load throughput and
+the end-to-end time until each index is ready to serve. Needs a live
+Elasticsearch cluster (ELASTIC_CLOUD_ID / ELASTIC_API_KEY from .env).
+
+Usage (from the api/ directory):
+    python -m benchmarks.backfill --documents 200000 --bulk-threads 4 --output results/backfill.json
+"""
+import argparse
+import json
+import time
+from contextlib import nullcontext
+from typing import Dict
+
+import numpy as np
+from elasticsearch import Elasticsearch, helpers
+
+from app.config import get_settings
+from app.index_settings import SERVING_SETTINGS, bulk_load, finish_bulk_load, shard_count
+from app.vector_profiles import VECTOR_PROFILES, dense_vector_mapping, get_vector_profile
+from benchmarks.knn_recall import INCIDENT_TYPES, VOCABULARY
+from benchmarks.stats import environment, write_results
+
+def backfill_mapping(profile: str, documents: int) -> Dict:
+    dims = get_vector_profile(profile)["dims"]
+    return {
+        "settings": {"number_of_shards": shard_count(documents, dims), **SERVING_SETTINGS},
+        "mappings": {
+            "properties": {
+                "incident_id": {"type": "keyword"},
+                "title": {"type": "text"},
+                "description": {"type": "text"},
+                "incident_type": {"type": "keyword"},
+                "description_embedding": dense_vector_mapping(profile)
+            }
+        }
+    }
+
+def generate_documents(index_name: str, documents: int, dims: int, seed: int, chunk: int = 1000):
+    rng = np.random.default_rng(seed)
+    for offset in range(0, documents, chunk):
+        count = min(chunk, documents - offset)
+        vectors = rng.normal(size=(count, dims)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for i in range(count):
+            words = rng.choice(VOCABULARY, 12)
+            yield {
+                "_index": index_name,
+                "_id": f"BACKFILL-{offset + i}",
+                "_source": {
+                    "incident_id": f"BACKFILL-{offset + i}",
+                    "title": " ".join(words[:4]),
+                    "description": " ".join(words),
+                    "incident_type": INCIDENT_TYPES[(offset + i) % len(INCIDENT_TYPES)],
+                    "description_embedding": vectors[i].tolist()
+                }
+            }
+
+def load(es, index_name: str, args) -> int:
+    actions = generate_documents(index_name, args.documents, get_vector_profile(args.profile)["dims"], args.seed)
+    if args.bulk_threads > 1:
+        results = helpers.parallel_bulk(es, actions, thread_count=args.bulk_threads, chunk_size=args.chunk_size,
+                                        queue_size=args.bulk_threads)
+    else:
+        results = helpers.streaming_bulk(es, actions, chunk_size=args.chunk_size, max_retries=3, initial_backoff=2)
+    return sum(1 for ok, _ in results if ok)
+
+def run_backfill(es, index_prefix: str, use_profile: bool, args) -> Dict:
+    index_name = f"{index_prefix}-{'bulk-load' if use_profile else 'serving'}"
+    if es.indices.exists(index=index_name):
+        es.indices.delete(index=index_name)
+    es.indices.create(index=index_name, body=backfill_mapping(args.profile, args.documents))
+    
+    finish_timings = {}
+    start_time = time.perf_counter()
+    loading = bulk_load(es, index_name, restore=SERVING_SETTINGS) if use_profile else nullcontext(finish_timings)
+    with loading as timings:
+        load_start = time.perf_counter()
+        indexed = load(es, index_name, args)
+        load_seconds = time.perf_counter() - load_start
+    if not use_profile:
+        timings.update(finish_bulk_load(es, index_name, SERVING_SETTINGS))
+    total_seconds = time.perf_counter() - start_time
+    
+    if not args.keep_indices:
+        es.indices.delete(index=index_name)
+    
+    return {
+        "bulk_load_profile": use_profile,
+        "indexed": indexed,
+        "load_seconds": round(load_seconds, 1),
+        "load_docs_per_second": round(indexed / load_seconds, 1) if load_seconds else None,
+        "total_seconds": round(total_seconds, 1),
+        "end_to_end_docs_per_second": round(indexed / total_seconds, 1) if total_seconds else None,
+        **{key: round(value, 1) for key, value in timings.items()}
+    }
+
+def run_benchmark(args) -> Dict:
+    settings = get_settings()
+    es = Elasticsearch(cloud_id=settings.ELASTIC_CLOUD_ID, api_key=settings.ELASTIC_API_KEY, request_timeout=120)
+    args.profile = args.profile or settings.VECTOR_PROFILE
+    index_prefix = f"{settings.ELASTIC_INDEX_NAME}-backfill-bench"
+    try:
+        runs = [run_backfill(es, index_prefix, use_profile, args) for use_profile in (False, True)]
+    finally:
+        es.close()
+    
+    serving, profile = runs
+    return {
+        "environment": environment(),
+        "documents": args.documents,
+        "vector_profile": args.profile,
+        "shards": shard_count(args.documents, get_vector_profile(args.profile)["dims"]),
+        "bulk_threads": args.bulk_threads,
+        "chunk_size": args.chunk_size,
+        "runs": runs,
+        "load_speedup": round(profile["load_docs_per_second"] / serving["load_docs_per_second"], 2)
+            if serving["load_docs_per_second"] else None,
+        "end_to_end_speedup": round(serving["total_seconds"] / profile["total_seconds"], 2)
+            if profile["total_seconds"] else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill throughput with and without the bulk-load settings profile")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--profile", choices=list(VECTOR_PROFILES), help="Vector profile (default: VECTOR_PROFILE)")
+    parser.add_argument("--bulk-threads", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-indices", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        write_results(args.output, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Concurrency benchmark for the async agent workflow
+
+Runs the compiled workflow once, then N times concurrently, against stub models
+with injected latency. With a non-blocking pipeline the concurrent batch should
+finish in roughly the time of a single run.
+
+Usage (from the api/ directory):
+    python -m benchmarks.concurrency --concurrency 20 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.agent_workflow import DevOpsOracleAgent, build_workflow
+from benchmarks.stubs import StubGenerativeModel, StubEmbeddingModel, StubSearchEngine
+
+INCIDENT_DESCRIPTION = (
+    "Users reporting 500 errors on checkout. Error logs show: HikariCP - Connection is not "
+    "available, request timed out after 30000ms. Connection pool exhausted."
+)
+
+def build_stub_workflow(llm_latency: float, embedding_latency: float, search_latency: float, mode: str = "full"):
+    agent = DevOpsOracleAgent(
+        StubSearchEngine(latency=search_latency),
+        project_id="benchmark",
+        region="us-central1",
+        model=StubGenerativeModel(latency=llm_latency),
+        embedding_model=StubEmbeddingModel(latency=embedding_latency)
+    )
+    return build_workflow(agent, mode)
+
+async def run_once(workflow, request_id: str) -> float:
+    start_time = time.perf_counter()
+    await workflow.ainvoke({
+        "incident_description": INCIDENT_DESCRIPTION,
+        "request_id": request_id,
+        "agent_steps": [],
+        "errors": []
+    })
+    return time.perf_counter() - start_time
+
+async def run_benchmark(concurrency: int, llm_latency: float, embedding_latency: float, search_latency: float) -> dict:
+    workflow = build_stub_workflow(llm_latency, embedding_latency, search_latency)
+    
+    single = await run_once(workflow, "single")
+    
+    start_time = time.perf_counter()
+    latencies = await asyncio.gather(*[
+        run_once(workflow, f"concurrent-{i}") for i in range(concurrency)
+    ])
+    concurrent_wall = time.perf_counter() - start_time
+    
+    return {
+        "concurrency": concurrency,
+        "single_request_seconds": round(single, 4),
+        "concurrent_wall_seconds": round(concurrent_wall, 4),
+        "max_request_seconds": round(max(latencies), 4),
+        "slowdown_vs_single": round(concurrent_wall / single, 3),
+        "throughput_rps": round(concurrency / concurrent_wall, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent workflow benchmark with stubbed backends")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    
+    result = asyncio.run(run_benchmark(
+        args.concurrency, args.llm_latency, args.embedding_latency, args.search_latency
+    ))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
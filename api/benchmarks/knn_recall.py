@@ -0,0 +1,163 @@
+"""
+Latency and recall of kNN (HNSW) retrieval against the brute-force script_score scan
+
+For each corpus size a scratch index is filled with synthetic clustered vectors,
+then the same queries are run through both retrieval modes of HybridSearchEngine.
+Recall@k treats the exact script_score ranking as ground truth. Needs a live
+Elasticsearch cluster (ELASTIC_CLOUD_ID / ELASTIC_API_KEY from .env).
+
+Usage (from the api/ directory):
+    python -m benchmarks.knn_recall --sizes 10000 100000 1000000 --queries 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+from elasticsearch import helpers
+
+from app.config import get_settings
+from app.search_engine import HybridSearchEngine
+from benchmarks.stats import percentile
+
+VOCABULARY = [
+    "hikaricp", "connection", "pool", "timeout", "redis", "failover", "kubernetes", "node",
+    "diskpressure", "oom", "heap", "gateway", "upstream", "latency", "index", "query",
+    "certificate", "expired", "dns", "resolution", "kafka", "lag", "replica", "deadlock"
+]
+INCIDENT_TYPES = ["database", "network", "application", "infrastructure", "security"]
+
+def bench_mapping(dims: int) -> Dict:
+    return {
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0, "refresh_interval": "-1"},
+        "mappings": {
+            "properties": {
+                "incident_id": {"type": "keyword"},
+                "title": {"type": "text"},
+                "description": {"type": "text"},
+                "incident_type": {"type": "keyword"},
+                "description_embedding": {"type": "dense_vector", "dims": dims, "index": True, "similarity": "cosine"}
+            }
+        }
+    }
+
+def generate_documents(index_name: str, size: int, centers: np.ndarray, seed: int, chunk: int = 1000):
+    """Yield bulk actions chunk by chunk so memory stays flat at 1M documents"""
+    rng = np.random.default_rng(seed)
+    for offset in range(0, size, chunk):
+        count = min(chunk, size - offset)
+        labels = rng.integers(0, len(centers), count)
+        vectors = centers[labels] + rng.normal(scale=0.5, size=(count, centers.shape[1]))
+        for i in range(count):
+            words = rng.choice(VOCABULARY, 6)
+            yield {
+                "_index": index_name,
+                "_id": f"BENCH-{offset + i}",
+                "_source": {
+                    "incident_id": f"BENCH-{offset + i}",
+                    "title": " ".join(words[:3]),
+                    "description": " ".join(words),
+                    "incident_type": INCIDENT_TYPES[labels[i] % len(INCIDENT_TYPES)],
+                    "description_embedding": vectors[i].astype(np.float32).tolist()
+                }
+            }
+
+async def timed_search(engine: HybridSearchEngine, mode: str, query_text: str, vector: List[float], k: int):
+    start_time = time.perf_counter()
+    results = await engine.hybrid_search(query_text=query_text, query_vector=vector, size=k, retrieval_mode=mode)
+    return time.perf_counter() - start_time, [r['incident_id'] for r in results]
+
+def latency_summary(values: List[float]) -> Dict:
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2)
+    }
+
+async def benchmark_size(engine: HybridSearchEngine, size: int, args) -> Dict:
+    index_name = engine.index_name
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dims))
+    
+    if await engine.es.indices.exists(index=index_name):
+        await engine.es.indices.delete(index=index_name)
+    await engine.es.indices.create(index=index_name, body=bench_mapping(args.dims))
+    
+    start_time = time.perf_counter()
+    await helpers.async_bulk(engine.es, generate_documents(index_name, size, centers, args.seed), chunk_size=500)
+    await engine.es.indices.put_settings(index=index_name, settings={"index.refresh_interval": "1s"})
+    await engine.es.indices.refresh(index=index_name)
+    await engine.es.indices.forcemerge(index=index_name, max_num_segments=1)
+    index_seconds = time.perf_counter() - start_time
+    
+    queries = centers[rng.integers(0, args.clusters, args.queries)] + rng.normal(scale=0.5, size=(args.queries, args.dims))
+    
+    latencies = {"script_score": [], "knn": [], "script_score_hybrid": [], "knn_hybrid": []}
+    recalls = []
+    for vector in queries:
+        vector = vector.tolist()
+        text = " ".join(rng.choice(VOCABULARY, 3))
+        
+        exact_seconds, exact_ids = await timed_search(engine, "script_score", "", vector, args.k)
+        knn_seconds, knn_ids = await timed_search(engine, "knn", "", vector, args.k)
+        latencies["script_score"].append(exact_seconds)
+        latencies["knn"].append(knn_seconds)
+        recalls.append(len(set(exact_ids) & set(knn_ids)) / args.k)
+        
+        hybrid_exact_seconds, _ = await timed_search(engine, "script_score", text, vector, args.k)
+        hybrid_knn_seconds, _ = await timed_search(engine, "knn", text, vector, args.k)
+        latencies["script_score_hybrid"].append(hybrid_exact_seconds)
+        latencies["knn_hybrid"].append(hybrid_knn_seconds)
+    
+    if not args.keep_indices:
+        await engine.es.indices.delete(index=index_name)
+    
+    return {
+        "documents": size,
+        "index_seconds": round(index_seconds, 1),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "latency": {mode: latency_summary(values) for mode, values in latencies.items()}
+    }
+
+async def run_benchmark(args) -> Dict:
+    settings = get_settings()
+    results = []
+    for size in args.sizes:
+        engine = HybridSearchEngine(
+            cloud_id=settings.ELASTIC_CLOUD_ID,
+            api_key=settings.ELASTIC_API_KEY,
+            index_name=f"{settings.ELASTIC_INDEX_NAME}-knn-bench-{size}",
+            num_candidates=args.num_candidates,
+            rrf_rank_constant=settings.RRF_RANK_CONSTANT
+        )
+        try:
+            await engine.verify_connection()
+            results.append(await benchmark_size(engine, size, args))
+        finally:
+            await engine.close()
+    
+    return {"k": args.k, "num_candidates": args.num_candidates, "dims": args.dims, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="kNN vs script_score latency and recall")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--num-candidates", type=int, default=100)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-indices", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end latency benchmark with stubbed Vertex AI and search backends
+
+Drives the compiled workflow (create_workflow's graph) and the FastAPI app
+in-process at several concurrency levels. Reports p50/p95/p99 per workflow node
+(node_timings from the workflow state or the API response), end-to-end
+latency, throughput and peak RSS, and writes everything to a JSON file so runs
+can be compared between commits.
+
+Usage (from the api/ directory):
+    python -m benchmarks.latency --concurrency 1 10 50 --requests 200 --output results/latency.json
+    python -m benchmarks.latency --target app --baseline results/latency-main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from app.agent_workflow import DevOpsOracleAgent, build_workflow
+from app.models import WorkflowMode
+from benchmarks.stats import environment, latency_summary, peak_rss_mb, write_results
+from benchmarks.stubs import StubGenerativeModel, StubEmbeddingModel, StubSearchEngine, load_sample_incidents
+
+def build_stub_agent(llm_latency: float, embedding_latency: float, search_latency: float, jitter: float) -> DevOpsOracleAgent:
+    return DevOpsOracleAgent(
+        StubSearchEngine(latency=search_latency),
+        project_id="benchmark",
+        region="us-central1",
+        model=StubGenerativeModel(latency=llm_latency, jitter=llm_latency * jitter),
+        embedding_model=StubEmbeddingModel(latency=embedding_latency, jitter=embedding_latency * jitter)
+    )
+
+def request_descriptions(count: int) -> List[str]:
+    """Distinct descriptions so the embedding and response caches never short-circuit a run"""
+    samples = list(dict.fromkeys(i['description'] for i in load_sample_incidents()))
+    return [f"{samples[i % len(samples)]} (benchmark request {i})" for i in range(count)]
+
+async def run_level(call, descriptions: List[str], concurrency: int) -> Dict:
+    """Run every description through call() with at most `concurrency` requests in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    node_timings = {}
+    errors = 0
+    
+    async def one(i: int, description: str):
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                timings = await call(description, f"bench-{concurrency}-{i}")
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start_time)
+            for node, seconds in (timings or {}).items():
+                node_timings.setdefault(node, []).append(seconds)
+    
+    start_time = time.perf_counter()
+    await asyncio.gather(*[one(i, d) for i, d in enumerate(descriptions)])
+    wall = time.perf_counter() - start_time
+    
+    return {
+        "concurrency": concurrency,
+        "requests": len(descriptions),
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "end_to_end": latency_summary(latencies),
+        "nodes": {node: latency_summary(values) for node, values in sorted(node_timings.items())},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def workflow_caller(workflow):
+    async def call(description: str, request_id: str) -> Dict[str, float]:
+        result = await workflow.ainvoke({
+            "incident_description": description,
+            "request_id": request_id,
+            "node_timings": {},
+            "agent_steps": [],
+            "errors": []
+        })
+        if result.get('errors'):
+            raise RuntimeError(result['errors'][0])
+        return result.get('node_timings', {})
+    return call
+
+def app_caller(agent: DevOpsOracleAgent):
+    """
+    Call POST /api/v1/incidents/analyze through httpx's ASGI transport. The
+    lifespan is not run; the app's globals are pointed at the stub agent.
+    """
+    # Settings are read at import time; placeholders are fine because no client is created
+    for name in ("GOOGLE_CLOUD_PROJECT", "GOOGLE_APPLICATION_CREDENTIALS", "ELASTIC_CLOUD_ID", "ELASTIC_API_KEY"):
+        os.environ.setdefault(name, "benchmark")
+    import httpx
+    from app import main
+    
+    main.search_engine = agent.search_engine
+    main.oracle_agent = agent
+    main.agent_workflows = {mode: build_workflow(agent, mode) for mode in WorkflowMode}
+    main.response_cache = None
+    
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None)
+    
+    async def call(description: str, request_id: str) -> Dict[str, float]:
+        response = await client.post("/api/v1/incidents/analyze", json={"description": description})
+        response.raise_for_status()
+        return response.json().get('node_timings', {})
+    return call, client
+
+def compare(baseline: Dict, results: Dict) -> List[Dict]:
+    """p95 and throughput deltas against a previous results file, per target and concurrency"""
+    rows = []
+    for target, levels in results["targets"].items():
+        previous = {level["concurrency"]: level for level in baseline.get("targets", {}).get(target, [])}
+        for level in levels:
+            before = previous.get(level["concurrency"])
+            if not before:
+                continue
+            row = {"target": target, "concurrency": level["concurrency"]}
+            for name, old, new in [
+                ("end_to_end_p95", before["end_to_end"].get("p95_seconds"), level["end_to_end"].get("p95_seconds")),
+                ("throughput_rps", before["throughput_rps"], level["throughput_rps"])
+            ] + [
+                (f"{node}_p95", before["nodes"].get(node, {}).get("p95_seconds"), summary.get("p95_seconds"))
+                for node, summary in level["nodes"].items()
+            ]:
+                if old and new is not None:
+                    row[name] = {"before": old, "after": new, "change_pct": round((new - old) / old * 100, 1)}
+            rows.append(row)
+    return rows
+
+async def run_benchmark(
+    targets: List[str],
+    concurrency_levels: List[int],
+    requests: int,
+    mode: str,
+    llm_latency: float,
+    embedding_latency: float,
+    search_latency: float,
+    jitter: float
+) -> Dict:
+    agent = build_stub_agent(llm_latency, embedding_latency, search_latency, jitter)
+    results = {
+        "benchmark": "latency",
+        "environment": environment(),
+        "parameters": {
+            "workflow_mode": mode,
+            "requests_per_level": requests,
+            "llm_latency": llm_latency,
+            "embedding_latency": embedding_latency,
+            "search_latency": search_latency,
+            "jitter": jitter
+        },
+        "targets": {}
+    }
+    
+    for target in targets:
+        client = None
+        if target == "workflow":
+            call = workflow_caller(build_workflow(agent, mode))
+        else:
+            call, client = app_caller(agent)
+        
+        levels = []
+        for concurrency in concurrency_levels:
+            descriptions = request_descriptions(requests)
+            levels.append(await run_level(call, descriptions, concurrency))
+        results["targets"][target] = levels
+        
+        if client is not None:
+            await client.aclose()
+    
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-node latency, throughput and memory benchmark with stub backends")
+    parser.add_argument("--target", choices=["workflow", "app", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--mode", choices=[m.value for m in WorkflowMode], default=WorkflowMode.FULL.value)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency jitter as a fraction of each latency")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+    
+    targets = ["workflow", "app"] if args.target == "both" else [args.target]
+    results = asyncio.run(run_benchmark(
+        targets, args.concurrency, args.requests, args.mode,
+        args.llm_latency, args.embedding_latency, args.search_latency, args.jitter
+    ))
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(json.load(f), results)
+    if args.output:
+        write_results(args.output, results)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
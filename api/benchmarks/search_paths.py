@@ -0,0 +1,107 @@
+"""
+Search stage latency and round-trips: single hybrid_search vs _msearch paths
+
+Runs every request through the compiled workflow twice against the stub search
+engine: once with the fan-out (multi_query_search, every sub-query in one
+_msearch) and once through an engine that only offers hybrid_search, which
+execute_search answers with one concatenated query. A batch of the same
+descriptions then goes through BatchAnalyzer with multi_search (all queries in
+one _msearch) and with one hybrid_search per query. For each path the
+benchmark reports search latency percentiles, search round-trips and how many
+results came back.
+
+Usage (from the api/ directory):
+    python -m benchmarks.search_paths --requests 50 --search-latency 0.05 --output results/search_paths.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from app.agent_workflow import build_workflow
+from app.batch_analysis import BatchAnalyzer
+from app.models import WorkflowMode
+from benchmarks.latency import build_stub_agent, request_descriptions
+from benchmarks.stats import environment, latency_summary, write_results
+from benchmarks.stubs import HybridOnlyStubSearchEngine
+
+def stub_agent(path: str, search_latency: float, jitter: float):
+    agent = build_stub_agent(0.0, 0.0, search_latency, jitter)
+    if path == "hybrid_search":
+        agent.search_engine = HybridOnlyStubSearchEngine(agent.search_engine)
+    return agent
+
+async def run_single(path: str, descriptions: List[str], search_latency: float, jitter: float) -> Dict:
+    agent = stub_agent(path, search_latency, jitter)
+    workflow = build_workflow(agent, WorkflowMode.FULL)
+    engine = getattr(agent.search_engine, "engine", agent.search_engine)
+    search_seconds, result_counts = [], []
+    
+    for i, description in enumerate(descriptions):
+        result = await workflow.ainvoke({
+            "incident_description": description,
+            "request_id": f"search-{path}-{i}",
+            "node_timings": {},
+            "agent_steps": [],
+            "errors": []
+        })
+        search_seconds.append(result['node_timings'].get('search', 0.0))
+        result_counts.append(len(result.get('search_results', [])))
+    
+    return {
+        "search": latency_summary(search_seconds),
+        # The candidate search before the strategy is one of these
+        "round_trips_per_request": engine.calls / len(descriptions),
+        "results_per_request": sum(result_counts) / len(result_counts)
+    }
+
+async def run_batch(path: str, descriptions: List[str], search_latency: float, jitter: float) -> Dict:
+    agent = stub_agent(path, search_latency, jitter)
+    engine = getattr(agent.search_engine, "engine", agent.search_engine)
+    start_time = time.perf_counter()
+    events = [event async for event in BatchAnalyzer(agent).run(descriptions, f"search-{path}")]
+    wall = time.perf_counter() - start_time
+    results = [event["state"] for event in events if event["kind"] == "result"]
+    
+    return {
+        "items": len(descriptions),
+        "analyzed": len(results),
+        "search_seconds": round(max((state['node_timings'].get('search', 0.0) for state in results), default=0.0), 4),
+        "wall_seconds": round(wall, 4),
+        "round_trips": engine.calls,
+        "results_per_item": sum(len(state.get('search_results', [])) for state in results) / max(len(results), 1)
+    }
+
+async def run_benchmark(args) -> Dict:
+    descriptions = request_descriptions(args.requests)
+    latency = (args.search_latency, args.jitter)
+    return {
+        "benchmark": "search_paths",
+        "environment": environment(),
+        "parameters": {"requests": args.requests, "search_latency": args.search_latency, "jitter": args.jitter},
+        "single": {
+            "multi_query_search": await run_single("msearch", descriptions, *latency),
+            "hybrid_search": await run_single("hybrid_search", descriptions, *latency)
+        },
+        "batch": {
+            "multi_search": await run_batch("msearch", descriptions, *latency),
+            "hybrid_search": await run_batch("hybrid_search", descriptions, *latency)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency and round-trips: _msearch fan-out vs single hybrid_search")
+    parser.add_argument("--requests", type=int, default=50, help="Requests for the single path, and items in the batch")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per search round-trip")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency jitter as a fraction of each latency")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmark(args))
+    if args.output:
+        write_results(args.output, results)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
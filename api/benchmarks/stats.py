@@ -0,0 +1,61 @@
+"""Shared statistics and result-file helpers for the benchmarks"""
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(values: List[float]) -> Dict:
+    """count, mean and p50/p95/p99/max in seconds"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_seconds": round(statistics.mean(values), 4),
+        "p50_seconds": round(percentile(values, 50), 4),
+        "p95_seconds": round(percentile(values, 95), 4),
+        "p99_seconds": round(percentile(values, 99), 4),
+        "max_seconds": round(max(values), 4)
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def write_results(path: str, results: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,247 @@
+"""Deterministic stand-ins for Vertex AI models and the search engine"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from app.resolution_summary import summarize_resolution
+from app.search_engine import matches_filters, reciprocal_rank_fusion
+
+SAMPLE_INCIDENTS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "sample_incidents.json")
+
+ANALYSIS_RESPONSE = {
+    "severity": "P1",
+    "incident_type": "database",
+    "key_symptoms": ["500 errors on checkout", "connection pool exhausted"],
+    "technical_terms": ["HikariCP", "connection pool", "timeout"],
+    "affected_systems": ["checkout-service", "postgres-primary"],
+    "urgency_score": 8,
+    "summary": "Database connection pool exhausted under peak load"
+}
+
+STRATEGY_RESPONSE = {
+    "primary_search_terms": ["HikariCP", "connection pool exhausted", "SQLTransientConnectionException"],
+    "search_filters": {"incident_type": "database"},
+    "search_priority": "past_incidents"
+}
+
+RECOMMENDATION_RESPONSE = {
+    "immediate_actions": ["Increase HikariCP maximum pool size", "Check for connection leaks", "Scale out checkout-service"],
+    "root_cause_hypothesis": "Traffic spike exceeded the configured connection pool capacity",
+    "resolution_steps": ["Raise maximumPoolSize to 50", "Enable leakDetectionThreshold", "Roll out config change"],
+    "preventive_measures": ["Alert on pool utilization above 80%", "Load test before sale events"],
+    "estimated_resolution_time_minutes": 15,
+    "confidence_score": 0.85,
+    "confidence_reasoning": "Several highly similar past incidents were resolved the same way",
+    "similar_incident_references": ["INC-10000"],
+    "risk_assessment": "low"
+}
+
+class StubResponse:
+    def __init__(self, text: str = "", embeddings: Optional[List] = None):
+        self.text = text
+        self.embeddings = embeddings or []
+
+class StubEmbedding:
+    def __init__(self, values: List[float]):
+        self.values = values
+
+def _sleep_seconds(latency: float, jitter: float, seed: str) -> float:
+    """Latency plus a deterministic, prompt-derived jitter"""
+    if not jitter:
+        return latency
+    rng = random.Random(hashlib.sha256(seed.encode()).hexdigest())
+    return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+class StubGenerativeModel:
+    """Answers the workflow prompts with canned JSON after an injected delay"""
+    
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+    
+    def _respond(self, prompt: str) -> str:
+        if '"search_strategy"' in prompt:
+            return json.dumps({"analysis": ANALYSIS_RESPONSE, "search_strategy": STRATEGY_RESPONSE})
+        if "optimal search strategy" in prompt:
+            return json.dumps(STRATEGY_RESPONSE)
+        if "resolution recommendation" in prompt:
+            return json.dumps(RECOMMENDATION_RESPONSE)
+        return json.dumps(ANALYSIS_RESPONSE)
+    
+    async def generate_content_async(self, prompt: str) -> StubResponse:
+        self.calls += 1
+        await asyncio.sleep(_sleep_seconds(self.latency, self.jitter, prompt))
+        return StubResponse(text=self._respond(prompt))
+    
+    def generate_content(self, prompt: str) -> StubResponse:
+        self.calls += 1
+        time.sleep(_sleep_seconds(self.latency, self.jitter, prompt))
+        return StubResponse(text=self._respond(prompt))
+
+def stub_vector(text: str, dims: int = 768) -> List[float]:
+    """Deterministic pseudo-embedding derived from the text"""
+    rng = random.Random(hashlib.sha256(text.encode()).hexdigest())
+    return [rng.uniform(-1.0, 1.0) for _ in range(dims)]
+
+class StubEmbeddingModel:
+    """Returns a deterministic pseudo-embedding after an injected delay"""
+    
+    def __init__(self, latency: float = 0.1, dims: int = 768, jitter: float = 0.0):
+        self.latency = latency
+        self.dims = dims
+        self.jitter = jitter
+        self.calls = 0
+    
+    async def generate_content_async(self, text: str) -> StubResponse:
+        self.calls += 1
+        await asyncio.sleep(_sleep_seconds(self.latency, self.jitter, text))
+        return StubResponse(embeddings=[StubEmbedding(stub_vector(text, self.dims))])
+    
+    def generate_content(self, text: str) -> StubResponse:
+        self.calls += 1
+        time.sleep(_sleep_seconds(self.latency, self.jitter, text))
+        return StubResponse(embeddings=[StubEmbedding(stub_vector(text, self.dims))])
+    
+    async def get_embeddings_async(self, texts: List[str], **kwargs) -> List[StubEmbedding]:
+        """Multi-input request: one delay for the whole batch"""
+        self.calls += 1
+        await asyncio.sleep(_sleep_seconds(self.latency, self.jitter, texts[0] if texts else ""))
+        return [StubEmbedding(stub_vector(text, self.dims)) for text in texts]
+
+def load_sample_incidents(path: str = SAMPLE_INCIDENTS_PATH) -> List[Dict]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+class StubSearchEngine:
+    """In-memory keyword-overlap search over sample_incidents.json with injected latency"""
+    
+    def __init__(self, incidents: Optional[List[Dict]] = None, latency: float = 0.05):
+        incidents = incidents if incidents is not None else load_sample_incidents()
+        # As ingest would have stored them
+        self.incidents = [{**incident, 'resolution_summary': summarize_resolution(incident)} for incident in incidents]
+        self.latency = latency
+        self.calls = 0
+    
+    async def verify_connection(self):
+        return True
+    
+    async def close(self):
+        pass
+    
+    def _format(self, incident: Dict, score: float) -> Dict:
+        return {
+            'incident_id': incident.get('incident_id'),
+            'title': incident.get('title'),
+            'description': incident.get('description'),
+            'severity': incident.get('severity'),
+            'incident_type': incident.get('incident_type'),
+            'resolution_steps': incident.get('resolution_steps'),
+            'resolution_summary': incident.get('resolution_summary'),
+            'resolution_time_minutes': incident.get('resolution_time_minutes', 0),
+            'created_at': incident.get('created_at'),
+            'similarity_score': score,
+            'highlights': {}
+        }
+    
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_vector: List[float],
+        filters: Optional[Dict] = None,
+        size: int = 10,
+        keyword_boost: float = 1.0,
+        vector_boost: float = 2.0,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._rank(query_text, filters, size, keyword_boost, vector_boost)
+    
+    async def multi_query_search(
+        self,
+        sub_queries: List[Dict],
+        filters: Optional[Dict] = None,
+        size: int = 10,
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[Dict]:
+        """One round-trip for every sub-query, fused with reciprocal rank fusion like the real engine"""
+        query = {"sub_queries": sub_queries, "filters": filters, "size": size}
+        return (await self.multi_search([query], timeout=timeout, terminate_after=terminate_after))[0]
+    
+    async def multi_search(
+        self,
+        queries: List[Dict],
+        timeout: Optional[float] = None,
+        terminate_after: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """Several searches in one _msearch: one latency for the whole request"""
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        results = []
+        for query in queries:
+            if 'sub_queries' in query:
+                legs = [
+                    self._rank(sub_query.get('query_text', ''), query.get('filters'), query.get('size', 10) * 2,
+                               fields=sub_query.get('fields'))
+                    for sub_query in query['sub_queries']
+                    if sub_query.get('query_vector') or sub_query.get('query_text')
+                ]
+                results.append(reciprocal_rank_fusion(legs, size=query.get('size', 10)))
+            else:
+                results.append(self._rank(
+                    query.get('query_text', ''), query.get('filters'), query.get('size', 10),
+                    query.get('keyword_boost', 1.0), query.get('vector_boost', 2.0)
+                ))
+        return results
+    
+    def _rank(
+        self,
+        query_text: str,
+        filters: Optional[Dict],
+        size: int,
+        keyword_boost: float = 1.0,
+        vector_boost: float = 2.0,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        fields = [field.split("^")[0] for field in fields] if fields else ["title", "description"]
+        terms = set((query_text or "").lower().split())
+        scored = []
+        for incident in self.incidents:
+            if not matches_filters(incident, filters):
+                continue
+            text = " ".join(str(incident.get(field) or "") for field in fields).lower()
+            score = keyword_boost * sum(1 for t in terms if t in text) + vector_boost
+            scored.append((score, incident))
+        
+        scored.sort(key=lambda pair: (-pair[0], pair[1].get('incident_id', '')))
+        return [self._format(incident, score) for score, incident in scored[:size]]
+    
+    async def get_incident_by_id(self, incident_id: str) -> Optional[Dict]:
+        for incident in self.incidents:
+            if incident.get('incident_id') == incident_id:
+                return incident
+        return None
+    
+    async def get_index_stats(self) -> Dict:
+        return {"document_count": len(self.incidents), "index_size_bytes": 0, "status": "healthy"}
+
+class HybridOnlyStubSearchEngine:
+    """
+    A StubSearchEngine without multi_query_search and multi_search, so the
+    workflow and batch analysis take their one-hybrid_search-per-query paths
+    """
+    
+    def __init__(self, engine: StubSearchEngine):
+        self.engine = engine
+    
+    def __getattr__(self, name: str):
+        if name in ("multi_query_search", "multi_search"):
+            raise AttributeError(name)
+        return getattr(self.engine, name)
@@ -0,0 +1,97 @@
+"""
+Synthesis prompt size before and after the token-budgeted context builder
+
+Offline: every sample incident is used as the current incident and the other
+incidents, ranked by the stub search engine, as its search results. For each
+one the benchmark builds the legacy context (top 5 results, resolutions cut
+at 300 characters, pretty-printed analysis) and the budgeted one, with the
+ingest-time resolution summaries and with the raw resolution steps, and
+reports estimated context tokens, how many results were collapsed as
+near-duplicates and how many distinct incidents each context covers.
+
+Usage (from the api/ directory):
+    python -m benchmarks.synthesis_context --budget 1500 --output results/synthesis_context.json
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List
+
+from app.context_builder import build_synthesis_context, estimate_tokens
+from benchmarks.stats import environment, percentile, write_results
+from benchmarks.stubs import ANALYSIS_RESPONSE, StubSearchEngine, load_sample_incidents
+
+def legacy_context(description: str, analysis: Dict, results: List[Dict]) -> str:
+    """The context synthesize_resolution built before the context builder"""
+    results_context = "\n\n".join([
+        f"Similar Incident {i+1} (Similarity: {r['similarity_score']:.2f}):\n"
+        f"ID: {r['incident_id']}\n"
+        f"Title: {r['title']}\n"
+        f"Type: {r['incident_type']}, Severity: {r['severity']}\n"
+        f"Resolution: {r['resolution_steps'][:300]}...\n"
+        f"Time to resolve: {r['resolution_time_minutes']} minutes"
+        for i, r in enumerate(results[:5])
+    ])
+    return f"{description}\n{json.dumps(analysis, indent=2)}\n{results_context}"
+
+def summary(values: List[float]) -> Dict:
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95), "max": max(values)}
+
+async def run_benchmark(args) -> Dict:
+    incidents = load_sample_incidents()
+    engine = StubSearchEngine(latency=0.0)
+    legacy_tokens, raw_tokens, budgeted_tokens, collapsed, distinct_legacy, distinct_budgeted = [], [], [], [], [], []
+    
+    for incident in incidents:
+        query = " ".join(incident.get('technical_terms', [])) or incident['title']
+        results = [r for r in await engine.hybrid_search(query, [], size=11) if r['incident_id'] != incident['incident_id']]
+        # Stub scores are unnormalized term counts; give them the 0-1 scale of real results
+        top = max(r['similarity_score'] for r in results) or 1.0
+        results = [{**r, 'similarity_score': r['similarity_score'] / top} for r in results]
+        
+        legacy = legacy_context(incident['description'], ANALYSIS_RESPONSE, results)
+        context = build_synthesis_context(incident['description'], ANALYSIS_RESPONSE, results, token_budget=args.budget)
+        without_summaries = [{k: v for k, v in r.items() if k != 'resolution_summary'} for r in results]
+        raw = build_synthesis_context(incident['description'], ANALYSIS_RESPONSE, without_summaries, token_budget=args.budget)
+        
+        legacy_tokens.append(estimate_tokens(legacy))
+        raw_tokens.append(raw['context_tokens'])
+        budgeted_tokens.append(context['context_tokens'])
+        collapsed.append(sum(len(ids) for ids in context['collapsed'].values()))
+        distinct_legacy.append(len({r['title'] for r in results[:5]}))
+        distinct_budgeted.append(len({r['title'] for r in results if r['incident_id'] in context['included']}))
+    
+    # What one retrieved incident costs: its raw resolution text vs its stored summary
+    raw_resolution = [estimate_tokens(f"{i['resolution_steps']} {i.get('root_cause') or ''}") for i in engine.incidents]
+    summary_resolution = [i['resolution_summary']['tokens'] for i in engine.incidents]
+    
+    return {
+        "environment": environment(),
+        "incidents": len(incidents),
+        "token_budget": args.budget,
+        "legacy_context_tokens": summary(legacy_tokens),
+        "resolution_tokens_per_incident": {
+            "raw": sum(raw_resolution) / len(raw_resolution),
+            "summary": sum(summary_resolution) / len(summary_resolution)
+        },
+        "budgeted_raw_steps_context_tokens": summary(raw_tokens),
+        "budgeted_context_tokens": summary(budgeted_tokens),
+        "within_budget": sum(1 for t in budgeted_tokens if t <= args.budget) / len(budgeted_tokens),
+        "near_duplicates_collapsed_per_request": sum(collapsed) / len(collapsed),
+        "distinct_titles_legacy": sum(distinct_legacy) / len(distinct_legacy),
+        "distinct_titles_budgeted": sum(distinct_budgeted) / len(distinct_budgeted)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesis context tokens: legacy vs token-budgeted builder")
+    parser.add_argument("--budget", type=int, default=1500, help="Context token budget")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        write_results(args.output, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Recall and memory of each vector profile on the incident corpus
+
+Embeds the corpus once at the model's native 768 dimensions (through the
+sqlite embedding cache, so reruns are free), then builds one scratch index
+per profile in app.vector_profiles and runs the same kNN queries through
+HybridSearchEngine. Recall@k treats an exact float32 768-dim cosine ranking
+computed locally as ground truth. Memory is reported both as the Elasticsearch
+sizing estimate for the HNSW working set and as the measured on-disk size of
+the vector field. Needs a live cluster and Vertex AI credentials from .env.
+
+Usage (from the api/ directory):
+    python -m benchmarks.vector_profiles --input ../sample_incidents.json --queries 50
+    python -m benchmarks.vector_profiles --input incidents.ndjson --profiles hnsw int8_hnsw_256 --output results/profiles.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+from elasticsearch import helpers
+
+from app.config import get_settings
+from app.embedding_cache import create_embedding_cache, embedding_cache_key
+from app.search_engine import HybridSearchEngine
+from app.vector_profiles import (
+    NATIVE_DIMS, VECTOR_PROFILES, dense_vector_mapping, estimated_memory_bytes, fit_dimensions, get_vector_profile
+)
+from benchmarks.stats import environment, latency_summary, write_results
+from benchmarks.stubs import SAMPLE_INCIDENTS_PATH
+
+EMBEDDING_MODEL_NAME = "text-embedding-004"
+EMBED_BATCH_SIZE = 32
+
+def load_incidents(path: str, limit: int = 0) -> List[Dict]:
+    with open(path) as f:
+        if f.read(1) == "[":
+            f.seek(0)
+            incidents = json.load(f)
+        else:
+            f.seek(0)
+            incidents = [json.loads(line) for line in f if line.strip()]
+    return incidents[:limit] if limit else incidents
+
+def embed_texts(texts: List[str], cache) -> np.ndarray:
+    """Native-size embeddings as a row-normalized float32 matrix"""
+    from vertexai.language_models import TextEmbeddingModel
+    import vertexai
+    settings = get_settings()
+    vertexai.init(project=settings.GOOGLE_CLOUD_PROJECT, location=settings.GOOGLE_CLOUD_REGION)
+    model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+    
+    keys = [embedding_cache_key(text, EMBEDDING_MODEL_NAME) for text in texts]
+    vectors = [cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[start:start + EMBED_BATCH_SIZE]
+        for i, embedding in zip(batch, model.get_embeddings([texts[i] for i in batch])):
+            vectors[i] = list(embedding.values)
+            cache.put(keys[i], vectors[i])
+    
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def bench_mapping(profile: str) -> Dict:
+    return {
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0, "refresh_interval": "-1"},
+        "mappings": {
+            "properties": {
+                "incident_id": {"type": "keyword"},
+                "title": {"type": "text"},
+                "description": {"type": "text"},
+                "incident_type": {"type": "keyword"},
+                "description_embedding": dense_vector_mapping(profile)
+            }
+        }
+    }
+
+def generate_documents(index_name: str, incidents: List[Dict], vectors: np.ndarray, dims: int):
+    for incident, vector in zip(incidents, vectors):
+        yield {
+            "_index": index_name,
+            "_id": incident["incident_id"],
+            "_source": {
+                "incident_id": incident["incident_id"],
+                "title": incident.get("title", ""),
+                "description": incident.get("description", ""),
+                "incident_type": incident.get("incident_type"),
+                "description_embedding": fit_dimensions(vector.tolist(), dims)
+            }
+        }
+
+async def vector_field_bytes(engine: HybridSearchEngine, index_name: str) -> Dict:
+    """Measured size of the vector field on disk and of the whole index"""
+    stats = await engine.es.indices.stats(index=index_name)
+    sizes = {"index_store_bytes": stats["_all"]["total"]["store"]["size_in_bytes"]}
+    try:
+        usage = await engine.es.indices.disk_usage(index=index_name, run_expensive_tasks=True)
+        field = usage[index_name]["fields"]["description_embedding"]
+        sizes["vector_field_disk_bytes"] = field["total_in_bytes"]
+        sizes["knn_vectors_disk_bytes"] = field.get("knn_vectors_in_bytes")
+    except Exception as e:
+        sizes["vector_field_disk_bytes"] = None
+        sizes["disk_usage_error"] = str(e)
+    return sizes
+
+async def benchmark_profile(
+    engine: HybridSearchEngine,
+    profile: str,
+    incidents: List[Dict],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: List[set],
+    args
+) -> Dict:
+    index_name = engine.index_name
+    dims = get_vector_profile(profile)["dims"]
+    
+    if await engine.es.indices.exists(index=index_name):
+        await engine.es.indices.delete(index=index_name)
+    await engine.es.indices.create(index=index_name, body=bench_mapping(profile))
+    
+    start_time = time.perf_counter()
+    await helpers.async_bulk(engine.es, generate_documents(index_name, incidents, vectors, dims), chunk_size=500)
+    await engine.es.indices.put_settings(index=index_name, settings={"index.refresh_interval": "1s"})
+    await engine.es.indices.refresh(index=index_name)
+    await engine.es.indices.forcemerge(index=index_name, max_num_segments=1)
+    index_seconds = time.perf_counter() - start_time
+    
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        start_time = time.perf_counter()
+        results = await engine.hybrid_search(
+            query_text="", query_vector=fit_dimensions(query.tolist(), dims), size=args.k, retrieval_mode="knn"
+        )
+        latencies.append(time.perf_counter() - start_time)
+        recalls.append(len(expected & {r["incident_id"] for r in results}) / len(expected))
+    
+    sizes = await vector_field_bytes(engine, index_name)
+    if not args.keep_indices:
+        await engine.es.indices.delete(index=index_name)
+    
+    return {
+        "profile": profile,
+        "dims": dims,
+        "index_options": get_vector_profile(profile)["index_options"]["type"],
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "estimated_memory_bytes": estimated_memory_bytes(profile, len(incidents)),
+        **sizes,
+        "index_seconds": round(index_seconds, 1),
+        "latency": latency_summary(latencies)
+    }
+
+async def run_benchmark(args) -> Dict:
+    settings = get_settings()
+    incidents = load_incidents(args.input, args.limit)
+    cache = create_embedding_cache("sqlite", path=settings.EMBEDDING_CACHE_PATH)
+    try:
+        vectors = embed_texts([f"{i['title']} {i['description']} {i['error_messages']}" for i in incidents], cache)
+        rng = np.random.default_rng(args.seed)
+        sampled = rng.choice(len(incidents), min(args.queries, len(incidents)), replace=False)
+        queries = embed_texts([incidents[i]["title"] for i in sampled], cache)
+    finally:
+        cache.close()
+    
+    # Ground truth: exact cosine over the full-precision native vectors
+    k = min(args.k, len(incidents))
+    top = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    truth = [{incidents[i]["incident_id"] for i in row} for row in top]
+    
+    results = []
+    for profile in args.profiles:
+        engine = HybridSearchEngine(
+            cloud_id=settings.ELASTIC_CLOUD_ID,
+            api_key=settings.ELASTIC_API_KEY,
+            index_name=f"{settings.ELASTIC_INDEX_NAME}-profile-bench-{profile}",
+            num_candidates=args.num_candidates,
+            rrf_rank_constant=settings.RRF_RANK_CONSTANT
+        )
+        try:
+            await engine.verify_connection()
+            results.append(await benchmark_profile(engine, profile, incidents, vectors, queries, truth, args))
+        finally:
+            await engine.close()
+    
+    baseline = next((r for r in results if r["profile"] == "hnsw"), None)
+    for result in results:
+        if baseline:
+            result["memory_vs_hnsw"] = round(result["estimated_memory_bytes"] / baseline["estimated_memory_bytes"], 3)
+    
+    return {
+        "environment": environment(),
+        "input": args.input,
+        "documents": len(incidents),
+        "queries": len(queries),
+        "k": k,
+        "num_candidates": args.num_candidates,
+        "ground_truth": f"exact cosine, float32, {NATIVE_DIMS} dims",
+        "results": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs memory for each vector profile")
+    parser.add_argument("--input", default=SAMPLE_INCIDENTS_PATH, help="Incident corpus (JSON array or NDJSON)")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N incidents (0 = all)")
+    parser.add_argument("--profiles", nargs="+", default=list(VECTOR_PROFILES), choices=list(VECTOR_PROFILES))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--num-candidates", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-indices", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        write_results(args.output, report)
+
+if __name__ == "__main__":
+    main()
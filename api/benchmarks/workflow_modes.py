@@ -0,0 +1,117 @@
+"""
+Compare the full (analyze + strategize) and fast (single-call) workflow modes
+
+For every sample incident description the workflow is run in both modes and
+the benchmark reports latency percentiles per mode plus how much the top-k
+search results of the fast mode overlap with the full mode.
+
+Usage (from the api/ directory):
+    python -m benchmarks.workflow_modes --samples 10            # stub backends
+    python -m benchmarks.workflow_modes --samples 10 --live     # Vertex AI + Elasticsearch from .env
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from app.agent_workflow import DevOpsOracleAgent, build_workflow
+from app.models import WorkflowMode
+from benchmarks.stats import percentile
+from benchmarks.stubs import (
+    StubGenerativeModel, StubEmbeddingModel, StubSearchEngine, load_sample_incidents
+)
+
+async def build_agent(live: bool, llm_latency: float):
+    if live:
+        from app.config import get_settings
+        from app.search_engine import HybridSearchEngine
+        settings = get_settings()
+        search_engine = HybridSearchEngine(
+            cloud_id=settings.ELASTIC_CLOUD_ID,
+            api_key=settings.ELASTIC_API_KEY,
+            index_name=settings.ELASTIC_INDEX_NAME
+        )
+        await search_engine.verify_connection()
+        return DevOpsOracleAgent(search_engine, settings.GOOGLE_CLOUD_PROJECT, settings.GOOGLE_CLOUD_REGION)
+    
+    return DevOpsOracleAgent(
+        StubSearchEngine(),
+        project_id="benchmark",
+        region="us-central1",
+        model=StubGenerativeModel(latency=llm_latency, jitter=llm_latency / 5),
+        embedding_model=StubEmbeddingModel()
+    )
+
+async def run_mode(workflow, description: str, request_id: str) -> Dict:
+    start_time = time.perf_counter()
+    result = await workflow.ainvoke({
+        "incident_description": description,
+        "request_id": request_id,
+        "node_timings": {},
+        "agent_steps": [],
+        "errors": []
+    })
+    return {
+        "seconds": time.perf_counter() - start_time,
+        "result_ids": [r['incident_id'] for r in result.get('search_results', [])]
+    }
+
+def overlap(full_ids: List[str], fast_ids: List[str], k: int) -> Dict:
+    full_top, fast_top = set(full_ids[:k]), set(fast_ids[:k])
+    union = full_top | fast_top
+    return {
+        "overlap_at_k": len(full_top & fast_top) / k if k else 0.0,
+        "jaccard": len(full_top & fast_top) / len(union) if union else 1.0
+    }
+
+def summarize(latencies: List[float]) -> Dict:
+    return {
+        "mean_seconds": round(statistics.mean(latencies), 4),
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4)
+    }
+
+async def run_benchmark(samples: int, k: int, live: bool, llm_latency: float) -> Dict:
+    agent = await build_agent(live, llm_latency)
+    workflows = {mode: build_workflow(agent, mode) for mode in WorkflowMode}
+    
+    descriptions = list(dict.fromkeys(i['description'] for i in load_sample_incidents()))[:samples]
+    
+    latencies = {mode.value: [] for mode in WorkflowMode}
+    overlaps = []
+    for i, description in enumerate(descriptions):
+        full = await run_mode(workflows[WorkflowMode.FULL], description, f"bench-full-{i}")
+        fast = await run_mode(workflows[WorkflowMode.FAST], description, f"bench-fast-{i}")
+        latencies[WorkflowMode.FULL.value].append(full["seconds"])
+        latencies[WorkflowMode.FAST.value].append(fast["seconds"])
+        overlaps.append(overlap(full["result_ids"], fast["result_ids"], k))
+    
+    if live:
+        await agent.search_engine.close()
+    
+    return {
+        "samples": len(descriptions),
+        "backend": "live" if live else "stub",
+        "latency": {mode: summarize(values) for mode, values in latencies.items()},
+        "result_overlap": {
+            "k": k,
+            "mean_overlap_at_k": round(statistics.mean(o["overlap_at_k"] for o in overlaps), 3),
+            "mean_jaccard": round(statistics.mean(o["jaccard"] for o in overlaps), 3)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs fast workflow mode benchmark")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--k", type=int, default=5, help="Top-k results compared for overlap")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency (ignored with --live)")
+    parser.add_argument("--live", action="store_true", help="Use Vertex AI and Elasticsearch from settings")
+    args = parser.parse_args()
+    
+    result = asyncio.run(run_benchmark(args.samples, args.k, args.live, args.llm_latency))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
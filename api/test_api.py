@@ -11,6 +11,15 @@ def test_health():
     print(json.dumps(response.json(), indent=2))
     print()
 
+def test_probes():
+    """Test liveness and readiness probes"""
+    for path in ("/health/live", "/health/ready"):
+        print(f"Testing {path} endpoint...")
+        response = requests.get(f"{BASE_URL}{path}")
+        print(f"Status: {response.status_code}")
+        print(json.dumps(response.json(), indent=2))
+        print()
+
 def test_analyze_incident():
     """Test incident analysis"""
     print("Testing /api/v1/incidents/analyze endpoint...")
@@ -69,6 +78,7 @@ if __name__ == "__main__":
     print("=== DevOps Oracle API Tests ===\n")
     
     test_health()
+    test_probes()
     test_stats()
     test_analyze_incident()
     
@@ -0,0 +1,59 @@
+"""
+Batch deduplication tests, with the benchmark's stub models and search engine
+
+Run with: pytest test_batch_analysis.py   (from the api/ directory)
+"""
+import asyncio
+
+from app.batch_analysis import BatchAnalyzer
+from benchmarks.latency import build_stub_agent
+
+def run_batch(descriptions, same_vector: bool = False):
+    agent = build_stub_agent(0.0, 0.0, 0.0, 0.0)
+    if same_vector:
+        # Embeddings of alerts that differ in one number are nearly identical
+        async def embed_texts(texts):
+            return [[1.0, 0.0, 0.5] for _ in texts]
+        agent.embed_texts = embed_texts
+
+    async def collect():
+        return [event async for event in BatchAnalyzer(agent).run(descriptions, "test")]
+    return {event["item"].index: event for event in asyncio.run(collect())}
+
+def test_different_error_codes_are_not_folded():
+    events = run_batch([
+        "Gateway returned HTTP 502 for checkout on port 8080",
+        "Gateway returned HTTP 504 for checkout on port 8080",
+        "Gateway returned HTTP 502 for checkout on port 443",
+        "Gateway returned HTTP 502 for checkout on port 8080",
+    ])
+    assert [events[i]["kind"] for i in range(3)] == ["result"] * 3
+    assert events[3]["kind"] == "duplicate" and events[3]["of"] == 0
+
+def test_near_duplicates_with_different_error_codes_are_not_folded():
+    events = run_batch([
+        "Worker pod crashed with exit code 137 on node pool-a",
+        "Worker pod crashed with exit code 1 on node pool-a",
+        "worker pod crashed with exit code 137 on node pool-a.",
+    ], same_vector=True)
+    assert events[0]["kind"] == "result" and events[1]["kind"] == "result"
+    assert events[2]["kind"] == "duplicate" and events[2]["of"] == 0
+
+def test_replica_numbered_alerts_fold_but_status_codes_do_not():
+    """Replica and node numbers vary across one alert storm; status codes do not"""
+    events = run_batch([
+        "Checkout replica 1 of 12 failing readiness: HTTP 503 from /health",
+        "Checkout replica 2 of 12 failing readiness: HTTP 503 from /health",
+        "Checkout replica 7 of 12 failing readiness: HTTP 500 from /health",
+        "Checkout replica 9 of 12 failing readiness: HTTP 503 from /health",
+    ], same_vector=True)
+    assert events[0]["kind"] == "result" and events[2]["kind"] == "result"
+    assert events[1]["kind"] == "duplicate" and events[1]["of"] == 0
+    assert events[3]["kind"] == "duplicate" and events[3]["of"] == 0
+
+def test_every_stage_keeps_its_model_route():
+    """Each node's routes and prompt tokens add to the item's, as in the workflow graph"""
+    events = run_batch(["Checkout returns HTTP 502: HikariCP connection pool exhausted"])
+    state = events[0]["state"]
+    assert set(state["model_routes"]) == {"analyze", "strategize", "synthesize"}
+    assert set(state["prompt_tokens"]) == {"analyze", "strategize", "synthesize"}
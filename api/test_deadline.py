@@ -0,0 +1,65 @@
+"""
+Deadline budgeting tests, with the benchmark's stub models and search engine
+
+Run with: pytest test_deadline.py   (from the api/ directory)
+"""
+import asyncio
+import time
+
+from app.agent_workflow import build_workflow
+from app.models import WorkflowMode
+from app.single_flight import SingleFlight
+from benchmarks.latency import build_stub_agent
+
+def run(agent, deadline_seconds: float, mode: WorkflowMode = WorkflowMode.FULL):
+    state = {
+        "incident_description": "Checkout returns HTTP 502: HikariCP connection pool exhausted",
+        "request_id": "test",
+        "deadline": time.time() + deadline_seconds,
+        "node_timings": {},
+        "agent_steps": [],
+        "errors": [],
+        "degradations": []
+    }
+    return asyncio.run(build_workflow(agent, mode).ainvoke(state))
+
+def test_short_deadline_runs_every_stage_when_the_model_is_fast():
+    """Reserves scale with the deadline, so 10s is plenty for a 50ms model"""
+    agent = build_stub_agent(0.05, 0.0, 0.0, 0.0)
+    for mode in WorkflowMode:
+        assert run(agent, 10.0, mode)["degradations"] == []
+
+def test_reserves_follow_observed_latency():
+    """Once node latencies are known, a deadline far below the default reserves still fits"""
+    agent = build_stub_agent(0.05, 0.0, 0.0, 0.0)
+    for _ in range(10):
+        run(agent, 30.0)
+    assert agent.expected_node_seconds("synthesize") < 1.0
+    assert run(agent, 1.5)["degradations"] == []
+
+def test_skipped_analysis_does_not_filter_the_search():
+    """The fallback analysis is a guess; its incident_type must not become a filter"""
+    agent = build_stub_agent(0.05, 0.0, 0.0, 0.0)
+    result = run(agent, 0.5, WorkflowMode.FAST)
+    assert "analysis_skipped" in result["degradations"]
+    assert not result["search_strategy"].get("search_filters")
+
+def test_coalesced_follower_keeps_its_own_deadline():
+    """A follower does not wait out a slower leader; past its budget it runs on its own"""
+    flight = SingleFlight()
+    
+    async def call(seconds: float, name: str):
+        await asyncio.sleep(seconds)
+        return name
+    
+    async def scenario():
+        leader = asyncio.ensure_future(flight.run("key", lambda: call(0.5, "leader")))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        follower = await flight.run("key", lambda: call(0.0, "follower"), wait_seconds=0.1)
+        return follower, time.perf_counter() - start, await leader
+    
+    follower, waited, leader = asyncio.run(scenario())
+    assert follower == ("follower", False) and waited < 0.3
+    assert leader == ("leader", False)
+    assert flight.stats()["wait_timeouts"] == 1
@@ -0,0 +1,147 @@
+"""
+Streaming ingest memory test
+
+Writes a synthetic NDJSON file and ingests it in a child process with fake
+Elasticsearch and embedding clients, then checks that peak RSS stays under a
+fixed cap and does not grow with the file size. A smaller JSON array file
+checks the incremental array parser the same way. The default run uses 10k
+incidents; the 1M incident run is slow and opt-in.
+
+Run with: pytest test_ingest_streaming.py   (from the api/ directory)
+    INGEST_TEST_FULL=1 pytest test_ingest_streaming.py   # also run 1M incidents
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+RECORDS = int(os.getenv("INGEST_TEST_RECORDS", "10000"))
+FULL_RECORDS = 1000000
+SMALL_RECORDS = 1000
+MEMORY_CAP_MB = int(os.getenv("INGEST_TEST_MEMORY_CAP_MB", "512"))
+MAX_GROWTH_MB = 64
+
+class FakeEmbedding:
+    def __init__(self, values):
+        self.values = values
+
+class FakeEmbeddingModel:
+    """TextEmbeddingModel stand-in returning tiny deterministic vectors"""
+    
+    def get_embeddings(self, texts, **kwargs):
+        return [FakeEmbedding([float(len(text) % 7), 1.0, 0.5]) for text in texts]
+
+class FakeElasticsearch:
+    """Accepts every bulk request; only counts documents"""
+    
+    def __init__(self):
+        from types import SimpleNamespace
+        from elastic_transport import SerializerCollection
+        from elasticsearch.serializer import DEFAULT_SERIALIZERS
+        self.transport = SimpleNamespace(serializers=SerializerCollection(DEFAULT_SERIALIZERS))
+        self.indexed = 0
+    
+    def options(self, **kwargs):
+        return self
+    
+    def bulk(self, operations=None, **kwargs):
+        from types import SimpleNamespace
+        documents = len(operations) // 2
+        self.indexed += documents
+        return SimpleNamespace(body={"errors": False, "items": [{"index": {"status": 201}} for _ in range(documents)]})
+    
+    def count(self, index=None):
+        return {"count": self.indexed}
+
+def synthetic_incident(i: int) -> dict:
+    return {
+        "incident_id": f"INC-{i}",
+        "title": f"Synthetic incident {i}",
+        "description": f"Connection pool exhausted on checkout-{i % 97}",
+        "error_messages": "HikariCP - Connection is not available",
+        "severity": "P1"
+    }
+
+def write_ndjson(path: str, count: int):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps(synthetic_incident(i)) + "\n")
+
+def write_json_array(path: str, count: int):
+    with open(path, "w") as f:
+        f.write("[\n")
+        for i in range(count):
+            f.write(("  " if i == 0 else ",\n  ") + json.dumps(synthetic_incident(i)))
+        f.write("\n]\n")
+
+def ingest_in_child(path: str) -> dict:
+    """Ingest in a fresh interpreter so ru_maxrss reflects this run only"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", path],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(path)
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def child_main(path: str):
+    import contextlib
+    import io
+    # ingest_data lives at the repository root, one level above api/
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import ingest_data
+    from app.embedding_cache import create_embedding_cache
+    
+    es = FakeElasticsearch()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = ingest_data.ingest_incidents(
+            path,
+            es=es,
+            embedding_model=FakeEmbeddingModel(),
+            embedding_cache=create_embedding_cache("none"),
+            failed_file=None,
+            embed_batch_size=250,
+            bulk_chunk_size=500
+        )
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"indexed": stats.indexed, "peak_rss_mb": peak_kb / 1024}))
+
+def check_memory_is_bounded(records: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        small_path = os.path.join(tmp, "small.ndjson")
+        large_path = os.path.join(tmp, "large.ndjson")
+        array_path = os.path.join(tmp, "large.json")
+        write_ndjson(small_path, SMALL_RECORDS)
+        write_ndjson(large_path, records)
+        write_json_array(array_path, records // 5)
+        
+        small = ingest_in_child(small_path)
+        large = ingest_in_child(large_path)
+        array = ingest_in_child(array_path)
+    
+    print(f"{SMALL_RECORDS} NDJSON records: peak RSS {small['peak_rss_mb']:.0f} MB")
+    print(f"{records} NDJSON records: peak RSS {large['peak_rss_mb']:.0f} MB")
+    print(f"{records // 5} JSON array records: peak RSS {array['peak_rss_mb']:.0f} MB")
+    
+    assert small["indexed"] == SMALL_RECORDS
+    assert large["indexed"] == records
+    assert array["indexed"] == records // 5
+    for result in (large, array):
+        assert result["peak_rss_mb"] < MEMORY_CAP_MB
+        assert result["peak_rss_mb"] - small["peak_rss_mb"] < MAX_GROWTH_MB
+
+def test_streaming_ingest_memory_is_bounded():
+    check_memory_is_bounded(RECORDS)
+
+@pytest.mark.skipif(os.getenv("INGEST_TEST_FULL") != "1", reason="slow; set INGEST_TEST_FULL=1 to run")
+def test_streaming_ingest_memory_is_bounded_at_1m_records():
+    check_memory_is_bounded(FULL_RECORDS)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child_main(sys.argv[2])
+    else:
+        check_memory_is_bounded(FULL_RECORDS if os.getenv("INGEST_TEST_FULL") == "1" else RECORDS)
+        print("✅ Streaming ingest memory stays bounded")
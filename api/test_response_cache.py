@@ -0,0 +1,56 @@
+"""
+Response cache normalization tests
+
+Run with: pytest test_response_cache.py   (from the api/ directory)
+"""
+from app.response_cache import ResponseCache, description_hash, normalize_description
+
+def test_error_codes_do_not_collide():
+    """Status codes, exit codes and ports are the error itself, not noise"""
+    pairs = [
+        ("Gateway returned HTTP 502 for checkout on port 8080", "Gateway returned HTTP 504 for checkout on port 8080"),
+        ("Gateway returned HTTP 502 for checkout on port 8080", "Gateway returned HTTP 502 for checkout on port 443"),
+        ("Job worker crashed with exit code 137", "Job worker crashed with exit code 1"),
+    ]
+    for first, second in pairs:
+        assert description_hash(first) != description_hash(second), (first, second)
+
+def test_volatile_tokens_are_masked():
+    """Pod suffixes, IPs, timestamps, UUIDs and hex ids differ between repeats of one alert"""
+    first = ("Pod checkout-7d9f8b6c5-x2k4p OOMKilled at 2024-03-01T12:00:01Z, "
+             "upstream 10.0.3.17:5432, trace 3fa85f64-5717-4562-b3fc-2c963f66afa6, request deadbeef12")
+    second = ("Pod checkout-5c8d7f9b41-ab3de OOMKilled at 2024-03-02T08:15:44Z, "
+              "upstream 10.0.9.201:5432, trace 9b2e1c4a-0d3f-4e5a-8b6c-7d8e9f0a1b2c, request 0a1b2c3d4e")
+    assert normalize_description(first) == normalize_description(second)
+
+def test_exact_tier_misses_on_a_different_error_code():
+    cache = ResponseCache()
+    cache.put("Gateway returned HTTP 502 for checkout", None, {"answer": 502}, 1.0)
+    assert cache.lookup_exact("Gateway returned HTTP 504 for checkout") is None
+    assert cache.lookup_exact("gateway returned  HTTP 502 for checkout").response == {"answer": 502}
+
+def test_coalescing_key_keeps_every_token():
+    """Concurrent runs are only shared between reports that match token for token"""
+    first = "Pod checkout-7d9f8b6c5-x2k4p returned HTTP 502"
+    second = "Pod checkout-5c8d7f9b41-ab3de returned HTTP 502"
+    assert description_hash(first) == description_hash(second)
+    assert description_hash(first, mask_volatile=False) != description_hash(second, mask_volatile=False)
+    assert description_hash(first, mask_volatile=False) == description_hash(f"  {first.upper()} ", mask_volatile=False)
+
+def test_port_after_an_address_is_kept():
+    """The address is volatile; the port says which service refused"""
+    first = "Connection to 10.0.0.5:6379 refused"
+    second = "Connection to 10.0.0.5:5432 refused"
+    assert description_hash(first) != description_hash(second)
+    assert description_hash(first) == description_hash("Connection to 10.0.9.17:6379 refused")
+    cache = ResponseCache()
+    cache.put(first, None, {"answer": "redis"}, 1.0)
+    assert cache.lookup_exact(second) is None
+
+def test_semantic_tier_misses_on_a_different_error_code():
+    """Near-identical embeddings must not serve a different status code or port"""
+    cache = ResponseCache()
+    cache.put("Connection to 10.0.0.5:6379 refused", [1.0, 0.0, 0.5], {"answer": "redis"}, 1.0)
+    assert cache.lookup_semantic([1.0, 0.0, 0.5], "Connection to 10.0.0.5:5432 refused") is None
+    entry, similarity = cache.lookup_semantic([1.0, 0.0, 0.5], "Connection to 10.0.3.2:6379 refused")
+    assert entry.response == {"answer": "redis"} and similarity > 0.99
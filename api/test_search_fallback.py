@@ -0,0 +1,38 @@
+"""
+Search backend fallback tests, with the benchmark's stub search engine as the local backend
+
+Run with: pytest test_search_fallback.py   (from the api/ directory)
+"""
+import asyncio
+from types import SimpleNamespace
+
+from elasticsearch import NotFoundError
+
+from app.search_engine import FallbackSearchEngine, HybridSearchEngine
+from benchmarks.stubs import StubSearchEngine
+
+class FakeElasticsearch:
+    def __init__(self, error: Exception):
+        self.error = error
+    
+    async def get(self, **kwargs):
+        raise self.error
+
+def engines(error: Exception):
+    primary = HybridSearchEngine.__new__(HybridSearchEngine)
+    primary.es = FakeElasticsearch(error)
+    primary.index_name = "devops-incidents"
+    fallback = StubSearchEngine(latency=0.0)
+    return FallbackSearchEngine(primary, fallback), fallback
+
+def test_get_incident_falls_back_when_elasticsearch_is_down():
+    engine, fallback = engines(ConnectionError("Elasticsearch unreachable"))
+    incident_id = fallback.incidents[0]['incident_id']
+    incident = asyncio.run(engine.get_incident_by_id(incident_id))
+    assert incident['incident_id'] == incident_id
+    assert engine.fallback_count == 1
+
+def test_missing_incident_is_not_a_failure():
+    engine, _ = engines(NotFoundError("not found", SimpleNamespace(status=404), {"found": False}))
+    assert asyncio.run(engine.get_incident_by_id("INC-missing")) is None
+    assert engine.fallback_count == 0
@@ -0,0 +1,39 @@
+"""
+Search filter tests, with the benchmark's stub models and search engine
+
+Run with: pytest test_search_filters.py   (from the api/ directory)
+"""
+import asyncio
+import time
+
+from app.agent_workflow import build_workflow
+from app.models import WorkflowMode
+from app.search_engine import matches_filters
+from benchmarks.latency import build_stub_agent
+from benchmarks.stubs import STRATEGY_RESPONSE
+
+def test_matches_filters_follows_term_semantics():
+    result = {"incident_type": "database", "affected_systems": ["checkout", "postgres"]}
+    assert matches_filters(result, None)
+    assert matches_filters(result, {"incident_type": ["database", "network"]})
+    assert matches_filters(result, {"affected_systems": "postgres"})
+    assert not matches_filters(result, {"incident_type": "network"})
+    assert not matches_filters(result, {"severity": "P1"})
+
+def test_vector_candidates_do_not_bypass_the_strategy_filters():
+    """The candidate kNN runs before the strategy; its excluded incidents must not be fused back in"""
+    agent = build_stub_agent(0.0, 0.0, 0.0, 0.0)
+    state = {
+        "incident_description": "Checkout returns HTTP 502: HikariCP connection pool exhausted",
+        "request_id": "test",
+        "deadline": time.time() + 30.0,
+        "node_timings": {},
+        "agent_steps": [],
+        "errors": [],
+        "degradations": []
+    }
+    result = asyncio.run(build_workflow(agent, WorkflowMode.FULL).ainvoke(state))
+    filters = STRATEGY_RESPONSE["search_filters"]
+    assert any(not matches_filters(c, filters) for c in result["vector_candidates"])
+    assert result["search_results"]
+    assert all(matches_filters(r, filters) for r in result["search_results"])
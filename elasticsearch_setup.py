@@ -1,8 +1,17 @@
 from elasticsearch import Elasticsearch
 from datetime import datetime
+import argparse
+import copy
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
+# Share the vector profiles and index settings with ingest and the API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from app.index_settings import SERVING_SETTINGS, bulk_load, shard_count
+from app.vector_profiles import DEFAULT_PROFILE, dense_vector_mapping
+
 load_dotenv()
 
 # Connect to Elasticsearch
@@ -11,14 +20,21 @@ es = Elasticsearch(
     api_key=os.getenv('ELASTIC_API_KEY')
 )
 
-# Index name
-INDEX_NAME = "devops-incidents"
+# Read/write alias; searches and ingest always go through it
+INDEX_NAME = os.getenv('ELASTIC_INDEX_NAME', 'devops-incidents')
+
+# Bump whenever INDEX_MAPPING changes; each version is its own physical index
+INDEX_VERSION = 5
+
+# Dimensions and quantization of description_embedding (app/vector_profiles.py)
+VECTOR_PROFILE = os.getenv('VECTOR_PROFILE', DEFAULT_PROFILE)
 
 # Index mapping with hybrid search support
 INDEX_MAPPING = {
     "settings": {
+        # number_of_shards is sized from the corpus in index_body()
         "number_of_shards": 1,
-        "number_of_replicas": 1,
+        **SERVING_SETTINGS,
         "analysis": {
             "analyzer": {
                 "technical_analyzer": {
@@ -46,12 +62,7 @@ INDEX_MAPPING = {
             },
             
             # Vector embedding for semantic search
-            "description_embedding": {
-                "type": "dense_vector",
-                "dims": 768,  # text-embedding-004 produces 768-dim vectors
-                "index": True,
-                "similarity": "cosine"
-            },
+            "description_embedding": dense_vector_mapping(VECTOR_PROFILE),
             
             # Incident classification
             "severity": {
@@ -91,6 +102,18 @@ INDEX_MAPPING = {
             "root_cause": {
                 "type": "text"
             },
+            # Compact summary of the two above, computed at ingest
+            # (app/resolution_summary.py); synthesis prompts use it instead
+            "resolution_summary": {
+                "properties": {
+                    "key_actions": {"type": "text", "index": False},
+                    "commands": {"type": "keyword", "index": False},
+                    "root_cause_category": {"type": "keyword"},
+                    "text": {"type": "text", "index": False},
+                    "tokens": {"type": "integer", "index": False},
+                    "version": {"type": "integer"}
+                }
+            },
             
             # Source metadata
             "source_type": {
@@ -118,30 +141,159 @@ INDEX_MAPPING = {
             },
             "related_incidents": {
                 "type": "keyword"
+            },
+            
+            # Ingest bookkeeping: hashes of the embedded fields and of everything
+            # else, so re-ingest can skip unchanged incidents
+            "content_hash": {
+                "type": "keyword",
+                "index": False
+            },
+            "metadata_hash": {
+                "type": "keyword",
+                "index": False
             }
         }
     }
 }
 
-def create_index():
-    """Create the Elasticsearch index with hybrid search support"""
+def index_body(expected_docs: int = 0) -> dict:
+    """INDEX_MAPPING with the shard count chosen for expected_docs incidents"""
+    body = copy.deepcopy(INDEX_MAPPING)
+    dims = body['mappings']['properties']['description_embedding']['dims']
+    body['settings']['number_of_shards'] = shard_count(expected_docs, dims)
+    return body
+
+def versioned_index_name(version: int = INDEX_VERSION, profile: str = VECTOR_PROFILE) -> str:
+    # Only opt-in profiles are named; the default keeps the plain versioned name
+    suffix = "" if profile == DEFAULT_PROFILE else f"-{profile}"
+    return f"{INDEX_NAME}-v{version}{suffix}"
+
+def current_alias_target():
+    """Physical index the alias points to, or None if the alias does not exist"""
+    if not es.indices.exists_alias(name=INDEX_NAME):
+        return None
+    return next(iter(es.indices.get_alias(name=INDEX_NAME)))
+
+def embedding_mapping_changed(source_index: str) -> bool:
+    """
+    Whether stored embeddings in source_index cannot be reused. Only the
+    dimensionality matters: quantization is rebuilt from the float vectors in
+    _source, so switching index_options alone keeps the embeddings.
+    """
+    mapping = es.indices.get_mapping(index=source_index)[source_index]['mappings']
+    old = mapping.get('properties', {}).get('description_embedding') or {}
+    return old.get('dims') != INDEX_MAPPING['mappings']['properties']['description_embedding']['dims']
+
+def reindex(source_index: str, dest_index: str, poll_seconds: float = 5.0):
+    """
+    Copy every document from source_index into dest_index with _reindex, run
+    as a background task on the cluster. Embeddings are copied as-is when the
+    vector field is unchanged; otherwise they and the content hash are dropped
+    so the next `ingest_data.py --incremental` re-embeds those incidents.
+    """
+    script = None
+    if embedding_mapping_changed(source_index):
+        print("⚠️ Vector mapping changed; embeddings will be dropped and must be re-ingested")
+        script = {
+            "lang": "painless",
+            "source": "ctx._source.remove('description_embedding'); ctx._source.remove('content_hash')"
+        }
+    
+    task_id = es.reindex(
+        source={"index": source_index},
+        dest={"index": dest_index},
+        script=script,
+        wait_for_completion=False,
+        slices="auto"
+    )['task']
+    print(f"🔁 Reindexing {source_index} -> {dest_index} (task {task_id})")
+    while True:
+        task = es.tasks.get(task_id=task_id)
+        status = task['task']['status']
+        print(f"   {status.get('created', 0) + status.get('updated', 0)}/{status.get('total', 0)} documents")
+        if task.get('completed'):
+            break
+        time.sleep(poll_seconds)
+    
+    response = task.get('response', {})
+    if task.get('error') or response.get('failures'):
+        raise RuntimeError(f"Reindex failed: {task.get('error') or response['failures'][:5]}")
+    es.indices.refresh(index=dest_index)
+
+def swap_alias(new_index: str, old_index=None, legacy: bool = False):
+    """
+    Point the alias at new_index in one atomic update_aliases call. A legacy
+    concrete index named like the alias is removed in the same call, since
+    the alias cannot be created while it exists.
+    """
+    actions = []
+    if legacy:
+        actions.append({"remove_index": {"index": old_index}})
+    elif old_index:
+        actions.append({"remove": {"index": old_index, "alias": INDEX_NAME}})
+    actions.append({"add": {"index": new_index, "alias": INDEX_NAME, "is_write_index": True}})
+    es.indices.update_aliases(actions=actions)
+    print(f"✅ Alias '{INDEX_NAME}' -> '{new_index}'")
+
+def create_index(reindex_existing: bool = True, expected_docs=None, bulk_load_profile: bool = True):
+    """
+    Create the current versioned index and move the alias onto it without
+    downtime: the previous version keeps serving searches while the new one
+    is built, then the alias is swapped atomically. Previous versions are
+    kept so the alias can be pointed back if needed.
+    
+    The shard count is sized for expected_docs (default: the previous
+    version's document count). The reindex runs under the bulk-load settings
+    profile, and the index is force-merged and warmed before the swap.
+    """
+    new_index = versioned_index_name()
     try:
-        # Delete if exists (for development)
-        if es.indices.exists(index=INDEX_NAME):
-            print(f"Index {INDEX_NAME} exists. Deleting...")
-            es.indices.delete(index=INDEX_NAME)
+        legacy = es.indices.exists(index=INDEX_NAME) and not es.indices.exists_alias(name=INDEX_NAME)
+        old_index = INDEX_NAME if legacy else current_alias_target()
+        if old_index == new_index:
+            print(f"✅ Alias '{INDEX_NAME}' already points to '{new_index}'")
+            return
         
-        # Create index
-        es.indices.create(index=INDEX_NAME, body=INDEX_MAPPING)
-        print(f"✅ Index '{INDEX_NAME}' created successfully!")
+        if not es.indices.exists(index=new_index):
+            if expected_docs is None:
+                expected_docs = es.count(index=old_index)['count'] if old_index else 0
+            body = index_body(expected_docs)
+            es.indices.create(index=new_index, body=body)
+            print(f"✅ Index '{new_index}' created successfully! "
+                  f"({body['settings']['number_of_shards']} shards for {expected_docs} expected documents)")
+        
+        if old_index and reindex_existing:
+            if bulk_load_profile:
+                with bulk_load(es, new_index, restore=SERVING_SETTINGS) as timings:
+                    reindex(old_index, new_index)
+                print("   Bulk-load finish: " + ", ".join(f"{k} {v:.1f}" for k, v in timings.items()))
+            else:
+                reindex(old_index, new_index)
+        swap_alias(new_index, old_index, legacy)
         
         # Verify
         info = es.indices.get(index=INDEX_NAME)
-        print(f"✅ Index verified. Mapping: {info[INDEX_NAME]['mappings']}")
+        print(f"✅ Index verified. Mapping: {info[new_index]['mappings']}")
         
     except Exception as e:
         print(f"❌ Error creating index: {e}")
         raise
 
+def main():
+    parser = argparse.ArgumentParser(description=f"Create {versioned_index_name()} and point the '{INDEX_NAME}' alias at it")
+    parser.add_argument("--no-reindex", action="store_true",
+                        help="Swap to an empty index instead of copying documents from the previous version")
+    parser.add_argument("--expected-docs", type=int,
+                        help="Corpus size used to choose the shard count (default: the previous version's count)")
+    parser.add_argument("--no-bulk-load-profile", action="store_true",
+                        help="Reindex with the serving settings instead of the bulk-load profile")
+    args = parser.parse_args()
+    create_index(
+        reindex_existing=not args.no_reindex,
+        expected_docs=args.expected_docs,
+        bulk_load_profile=not args.no_bulk_load_profile
+    )
+
 if __name__ == "__main__":
-    create_index()
\ No newline at end of file
+    main()
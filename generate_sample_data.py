@@ -1,3 +1,4 @@
+import argparse
 import json
 from datetime import datetime, timedelta
 import random
@@ -71,9 +72,8 @@ INCIDENT_TEMPLATES = [
     }
 ]
 
-def generate_incidents(count=20):
-    """Generate sample incident data"""
-    incidents = []
+def iter_incidents(count=20):
+    """Yield sample incidents one at a time"""
     base_date = datetime.now() - timedelta(days=180)
     
     for i in range(count):
@@ -103,16 +103,32 @@ def generate_incidents(count=20):
             "tags": template['tags']
         }
         
-        incidents.append(incident)
-    
-    return incidents
+        yield incident
 
-if __name__ == "__main__":
-    incidents = generate_incidents(20)
+def generate_incidents(count=20):
+    """Generate sample incident data"""
+    return list(iter_incidents(count))
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sample incidents")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="ndjson streams one incident per line, so large corpora never sit in memory")
+    parser.add_argument("--output", help="Defaults to sample_incidents.json or sample_incidents.ndjson")
+    args = parser.parse_args()
+    
+    output = args.output or f"sample_incidents.{args.format}"
     
     # Save to file
-    with open('sample_incidents.json', 'w') as f:
-        json.dump(incidents, f, indent=2)
+    with open(output, 'w') as f:
+        if args.format == "ndjson":
+            for incident in iter_incidents(args.count):
+                f.write(json.dumps(incident) + "\n")
+        else:
+            json.dump(generate_incidents(args.count), f, indent=2)
     
-    print(f"✅ Generated {len(incidents)} sample incidents")
-    print("Saved to: sample_incidents.json")
\ No newline at end of file
+    print(f"✅ Generated {args.count} sample incidents")
+    print(f"Saved to: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,545 @@
+import argparse
+import hashlib
 import json
-from elasticsearch import Elasticsearch, helpers
-from vertexai.generative_models import GenerativeModel
-import vertexai
 import os
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from elasticsearch import Elasticsearch, NotFoundError, helpers
+from vertexai.language_models import TextEmbeddingModel
+import vertexai
 from dotenv import load_dotenv
 
+# Share the embedding cache implementation with the API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from app.embedding_cache import EmbeddingCache, create_embedding_cache, embedding_cache_key
+from app.index_settings import bulk_load
+from app.resolution_summary import summarize_resolution
+from app.vector_profiles import DEFAULT_PROFILE, NATIVE_DIMS, VECTOR_PROFILES, fit_dimensions, get_vector_profile
+
 load_dotenv()
 
-# Initialize
-vertexai.init(
-    project=os.getenv('GOOGLE_CLOUD_PROJECT'),
-    location=os.getenv('GOOGLE_CLOUD_REGION')
-)
+EMBEDDING_MODEL_NAME = "text-embedding-004"
+INDEX_NAME = os.getenv('ELASTIC_INDEX_NAME', 'devops-incidents')
+# Must match the profile the index was created with (elasticsearch_setup.py)
+VECTOR_PROFILE = os.getenv('VECTOR_PROFILE', DEFAULT_PROFILE)
 
-es = Elasticsearch(
-    cloud_id=os.getenv('ELASTIC_CLOUD_ID'),
-    api_key=os.getenv('ELASTIC_API_KEY')
-)
+# text-embedding-004 accepts up to 250 inputs (and 20k tokens) per request
+EMBED_BATCH_SIZE = 32
+EMBED_WORKERS = 4
+EMBED_MAX_RETRIES = 3
+BULK_CHUNK_SIZE = 500
+BULK_MAX_CHUNK_BYTES = 50 * 1024 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
 
-embedding_model = GenerativeModel("text-embedding-004")
+# Fields that feed the embedding; any change to them requires re-embedding
+EMBEDDED_FIELDS = ("title", "description", "error_messages")
+# Derived fields excluded from the metadata hash. resolution_summary is derived
+# too but stays in it, so a new SUMMARY_VERSION rewrites stored summaries
+DERIVED_FIELDS = ("description_embedding", "content_hash", "metadata_hash")
 
-def generate_embedding(text: str):
-    """Generate embedding using Vertex AI"""
-    response = embedding_model.generate_content(text)
-    return response.embeddings[0].values
+def embedding_text(incident: Dict) -> str:
+    return f"{incident['title']} {incident['description']} {incident['error_messages']}"
 
-def ingest_incidents(file_path: str):
-    """Ingest incidents into Elasticsearch with embeddings"""
+def output_dimensions(profile: str) -> Optional[int]:
+    """Dimensions to request from the embedding model, or None for its native size"""
+    dims = get_vector_profile(profile)['dims']
+    return dims if dims != NATIVE_DIMS else None
+
+def content_hash(incident: Dict, dimensions: Optional[int] = None) -> str:
+    """Hash of the embedded fields and the embedding model (and size) that produced the vector"""
+    model = [EMBEDDING_MODEL_NAME] + ([str(dimensions)] if dimensions else [])
+    payload = "\x00".join(model + [str(incident.get(field, "")) for field in EMBEDDED_FIELDS])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def metadata_hash(incident: Dict) -> str:
+    """Hash of every other stored field"""
+    metadata = {k: v for k, v in incident.items() if k not in EMBEDDED_FIELDS and k not in DERIVED_FIELDS}
+    return hashlib.sha256(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class StageStats:
+    """Documents and busy time of one pipeline stage"""
     
-    # Load incidents
-    with open(file_path, 'r') as f:
-        incidents = json.load(f)
+    def __init__(self, name: str):
+        self.name = name
+        self.docs = 0
+        self.busy_seconds = 0.0
+    
+    def add(self, docs: int, seconds: float):
+        self.docs += docs
+        self.busy_seconds += seconds
+    
+    def summary(self, wall_seconds: float) -> str:
+        wall_rate = self.docs / wall_seconds if wall_seconds else 0.0
+        busy_rate = self.docs / self.busy_seconds if self.busy_seconds else 0.0
+        return (f"{self.name:<6} {self.docs:>9} docs  {wall_rate:>9.1f} docs/s wall  "
+                f"{busy_rate:>9.1f} docs/s per worker  ({self.busy_seconds:.1f}s busy)")
+
+class IngestStats:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.read = StageStats("read")
+        self.enrich = StageStats("enrich")
+        self.diff = StageStats("diff")
+        self.embed = StageStats("embed")
+        self.index = StageStats("index")
+        self.embedding_requests = 0
+        self.indexed = 0
+        # Incremental mode: what the diff against the index decided per incident
+        self.created = 0
+        self.updated = 0
+        self.metadata_updated = 0
+        self.skipped = 0
+        # Bulk-load profile: seconds spent restoring, force-merging and warming
+        self.bulk_load_finish: Dict[str, float] = {}
     
-    print(f"📥 Ingesting {len(incidents)} incidents...")
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+    
+    def report(self):
+        wall = self.elapsed()
+        print(f"\n⏱️  Stage throughput over {wall:.1f}s:")
+        for stage in (self.read, self.enrich, self.diff, self.embed, self.index):
+            if stage.docs:
+                print(f"   {stage.summary(wall)}")
+        print(f"   Embedding requests: {self.embedding_requests}")
+        if self.bulk_load_finish:
+            print("   Bulk-load finish: " + ", ".join(f"{k} {v:.1f}" for k, v in self.bulk_load_finish.items()))
+    
+    def report_changes(self):
+        print(f"\n🔄 Incremental sync: {self.created} created, {self.updated} re-embedded, "
+              f"{self.metadata_updated} metadata-only updates, {self.skipped} unchanged (skipped)")
+
+class BatchEmbedder:
+    """Embeds lists of texts with one multi-input request per batch, serving repeats from the cache"""
     
-    # Prepare bulk actions
-    actions = []
+    def __init__(self, model, cache: EmbeddingCache, max_retries: int = EMBED_MAX_RETRIES,
+                 dimensions: Optional[int] = None):
+        self.model = model
+        self.cache = cache
+        self.max_retries = max_retries
+        self.dimensions = dimensions
+        self.requests = 0
+    
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        kwargs = {"output_dimensionality": self.dimensions} if self.dimensions else {}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.requests += 1
+                embeddings = self.model.get_embeddings(texts, **kwargs)
+                if self.dimensions:
+                    return [fit_dimensions(e.values, self.dimensions) for e in embeddings]
+                return [list(e.values) for e in embeddings]
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                backoff = 2 ** attempt
+                print(f"⚠️ Embedding request failed ({e}), retrying in {backoff}s")
+                time.sleep(backoff)
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_cache_key(text, EMBEDDING_MODEL_NAME, self.dimensions) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self._request([texts[i] for i in missing])):
+                vectors[i] = vector
+            self.cache.put_many([(keys[i], vectors[i]) for i in missing])
+        return vectors
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def enrich_incidents(incidents: Iterable[Dict], stats: IngestStats) -> Iterator[Dict]:
+    """Add the compact resolution_summary synthesis prompts use instead of the raw resolution text"""
     for incident in incidents:
-        # Generate embedding for description
-        embedding_text = f"{incident['title']} {incident['description']} {incident['error_messages']}"
-        embedding = generate_embedding(embedding_text)
-        
-        # Add embedding to incident
-        incident['description_embedding'] = embedding
-        
-        # Create action for bulk API
-        action = {
-            "_index": os.getenv('ELASTIC_INDEX_NAME', 'devops-incidents'),
+        start_time = time.perf_counter()
+        incident['resolution_summary'] = summarize_resolution(incident)
+        stats.enrich.add(1, time.perf_counter() - start_time)
+        yield incident
+
+def embed_incidents(
+    incidents: Iterable[Dict],
+    embedder: BatchEmbedder,
+    stats: IngestStats,
+    failures: "FailureLog",
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = EMBED_WORKERS,
+    max_in_flight: Optional[int] = None
+) -> Iterator[Dict]:
+    """
+    Yield incidents with description_embedding set, in input order. At most
+    max_in_flight batches (default 2 * workers) are read ahead, so the input is
+    consumed lazily and memory does not grow with the input size.
+    """
+    max_in_flight = max_in_flight or 2 * workers
+    
+    def embed_batch(batch: List[Dict]) -> List[Dict]:
+        start_time = time.perf_counter()
+        # Metadata-only updates keep their stored vector
+        to_embed = [incident for incident in batch if incident.get('_ingest_op') != "update"]
+        try:
+            vectors = embedder.embed([embedding_text(incident) for incident in to_embed]) if to_embed else []
+        except Exception as e:
+            failures.record([incident['incident_id'] for incident in to_embed], "embed", str(e))
+            return [incident for incident in batch if incident.get('_ingest_op') == "update"]
+        for incident, vector in zip(to_embed, vectors):
+            incident['description_embedding'] = vector
+        stats.embed.add(len(to_embed), time.perf_counter() - start_time)
+        return batch
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batched(incidents, batch_size):
+            pending.append(pool.submit(embed_batch, batch))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def bulk_actions(incidents: Iterable[Dict], index_name: str, dimensions: Optional[int] = None) -> Iterator[Dict]:
+    for incident in incidents:
+        if incident.pop('_ingest_op', None) == "update":
+            # Partial update: the stored embedding is left untouched
+            yield {
+                "_op_type": "update",
+                "_index": index_name,
+                "_id": incident['incident_id'],
+                "doc": {k: v for k, v in incident.items() if k not in EMBEDDED_FIELDS}
+            }
+            continue
+        incident['content_hash'] = content_hash(incident, dimensions)
+        incident['metadata_hash'] = metadata_hash(incident)
+        yield {
+            "_index": index_name,
             "_id": incident['incident_id'],
             "_source": incident
         }
-        actions.append(action)
-        print(f"✓ Processed {incident['incident_id']}")
+
+def timed(items: Iterable, stage: StageStats) -> Iterator:
+    """Yield from items, counting them and the time spent producing them towards stage"""
+    iterator = iter(items)
+    while True:
+        start_time = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stage.busy_seconds += time.perf_counter() - start_time
+            return
+        stage.add(1, time.perf_counter() - start_time)
+        yield item
+
+def diff_against_index(
+    es,
+    incidents: Iterable[Dict],
+    index_name: str,
+    stats: IngestStats,
+    batch_size: int = BULK_CHUNK_SIZE,
+    dimensions: Optional[int] = None
+) -> Iterator[Dict]:
+    """
+    Compare each incident's hashes with the indexed copy (one mget per batch).
+    Unchanged incidents are dropped, metadata-only changes are marked for a
+    partial update, and new or content-changed incidents pass through for
+    embedding and a full index.
+    """
+    for batch in batched(incidents, batch_size):
+        start_time = time.perf_counter()
+        try:
+            response = es.mget(
+                index=index_name,
+                ids=[incident['incident_id'] for incident in batch],
+                source_includes=["content_hash", "metadata_hash"]
+            )
+            existing = {doc['_id']: doc.get('_source', {}) for doc in response['docs'] if doc.get('found')}
+        except NotFoundError:
+            # No index yet: everything is new
+            existing = {}
+        
+        changed = []
+        for incident in batch:
+            stored = existing.get(incident['incident_id'])
+            if stored is None:
+                stats.created += 1
+            elif stored.get('content_hash') != content_hash(incident, dimensions):
+                stats.updated += 1
+            elif stored.get('metadata_hash') != metadata_hash(incident):
+                incident['metadata_hash'] = metadata_hash(incident)
+                incident['_ingest_op'] = "update"
+                stats.metadata_updated += 1
+            else:
+                stats.skipped += 1
+                continue
+            changed.append(incident)
+        stats.diff.add(len(batch), time.perf_counter() - start_time)
+        yield from changed
+
+def index_documents(
+    es,
+    actions: Iterable[Dict],
+    stats: IngestStats,
+    failures: "FailureLog",
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+    threads: int = 1,
+    progress_every: int = 1000
+):
+    """
+    Send actions with streaming_bulk (one thread, retrying 429s with backoff)
+    or parallel_bulk (several chunks in flight). Failed items are logged.
+    """
+    upstream = StageStats("upstream")
+    actions = timed(actions, upstream)
+    if threads > 1:
+        results = helpers.parallel_bulk(
+            es, actions, thread_count=threads, chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes,
+            queue_size=threads, raise_on_error=False, raise_on_exception=False
+        )
+    else:
+        results = helpers.streaming_bulk(
+            es, actions, chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes,
+            raise_on_error=False, raise_on_exception=False, max_retries=3, initial_backoff=2
+        )
+    
+    start_time = time.perf_counter()
+    for ok, item in results:
+        stats.index.docs += 1
+        if ok:
+            stats.indexed += 1
+        else:
+            info = next(iter(item.values()))
+            failures.record([info.get('_id')], "index", json.dumps(info.get('error', info.get('status')), default=str))
+        if stats.index.docs % progress_every == 0:
+            print(f"✓ {stats.index.docs} documents processed ({stats.index.docs / stats.elapsed():.1f} docs/s)")
+    
+    # streaming_bulk pulls actions on this thread, so time spent embedding them
+    # is excluded; parallel_bulk pulls them on a pool thread, overlapping indexing
+    busy = time.perf_counter() - start_time
+    stats.index.busy_seconds += busy - upstream.busy_seconds if threads <= 1 else busy
+
+class FailureLog:
+    """Writes this run's failed incident ids to a JSONL file that --retry-failed can replay"""
+    
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w") if path else None
+    
+    def record(self, incident_ids: List[str], stage: str, error: str):
+        self.count += len(incident_ids)
+        print(f"❌ {stage} failed for {len(incident_ids)} incident(s): {error[:200]}")
+        if self._file:
+            for incident_id in incident_ids:
+                self._file.write(json.dumps({"incident_id": incident_id, "stage": stage, "error": error[:500]}) + "\n")
+            self._file.flush()
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+
+def load_failed_ids(path: str) -> Set[str]:
+    with open(path, 'r') as f:
+        return {json.loads(line)['incident_id'] for line in f if line.strip()}
+
+def read_ndjson(file_path: str) -> Iterator[Dict]:
+    """One incident per line"""
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def read_json_array(file_path: str, chunk_bytes: int = READ_CHUNK_BYTES) -> Iterator[Dict]:
+    """Incrementally decode the objects of a top-level JSON array, one chunk at a time"""
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as f:
+        buffer = f.read(chunk_bytes).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{file_path} is not a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            # Skip whitespace and separators between elements
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                incident, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_bytes)
+                eof = not chunk
+                # Only the undecoded tail is kept, so the buffer stays about one chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            pos = end
+            yield incident
+
+def detect_format(file_path: str) -> str:
+    if file_path.endswith(('.ndjson', '.jsonl')):
+        return "ndjson"
+    with open(file_path, 'r') as f:
+        first = f.read(4096).lstrip()[:1]
+    return "json" if first == '[' else "ndjson"
+
+def read_incidents(file_path: str, input_format: str = "auto") -> Iterator[Dict]:
+    """Stream incidents from an NDJSON file or a JSON array without loading the whole file"""
+    if input_format == "auto":
+        input_format = detect_format(file_path)
+    if input_format == "ndjson":
+        return read_ndjson(file_path)
+    return read_json_array(file_path)
+
+def ingest_incidents(
+    file_path: str,
+    es=None,
+    embedding_model=None,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    index_name: str = INDEX_NAME,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    embed_workers: int = EMBED_WORKERS,
+    bulk_chunk_size: int = BULK_CHUNK_SIZE,
+    bulk_max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+    bulk_threads: int = 1,
+    failed_file: Optional[str] = "ingest_failed.jsonl",
+    retry_failed: Optional[str] = None,
+    input_format: str = "auto",
+    max_in_flight: Optional[int] = None,
+    incremental: bool = False,
+    vector_profile: str = VECTOR_PROFILE,
+    bulk_load_profile: bool = False
+) -> IngestStats:
+    """Ingest incidents into Elasticsearch with embeddings"""
+    if es is None:
+        es = create_es_client()
+    if embedding_model is None:
+        embedding_model = create_embedding_model()
+    if embedding_cache is None:
+        # Persistent by default so unchanged incidents are not re-embedded on every run
+        embedding_cache = create_embedding_cache(
+            backend=os.getenv('EMBEDDING_CACHE_BACKEND', 'sqlite'),
+            max_entries=int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '500000')),
+            path=os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite3')
+        )
+    
+    dimensions = output_dimensions(vector_profile)
+    stats = IngestStats()
+    incidents = timed(read_incidents(file_path, input_format), stats.read)
+    if retry_failed:
+        # Replay only the incidents that failed in an earlier run
+        retry_ids = load_failed_ids(retry_failed)
+        incidents = (incident for incident in incidents if incident['incident_id'] in retry_ids)
+        print(f"🔁 Retrying {len(retry_ids)} failed incidents from {retry_failed}")
+    
+    # Before the diff, so incidents indexed without a (current) summary get one
+    incidents = enrich_incidents(incidents, stats)
+    if incremental:
+        incidents = diff_against_index(es, incidents, index_name, stats, bulk_chunk_size, dimensions)
     
-    # Bulk index
-    success, failed = helpers.bulk(es, actions, raise_on_error=False)
+    mode = " (incremental)" if incremental else ""
+    mode += " with the bulk-load settings profile" if bulk_load_profile else ""
+    print(f"📥 Ingesting incidents from {file_path} into {index_name}{mode}...")
+    
+    failures = FailureLog(failed_file)
+    embedder = BatchEmbedder(embedding_model, embedding_cache, dimensions=dimensions)
+    # Refresh off, no replicas while loading; serving settings restored after
+    loading = bulk_load(es, index_name) if bulk_load_profile else nullcontext(stats.bulk_load_finish)
+    try:
+        with loading as finish_timings:
+            embedded = embed_incidents(incidents, embedder, stats, failures, embed_batch_size, embed_workers, max_in_flight)
+            index_documents(
+                es, bulk_actions(embedded, index_name, dimensions), stats, failures,
+                chunk_size=bulk_chunk_size, max_chunk_bytes=bulk_max_chunk_bytes, threads=bulk_threads
+            )
+        stats.bulk_load_finish = finish_timings
+    finally:
+        failures.close()
+    stats.embedding_requests = embedder.requests
     
     print(f"\n✅ Ingestion complete!")
-    print(f"   Successful: {success}")
-    print(f"   Failed: {failed}")
+    print(f"   Successful: {stats.indexed}")
+    print(f"   Failed: {failures.count}")
+    if failures.count and failed_file:
+        print(f"   Failed incident ids written to {failed_file}; rerun with --retry-failed {failed_file}")
+    if incremental:
+        stats.report_changes()
+    stats.report()
+    
+    cache_stats = embedding_cache.stats()
+    print(f"   Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['backend']})")
     
     # Verify
-    count = es.count(index=os.getenv('ELASTIC_INDEX_NAME'))
+    count = es.count(index=index_name)
     print(f"   Total documents in index: {count['count']}")
+    return stats
+
+def create_es_client():
+    return Elasticsearch(
+        cloud_id=os.getenv('ELASTIC_CLOUD_ID'),
+        api_key=os.getenv('ELASTIC_API_KEY'),
+        request_timeout=120
+    )
+
+def create_embedding_model():
+    vertexai.init(
+        project=os.getenv('GOOGLE_CLOUD_PROJECT'),
+        location=os.getenv('GOOGLE_CLOUD_REGION')
+    )
+    return TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed incidents and bulk index them into Elasticsearch")
+    parser.add_argument("input", nargs="?", default="sample_incidents.json")
+    parser.add_argument("--format", choices=["auto", "json", "ndjson"], default="auto",
+                        help="Input format; auto uses the extension (.ndjson/.jsonl) or the first character")
+    parser.add_argument("--index", default=INDEX_NAME)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding request (max 250)")
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS, help="Embedding requests in flight")
+    parser.add_argument("--max-in-flight", type=int, help="Embedding batches read ahead (default 2 x workers)")
+    parser.add_argument("--bulk-chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Documents per bulk request")
+    parser.add_argument("--bulk-max-chunk-bytes", type=int, default=BULK_MAX_CHUNK_BYTES)
+    parser.add_argument("--bulk-threads", type=int, default=1, help="Above 1, use parallel_bulk with this many threads")
+    parser.add_argument("--failed-file", default="ingest_failed.jsonl", help="Where ids of failed incidents are written")
+    parser.add_argument("--retry-failed", help="Only ingest the incidents listed in this failed-ids file")
+    parser.add_argument("--vector-profile", default=VECTOR_PROFILE, choices=list(VECTOR_PROFILES),
+                        help="Vector profile the index was created with; sets the embedding dimensions")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Switch the index to the bulk-load settings profile while ingesting, then restore, force-merge and warm it")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged incidents, re-embed changed ones, partially update metadata-only changes")
+    args = parser.parse_args()
+    
+    ingest_incidents(
+        args.input,
+        index_name=args.index,
+        embed_batch_size=min(args.embed_batch_size, 250),
+        embed_workers=args.embed_workers,
+        bulk_chunk_size=args.bulk_chunk_size,
+        bulk_max_chunk_bytes=args.bulk_max_chunk_bytes,
+        bulk_threads=args.bulk_threads,
+        failed_file=args.failed_file,
+        retry_failed=args.retry_failed,
+        input_format=args.format,
+        max_in_flight=args.max_in_flight,
+        incremental=args.incremental,
+        vector_profile=args.vector_profile,
+        bulk_load_profile=args.bulk_load
+    )
 
 if __name__ == "__main__":
-    ingest_incidents('sample_incidents.json')
\ No newline at end of file
+    main()